@@ -8,6 +8,7 @@ from PIL import Image, ImageTk
 from functools import partial
 import keybind_settings
 import tutorial
+import engine_1D
 from Spinbox_validation import validate_spinbox_integer
 from Spinbox_validation import create_spinbox_fixer
 
@@ -66,14 +67,38 @@ class SliderWindow:
         center_frame = tk.Frame(self.slider_frame)
         center_frame.place(relx=0.5, rely=0.5, anchor="center")
         
-        tk.Label(center_frame, text="Select 1D Rule (0-255)", font=("Arial", 20)).pack(pady=20)
+        self.title_label = tk.Label(center_frame, text="Select 1D Rule (0-255)", font=("Arial", 20))
+        self.title_label.pack(pady=20)
         
-        self.slider_value = tk.IntVar(value=0)
-        self.slider = tk.Spinbox(center_frame, from_=0, to=255, font=("Arial", 16), width=10, textvariable=self.slider_value)
-        self.slider.config(validate="key", validatecommand=(self.root.register(lambda v: validate_spinbox_integer(v, 0, 255)), "%P"))
-        self.slider.bind("<FocusOut>", create_spinbox_fixer(self.slider_value, 0, 255, 0))
+        # Rule numbers can be far larger than a Spinbox can step through
+        self.slider_value = tk.StringVar(value="0")
+        self.slider = tk.Entry(center_frame, font=("Arial", 16), width=24, textvariable=self.slider_value, justify="center")
+        self.slider.config(validate="key", validatecommand=(self.root.register(self._validate_rule), "%P"))
         self.slider.pack(pady=10)
-
+        
+        options_frame = tk.Frame(center_frame)
+        options_frame.pack(pady=10)
+        
+        tk.Label(options_frame, text="States (k):", font=("Arial", 12)).grid(row=0, column=0, sticky="e", padx=5)
+        self.states_value = tk.IntVar(value=2)
+        states_spinbox = tk.Spinbox(options_frame, from_=2, to=engine_1D.MAX_STATES, font=("Arial", 12), width=5, 
+                                    textvariable=self.states_value, command=self.update_range)
+        states_spinbox.config(validate="key", validatecommand=(self.root.register(lambda v: validate_spinbox_integer(v, 2, engine_1D.MAX_STATES)), "%P"))
+        states_spinbox.bind("<FocusOut>", self._fix_and_update(self.states_value, 2, engine_1D.MAX_STATES, 2))
+        states_spinbox.grid(row=0, column=1, sticky="w", pady=2)
+        
+        tk.Label(options_frame, text="Radius (r):", font=("Arial", 12)).grid(row=1, column=0, sticky="e", padx=5)
+        self.radius_value = tk.IntVar(value=1)
+        radius_spinbox = tk.Spinbox(options_frame, from_=1, to=engine_1D.MAX_RADIUS, font=("Arial", 12), width=5, 
+                                    textvariable=self.radius_value, command=self.update_range)
+        radius_spinbox.config(validate="key", validatecommand=(self.root.register(lambda v: validate_spinbox_integer(v, 1, engine_1D.MAX_RADIUS)), "%P"))
+        radius_spinbox.bind("<FocusOut>", self._fix_and_update(self.radius_value, 1, engine_1D.MAX_RADIUS, 1))
+        radius_spinbox.grid(row=1, column=1, sticky="w", pady=2)
+        
+        self.totalistic_value = tk.BooleanVar(value=False)
+        totalistic_check = tk.Checkbutton(options_frame, text="Totalistic code", variable=self.totalistic_value, 
+                                          font=("Arial", 12), command=self.update_range)
+        totalistic_check.grid(row=2, column=0, columnspan=2, pady=2)
         
         btn = tk.Button(center_frame, text="START", command=self.start_1d, font=("Arial", 16), bg="spring green", width=20, height=2)
         btn.pack(pady=20)
@@ -83,12 +108,59 @@ class SliderWindow:
         
         self.root.bind("<Escape>", lambda e: self.go_back())
     
+    def _fix_and_update(self, variable, minimum, maximum, default):
+        fixer = create_spinbox_fixer(variable, minimum, maximum, default)
+        
+        def fix(event=None):
+            fixer(event)
+            self.update_range()
+        return fix
+    
+    def _settings(self):
+        try:
+            return self.states_value.get(), self.radius_value.get(), self.totalistic_value.get()
+        except tk.TclError:
+            return 2, 1, False
+    
+    def max_rule(self):
+        return engine_1D.max_rule_number(*self._settings())
+    
+    def _validate_rule(self, value):
+        """Keystroke check for the rule entry, like validate_spinbox_integer but for any length"""
+        if value == "":
+            return True
+        try:
+            return engine_1D.parse_rule_number(value) <= self.max_rule()
+        except ValueError:
+            return False
+    
+    def update_range(self):
+        """Show the valid rule range and clamp the entered rule to it"""
+        states, radius, totalistic = self._settings()
+        maximum = engine_1D.max_rule_number(states, radius, totalistic)
+        size = engine_1D.table_size(states, radius, totalistic)
+        
+        kind = "Totalistic Code" if totalistic else "Rule"
+        if maximum < 10 ** 9:
+            self.title_label.config(text=f"Select 1D {kind} (0-{maximum})")
+        else:
+            self.title_label.config(text=f"Select 1D {kind} (0 to {states}^{size} - 1)")
+        
+        try:
+            if engine_1D.parse_rule_number(self.slider_value.get()) > maximum:
+                self.slider_value.set(engine_1D.format_rule_number(maximum))
+        except ValueError:
+            self.slider_value.set("0")
+    
     def start_1d(self):
-        slider_value = self.slider.get()
-        if 0 <= int(slider_value) <= 255:
+        slider_value = self.slider_value.get() or "0"
+        states, radius, totalistic = self._settings()
+        rule_number = engine_1D.parse_rule_number(slider_value)
+        if rule_number <= self.max_rule():
             self.slider_frame.pack_forget()
             import basic_1D
-            basic_1D.setup_in_frame(self.root, self.container, self.back_callback, int(slider_value))
+            basic_1D.setup_in_frame(self.root, self.container, self.back_callback, rule_number, 
+                                    states=states, radius=radius, totalistic=totalistic)
     
     def go_back(self):
         self.slider_frame.pack_forget()
@@ -22,6 +22,7 @@ wrapping_enabled = tk.BooleanVar(value=True)
 use_sparse_grid = tk.BooleanVar(value=False)
 simulation_speed = tk.IntVar(value=100)
 show_arrows = tk.BooleanVar(value=False)
+merge_pointers = tk.BooleanVar(value=False)
 min_pixel_size = tk.IntVar(value=4)
 max_pixel_size = tk.IntVar(value=50)
 
@@ -81,6 +82,12 @@ def setup_in_frame(root, container, back_func):
     arrow_check = tk.Checkbutton(toggles_frame, text="Show pointer arrows", variable=show_arrows, font=("Arial", 11))
     arrow_check.pack(anchor="w", padx=20, pady=(20, 5))
     
+    merge_check = tk.Checkbutton(toggles_frame, text="Merge identical pointers", variable=merge_pointers, font=("Arial", 11))
+    merge_check.pack(anchor="w", padx=20, pady=(5, 0))
+    
+    tk.Label(toggles_frame, text="Same cell and direction step as one group", 
+            font=("Arial", 8), fg="gray").pack(anchor="w", padx=40)
+    
     tk.Label(toggles_frame, text="Simulation Speed:", font=("Arial", 11)).pack(anchor="w", padx=20, pady=(20, 5))
     speed_frame = tk.Frame(toggles_frame)
     speed_frame.pack(anchor="w", padx=20, pady=5)
@@ -225,7 +232,8 @@ class basic:
                 lambda: setup_in_frame(root_window, main_container, back_callback),
                 min_cell_size=min_pixel_size.get(),
                 max_cell_size=max_pixel_size.get(),
-                sparse_mode=use_sparse_grid.get()
+                sparse_mode=use_sparse_grid.get(),
+                merge_duplicates=merge_pointers.get()
             )
             
             basic_pointer.show_arrows = show_arrows.get()
@@ -276,7 +284,8 @@ def load_and_start(preset_name):
             lambda: setup_in_frame(root_window, main_container, back_callback),
             min_cell_size=min_pixel_size.get(),
             max_cell_size=max_pixel_size.get(),
-            sparse_mode=use_sparse_grid.get()
+            sparse_mode=use_sparse_grid.get(),
+            merge_duplicates=merge_pointers.get()
         )
         
         basic_pointer.show_arrows = show_arrows.get()
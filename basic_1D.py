@@ -1,14 +1,16 @@
 """
-1D Cellular Automaton - Elementary cellular automata (Rules 0-255)
+1D Cellular Automaton - Elementary (Rules 0-255), k-state, radius-r and totalistic rules
 Displays evolution over time as rows stacked vertically
 """
 
 import tkinter as tk
-from collections import Counter
-import operator
+import numpy as np
+import raster
+import engine_1D
+import frame_scheduler
 
 try:
-    from PIL import Image, ImageTk, ImageDraw
+    from PIL import Image, ImageTk
     PIL_AVAILABLE = True
 except ImportError:
     PIL_AVAILABLE = False
@@ -25,7 +27,7 @@ TOTAL_COLS = 0
 CELL_SIZE = 1
 VIEWPORT_HEIGHT = 600
 CELLS = []
-RULES = None
+RULE = None  # engine_1D.Rule1D
 STATE_COLORS = {0: "#ffffff", 1: "#808080"}
 STATE_RGB = {0: (255, 255, 255), 1: (128, 128, 128)}
 automata = False
@@ -34,98 +36,149 @@ back_callback = None
 
 
 class ImageHistoryRenderer:
-    """Renders 1D automaton history as stacked horizontal rows"""
+    """
+    Renders 1D automaton history as stacked horizontal rows
+    
+    History is kept in a preallocated pixel buffer used as a ring of
+    max_rows rows. New generations overwrite the oldest row in place and
+    only the rows inside the scroll window are pushed to Tk, at most once
+    per frame however many generations or scroll events arrive.
+    """
     
     def __init__(self):
-        self.history_image = None
         self.photo = None
         self.canvas_image_id = None
         self.image_width = int(TOTAL_COLS/2) * CELL_SIZE
-        self.max_rows = 5000  # Maximum rows before trimming
+        self.max_rows = 5000  # Rows kept before the oldest is overwritten
         self.show_grid = True
         self.start_offset = int(TOTAL_COLS / 4)  # Center view
         
-    def add_generation(self, generation_data):
-        """Add new generation as row at bottom of image"""
-        row_height = CELL_SIZE
-        row_width = self.image_width
-        new_row = Image.new('RGB', (row_width, row_height), STATE_RGB[0])
-        draw = ImageDraw.Draw(new_row)
+        # Ring buffer: [row slot, pixel row within cell, x, rgb]
+        self.buffer = np.empty((self.max_rows, CELL_SIZE, self.image_width, 3), dtype=np.uint8)
+        self.buffer[:] = STATE_RGB[0]
+        self.head = 0          # Slot the next generation is written to
+        self.row_count = 0     # Number of generations currently stored
+        self.scroll_row = 0    # First stored generation shown at the top of the canvas
+        self.follow = True     # Keep the newest generation in view
+        
+        self.visible_cols = self.image_width // CELL_SIZE
+        self.update_palette()
+        self.scheduler = frame_scheduler.FrameScheduler(canvas, lambda full, rects: self._update_canvas_display())
+        
+    def add_generation(self, generation_data, update_display=True):
+        """Write new generation into the next ring slot - O(width)"""
+        self.add_generations(np.asarray(generation_data)[np.newaxis, :], update_display)
+    
+    def add_generations(self, block, update_display=True):
+        """
+        Rasterise a (generations, TOTAL_COLS) block of rows in one go
         
-        visible_cols = len(generation_data) // 2
+        Rows are colored with a palette lookup and the precomputed grid
+        overlay, then written into consecutive ring slots.
+        """
+        # Only the newest max_rows rows can survive in the ring
+        block = block[-self.max_rows:]
+        count = len(block)
         
-        # Draw each cell in the row
-        for i in range(visible_cols):
-            col_index = self.start_offset + i
-            if col_index < len(generation_data):
-                cell_state = generation_data[col_index]
-                
-                x1 = i * CELL_SIZE
-                y1 = 0
-                x2 = x1 + CELL_SIZE - 1
-                y2 = row_height - 1
-                cell_color = STATE_RGB[cell_state]
-                
-                draw.rectangle([x1, y1, x2, y2], fill=cell_color)
-                
-                # Draw grid lines if enabled
-                if self.show_grid and CELL_SIZE > 2:
-                    grid_color = (0, 0, 0)
-                    draw.rectangle([x1, y1, x2, y2], outline=grid_color)
+        visible = block[:, self.start_offset:self.start_offset + self.visible_cols]
+        pixels = raster.rasterise(visible, self.palette, CELL_SIZE, self.grid_mask)
         
-        # Append to history image
-        if self.history_image is None:
-            self.history_image = new_row
+        slots = (self.head + np.arange(count)) % self.max_rows
+        self.buffer[slots] = pixels
+        self.head = (self.head + count) % self.max_rows
+        self.row_count = min(self.row_count + count, self.max_rows)
+        
+        if update_display:
+            self.scheduler.request_full()
+    
+    def replace_newest(self, generation_data):
+        """Re-rasterise only the newest generation after it was edited"""
+        if self.row_count == 0:
+            return
+        visible = np.asarray(generation_data)[np.newaxis, self.start_offset:self.start_offset + self.visible_cols]
+        self.buffer[(self.head - 1) % self.max_rows] = raster.rasterise(visible, self.palette, CELL_SIZE, self.grid_mask)[0]
+        self.scheduler.request_full()
+    
+    def update_palette(self):
+        """Rebuild palette and grid overlay from STATE_RGB and CELL_SIZE"""
+        self.palette = raster.build_palette(STATE_RGB)
+        if self.show_grid and CELL_SIZE > 2:
+            self.grid_mask = raster.grid_line_mask(CELL_SIZE, self.visible_cols)
         else:
-            current_width, current_height = self.history_image.size
-            
-            # Trim old rows if exceeding max
-            if current_height >= self.max_rows * CELL_SIZE:
-                rows_to_remove = 100
-                crop_height = rows_to_remove * CELL_SIZE
-                self.history_image = self.history_image.crop((0, crop_height, current_width, current_height))
-                current_height -= crop_height
-            
-            # Combine old history with new row
-            new_height = current_height + row_height
-            combined_image = Image.new('RGB', (current_width, new_height), STATE_RGB[0])
-            combined_image.paste(self.history_image, (0, 0))
-            combined_image.paste(new_row, (0, current_height))
-            self.history_image = combined_image
-            
-        self._update_canvas_display()
+            self.grid_mask = None
+    
+    def _viewport_rows(self):
+        """Number of generations that fit in the canvas"""
+        canvas_height = canvas.winfo_height()
+        if canvas_height <= 1:
+            canvas_height = VIEWPORT_HEIGHT
+        return max(1, canvas_height // CELL_SIZE)
+    
+    def _max_scroll_row(self):
+        return max(0, self.row_count - self._viewport_rows())
         
     def _update_canvas_display(self):
-        """Update canvas with current history image"""
-        if not self.history_image:
+        """Push the rows inside the scroll window to the canvas"""
+        if self.row_count == 0:
             return
-            
-        self.photo = ImageTk.PhotoImage(self.history_image)
         
-        if self.canvas_image_id:
-            canvas.delete(self.canvas_image_id)
-            
-        self.canvas_image_id = canvas.create_image(0, 0, anchor="nw", image=self.photo)
+        if self.follow:
+            self.scroll_row = self._max_scroll_row()
+        self.scroll_row = max(0, min(self.scroll_row, self._max_scroll_row()))
+        
+        shown = min(self._viewport_rows(), self.row_count)
+        oldest = (self.head - self.row_count) % self.max_rows
+        slots = (oldest + self.scroll_row + np.arange(shown)) % self.max_rows
+        
+        window = self.buffer.take(slots, axis=0).reshape(shown * CELL_SIZE, self.image_width, 3)
+        window_image = Image.fromarray(window, 'RGB')
         
-        image_height = self.history_image.size[1]
-        canvas.config(scrollregion=(0, 0, self.image_width, image_height))
-        canvas.yview_moveto(1.0)  # Scroll to bottom
+        # Reuse the Tk photo while the window size is unchanged
+        if self.photo is not None and self.photo.width() == window_image.width and self.photo.height() == window_image.height:
+            self.photo.paste(window_image)
+        else:
+            self.photo = ImageTk.PhotoImage(window_image)
+            if self.canvas_image_id:
+                canvas.itemconfig(self.canvas_image_id, image=self.photo)
+        
+        if not self.canvas_image_id:
+            self.canvas_image_id = canvas.create_image(0, 0, anchor="nw", image=self.photo)
+    
+    def scroll(self, rows):
+        """Move the scroll window by a number of generations"""
+        self.scroll_row = max(0, min(self.scroll_row + rows, self._max_scroll_row()))
+        self.follow = self.scroll_row >= self._max_scroll_row()
+        self.scheduler.request_full()
+    
+    def scroll_to_start(self):
+        self.scroll_row = 0
+        self.follow = self._max_scroll_row() == 0
+        self.scheduler.request_full()
+    
+    def scroll_to_end(self):
+        self.follow = True
+        self.scheduler.request_full()
         
     def clear_history(self):
         """Clear all history"""
-        self.history_image = None
+        self.head = 0
+        self.row_count = 0
+        self.scroll_row = 0
+        self.follow = True
         if self.canvas_image_id:
             canvas.delete(self.canvas_image_id)
             self.canvas_image_id = None
+        self.photo = None
 
 
-def setup_in_frame(root_win, container, back_func, rule_number):
+def setup_in_frame(root_win, container, back_func, rule_number, states=2, radius=1, totalistic=False):
     """Initialize 1D automaton interface"""
-    global root, canvas, renderer, TOTAL_COLS, RULES, onedim_frame, back_callback
+    global root, canvas, renderer, TOTAL_COLS, RULE, onedim_frame, back_callback
     
     root = root_win
     back_callback = back_func
-    RULES = rule_number
+    RULE = engine_1D.Rule1D(rule_number, states, radius, totalistic)
+    set_state_colors(states)
     
     # Hide all other frames
     for widget in container.winfo_children():
@@ -136,8 +189,7 @@ def setup_in_frame(root_win, container, back_func, rule_number):
     onedim_frame.pack(fill="both", expand=True)
     
     TOTAL_COLS = int(root.winfo_screenwidth() * 2)
-    canvas = tk.Canvas(onedim_frame, width=int(TOTAL_COLS/2) * CELL_SIZE, height=VIEWPORT_HEIGHT, 
-                      scrollregion=(0, 0, int(TOTAL_COLS/2) * CELL_SIZE, 10000))
+    canvas = tk.Canvas(onedim_frame, width=int(TOTAL_COLS/2) * CELL_SIZE, height=VIEWPORT_HEIGHT)
     canvas.pack(fill="both", expand=True)
     renderer = ImageHistoryRenderer()
     
@@ -169,16 +221,9 @@ def toggle_cell(event):
     actual_col = visible_col + int(TOTAL_COLS / 4)
     
     if 0 <= actual_col < TOTAL_COLS:
-        # Toggle cell in most recent generation
+        # Toggle cell in most recent generation; only that row is redrawn
         CELLS[len(CELLS)-1][actual_col] = (CELLS[len(CELLS)-1][actual_col] + 1) % len(STATE_RGB)
-        _redraw_all_history()
-
-
-def _redraw_all_history():
-    """Redraw entire history after edit"""
-    renderer.clear_history()
-    for generation in CELLS:
-        renderer.add_generation(generation)
+        renderer.replace_newest(CELLS[-1])
 
 
 def pause():
@@ -204,62 +249,50 @@ def play():
 def initialize(): 
     # Initialize with single cell if empty
     if not CELLS:
-        new = [0 for _ in range(TOTAL_COLS)]
+        new = np.zeros(TOTAL_COLS, dtype=np.uint8)
         new[TOTAL_COLS // 2] = 0
         CELLS.append(new)
         renderer.add_generation(new)
         return
 
-def step():
+
+def set_state_colors(states):
+    """Use a white-to-black ramp when there are more than 2 states"""
+    global STATE_COLORS, STATE_RGB
+    
+    if states == 2:
+        STATE_COLORS = {0: "#ffffff", 1: "#808080"}
+    else:
+        STATE_COLORS = {}
+        for state in range(states):
+            level = 255 - round(255 * state / (states - 1))
+            STATE_COLORS[state] = f"#{level:02x}{level:02x}{level:02x}"
+    
+    STATE_RGB = {}
+    for state, hex_color in STATE_COLORS.items():
+        hex_color = hex_color.lstrip('#')
+        STATE_RGB[state] = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+
+
+def step(count=1):
     """
-    Compute next generation using 1D rule
+    Compute the next count generations using the 1D rule
     
     Algorithm:
-    For each cell, look at left neighbor, self, right neighbor
-    Form 3-bit pattern (e.g. "101")
-    Look up pattern in rule table to get next state
+    For each cell, read the 2r+1 cells around it as a base-k number (or
+    their sum for totalistic codes) and look up the new state in the
+    rule table. Every cell in the row is done at once with NumPy.
     """
-    global RULES
+    block = RULE.run(CELLS[-1], count)
     
-    # Convert rule number to lookup table (first time only)
-    if not isinstance(RULES, list):
-        rule_set = ["111", "110", "101", "100", "011", "010", "001", "000"]
-        binary = bin(int(RULES))[2:].zfill(8)
-        chosen = [int(digit) for digit in binary]
-        RULES = []
-        for i in range(len(chosen)):
-            if chosen[i]:
-                RULES.append(rule_set[i])
-    
-    # Apply rule to get next generation
-    prev = CELLS[-1]
-    new = [0 for _ in range(TOTAL_COLS)]
-    
-    for c in range(TOTAL_COLS):
-        cent = prev[c]
-        left = prev[c - 1] if c > 0 else 0
-        right = prev[c + 1] if c < TOTAL_COLS - 1 else 0
-        
-        # Form 3-bit pattern
-        current = f"{left}{cent}{right}"
-        
-        # Check if pattern is in rule
-        new_state = 0
-        for rule in RULES:
-            if rule == current:
-                new_state = 1
-                break
-                
-        new[c] = new_state
-        
-    CELLS.append(new)
-    renderer.add_generation(new)
+    CELLS.extend(block[1:])
+    renderer.add_generations(block[1:])
 
 
 def reset(event=None):
     """Reset to initial state"""
     global CELLS
-    CELLS = [[0 for _ in range(TOTAL_COLS)]]
+    CELLS = [np.zeros(TOTAL_COLS, dtype=np.uint8)]
     CELLS[0][TOTAL_COLS // 2] = 0
     renderer.clear_history()
     renderer.add_generation(CELLS[0])
@@ -276,32 +309,26 @@ def onoff(event):
 
 def _on_mousewheel(event):
     """Handle mouse wheel scrolling"""
-    top, bottom = canvas.yview()
-    
-    # Prevent scrolling past edges
-    if event.delta > 0 and top <= 0:
-        return
-    
-    if event.delta < 0 and bottom >= 1.0:
-        return
-    
-    canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
+    rows = int(-1 * (event.delta / 120)) * 3
+    if rows:
+        renderer.scroll(rows)
 
 
 def jump_to_start(event=None):
     """Scroll to first generation"""
-    canvas.yview_moveto(0.0)
+    renderer.scroll_to_start()
 
 
 def jump_to_end(event=None):
     """Scroll to most recent generation"""
-    canvas.yview_moveto(1.0)
+    renderer.scroll_to_end()
     
 
 def go_back(event):
     """Return to home screen"""
     global onedim_frame
     reset()
+    renderer.scheduler.cancel()
     if onedim_frame:
         onedim_frame.pack_forget()
     back_callback()
\ No newline at end of file
@@ -8,18 +8,23 @@ with optimized grid evolution using NumPy vectorization and interactive visualiz
 
 import tkinter as tk
 from tkinter import filedialog
-from collections import Counter
-import operator
-import random
 import numpy as np
 import time
 import keybind_settings
-import pickle
+import export_animation
+import frame_scheduler
+import phase_timer
+import population_series
+import sampling_profiler
+import gridstate
+import patterns
+import raster
+import timeline
 from Spinbox_validation import validate_spinbox_integer
-from Spinbox_validation import create_spinbox_fixer
+from grid_engine import RuleSet, CellularAutomaton
 
 try:
-    from PIL import Image, ImageTk, ImageDraw
+    from PIL import Image, ImageTk
     PIL_AVAILABLE = True
 except ImportError:
     PIL_AVAILABLE = False
@@ -36,6 +41,7 @@ controller = None
 automaton = None
 density_control = None
 back_callback = None
+mapped_grid_path = None
 TOTAL_ROWS = 0
 TOTAL_COLS = 0
 use_sparse_grid = False
@@ -44,324 +50,6 @@ min_cell_size = 4
 max_cell_size = 25
 
 
-class GenerationHistory:
-    """Store last 5 grid states for undo/redo"""
-    
-    def __init__(self, max_history=5):
-        self.history = []
-        self.max_history = max_history
-        self.current_index = -1
-    
-    def save_state(self, grid):
-        if self.current_index < len(self.history) - 1:
-            self.history = self.history[:self.current_index + 1]
-        
-        self.history.append(grid.copy())
-        
-        if len(self.history) > self.max_history:
-            self.history.pop(0)
-            self.current_index = len(self.history) - 1
-        else:
-            self.current_index = len(self.history) - 1
-    
-    def can_undo(self):
-        return self.current_index > 0
-    
-    def can_redo(self):
-        return self.current_index < len(self.history) - 1
-    
-    def undo(self):
-        if self.can_undo():
-            self.current_index -= 1
-            return self.history[self.current_index].copy()
-        return None
-    
-    def redo(self):
-        if self.can_redo():
-            self.current_index += 1
-            return self.history[self.current_index].copy()
-        return None
-    
-    def clear(self):
-        self.history = []
-        self.current_index = -1
-
-
-class Rule:
-    """Single rule defining state transition based on neighbor conditions"""
-    
-    def __init__(self, current_state, conditions, next_state, color):
-        self.current_state = current_state
-        self.conditions = conditions
-        self.next_state = next_state
-        self.color = color
-    
-    def applies_to(self, state, neighbor_counts):
-        if self.current_state != state:
-            return False
-        
-        rel_operators = {"=": operator.eq, "!=": operator.ne, "<": operator.lt, 
-                        "<=": operator.le, ">": operator.gt, ">=": operator.ge}
-        
-        for condition in self.conditions:
-            neighbor_count = neighbor_counts[condition["neighbor_state"]]
-            op = rel_operators[condition["operator"]]
-            if not op(neighbor_count, condition["count"]):
-                return False
-        return True
-
-
-class RuleSet:
-    """Collection of rules defining complete automaton behavior"""
-    
-    def __init__(self):
-        self.rules = []
-        self.state_colors = {0: "#ffffff", 1: "#808080"}
-        self.state_rgb = {}
-        self._update_rgb()
-    
-    def _update_rgb(self):
-        self.state_rgb = {}
-        for state, hex_color in self.state_colors.items():
-            hex_color = hex_color.lstrip('#')
-            self.state_rgb[state] = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-    
-    def add_rule(self, rule):
-        self.rules.append(rule)
-        self.state_colors[rule.next_state] = rule.color
-        self._update_rgb()
-    
-    def apply_rules(self, current_state, neighbor_counts):
-        for rule in self.rules:
-            if rule.applies_to(current_state, neighbor_counts):
-                return rule.next_state
-        return current_state
-    
-    def get_color(self, state):
-        return self.state_colors.get(state, "#ffffff")
-    
-    def get_rgb(self, state):
-        return self.state_rgb.get(state, (255, 255, 255))
-    
-    def set_default_rules(self):
-        """Set Conway's Game of Life rules"""
-        self.rules = [Rule(1, [{"neighbor_state": 1, "operator": "<", "count": 2}], 0, "#ffffff"),
-                      Rule(1, [{"neighbor_state": 1, "operator": ">", "count": 3}], 0, "#ffffff"),
-                      Rule(0, [{"neighbor_state": 1, "operator": "=", "count": 3}], 1, "#808080")]
-        self._update_rgb()
-    
-    def change_rules(self, rules, colors):
-        self.rules = []
-        self.state_colors = colors
-        for rule_dict in rules:
-            rule = Rule(rule_dict["current_state"], rule_dict["conditions"], 
-                       rule_dict["next_state"], rule_dict["color"])
-            self.add_rule(rule)
-
-
-class CellularAutomaton:
-    """Core automaton logic using NumPy for performance"""
-    
-    def __init__(self, width, height, ruleset, use_sparse=False, wrapping=True, 
-                 neighborhood_type="moore", neighborhood_radius=1):
-        self.width = width
-        self.height = height
-        self.ruleset = ruleset
-        self.use_sparse = use_sparse
-        self.wrapping = wrapping
-        self.neighborhood_type = neighborhood_type
-        self.neighborhood_radius = neighborhood_radius
-        self.generation = 0
-        
-        self.grid = np.zeros((height, width), dtype=np.int8)
-        self.previous_grid = None
-        
-        # Undo/Redo
-        self.history = GenerationHistory(max_history=5)
-        self.history.save_state(self.grid)
-        
-        self._create_kernel()
-    
-    def _create_kernel(self):
-        size = 2 * self.neighborhood_radius + 1
-        
-        if self.neighborhood_type == "moore":
-            self.kernel = np.ones((size, size), dtype=np.int8)
-            self.kernel[self.neighborhood_radius, self.neighborhood_radius] = 0
-        else:
-            self.kernel = np.zeros((size, size), dtype=np.int8)
-            center = self.neighborhood_radius
-            for i in range(size):
-                for j in range(size):
-                    manhattan_dist = abs(i - center) + abs(j - center)
-                    if 0 < manhattan_dist <= self.neighborhood_radius:
-                        self.kernel[i, j] = 1
-    
-    def get_max_neighbors(self):
-        if self.neighborhood_type == "moore":
-            return ((2 * self.neighborhood_radius + 1) ** 2) - 1
-        else:
-            return 4 * self.neighborhood_radius
-    
-    def get_cell(self, row, col):
-        if 0 <= row < self.height and 0 <= col < self.width:
-            return int(self.grid[row, col])
-        return 0
-    
-    def set_cell(self, row, col, state):
-        if 0 <= row < self.height and 0 <= col < self.width:
-            self.grid[row, col] = state
-    
-    def toggle_cell(self, row, col):
-        if 0 <= row < self.height and 0 <= col < self.width and controller.toggleable():
-            num_states = len(self.ruleset.state_colors)
-            current = int(self.grid[row, col])
-            self.grid[row, col] = (current + 1) % num_states
-    
-    def get_active_bounding_box(self):
-        """Calculate bounding box containing all non-zero cells"""
-        non_zero = np.argwhere(self.grid != 0)
-        
-        if len(non_zero) == 0:
-            return None
-        
-        min_row = max(0, non_zero[:, 0].min() - self.neighborhood_radius - 1)
-        max_row = min(self.height - 1, non_zero[:, 0].max() + self.neighborhood_radius + 1)
-        min_col = max(0, non_zero[:, 1].min() - self.neighborhood_radius - 1)
-        max_col = min(self.width - 1, non_zero[:, 1].max() + self.neighborhood_radius + 1)
-        
-        return (min_row, max_row, min_col, max_col)
-    
-    def evolve(self):
-        """Execute one generation using vectorized NumPy operations"""
-        self.previous_grid = self.grid.copy()
-        
-        states = list(self.ruleset.state_colors.keys())
-        
-        neighbor_counts = {}
-        for state in states:
-            state_mask = (self.grid == state).astype(np.int8)
-            neighbor_counts[state] = self._convolve2d(state_mask, self.kernel)
-        
-        new_grid = self.grid.copy()
-        
-        for rule in self.ruleset.rules:
-            current_state_mask = (self.grid == rule.current_state)
-            conditions_met = np.ones_like(self.grid, dtype=bool)
-            
-            for condition in rule.conditions:
-                neighbor_state = condition["neighbor_state"]
-                operator_str = condition["operator"]
-                count = condition["count"]
-                
-                neighbor_count_array = neighbor_counts[neighbor_state]
-                
-                if operator_str == "=":
-                    conditions_met &= (neighbor_count_array == count)
-                elif operator_str == "!=":
-                    conditions_met &= (neighbor_count_array != count)
-                elif operator_str == "<":
-                    conditions_met &= (neighbor_count_array < count)
-                elif operator_str == "<=":
-                    conditions_met &= (neighbor_count_array <= count)
-                elif operator_str == ">":
-                    conditions_met &= (neighbor_count_array > count)
-                elif operator_str == ">=":
-                    conditions_met &= (neighbor_count_array >= count)
-            
-            rule_applies = current_state_mask & conditions_met
-            new_grid[rule_applies] = rule.next_state
-        
-        self.grid = new_grid
-        self.generation += 1
-        self.history.save_state(self.grid)
-    
-    def evolve_with_bounding_box(self):
-        """Evolve only the active region - massive speedup for sparse patterns"""
-        bbox = self.get_active_bounding_box()
-        
-        if bbox is None:
-            self.generation += 1
-            self.history.save_state(self.grid)
-            return
-        
-        min_row, max_row, min_col, max_col = bbox
-        
-        # Extract region WITH PADDING for neighbor counting
-        pad = self.neighborhood_radius
-        padded_min_row = max(0, min_row - pad)
-        padded_max_row = min(self.height - 1, max_row + pad)
-        padded_min_col = max(0, min_col - pad)
-        padded_max_col = min(self.width - 1, max_col + pad)
-        
-        padded_grid = self.grid[padded_min_row:padded_max_row+1, padded_min_col:padded_max_col+1].copy()
-        
-        states = list(self.ruleset.state_colors.keys())
-        
-        # USE FAST CONVOLUTION on padded region
-        neighbor_counts = {}
-        for state in states:
-            state_mask = (padded_grid == state).astype(np.int8)
-            # This uses the FAST np.roll method
-            padded_neighbors = self._convolve2d(state_mask, self.kernel)
-            # Extract just the active region from padded result
-            active_start_row = min_row - padded_min_row
-            active_end_row = active_start_row + (max_row - min_row + 1)
-            active_start_col = min_col - padded_min_col
-            active_end_col = active_start_col + (max_col - min_col + 1)
-            neighbor_counts[state] = padded_neighbors[active_start_row:active_end_row, active_start_col:active_end_col]
-        
-        active_grid = self.grid[min_row:max_row+1, min_col:max_col+1].copy()
-        
-        new_active_grid = active_grid.copy()
-        
-        for rule in self.ruleset.rules:
-            current_state_mask = (active_grid == rule.current_state)
-            conditions_met = np.ones_like(active_grid, dtype=bool)
-            
-            for condition in rule.conditions:
-                neighbor_state = condition["neighbor_state"]
-                operator_str = condition["operator"]
-                count = condition["count"]
-                
-                neighbor_count_array = neighbor_counts[neighbor_state]
-                
-                if operator_str == "=":
-                    conditions_met &= (neighbor_count_array == count)
-                elif operator_str == "!=":
-                    conditions_met &= (neighbor_count_array != count)
-                elif operator_str == "<":
-                    conditions_met &= (neighbor_count_array < count)
-                elif operator_str == "<=":
-                    conditions_met &= (neighbor_count_array <= count)
-                elif operator_str == ">":
-                    conditions_met &= (neighbor_count_array > count)
-                elif operator_str == ">=":
-                    conditions_met &= (neighbor_count_array >= count)
-            
-            rule_applies = current_state_mask & conditions_met
-            new_active_grid[rule_applies] = rule.next_state
-        
-        self.grid[min_row:max_row+1, min_col:max_col+1] = new_active_grid
-        self.generation += 1
-        self.history.save_state(self.grid)
-    
-    def _convolve2d(self, array, kernel):
-        """Fast convolution using np.roll"""
-        result = np.zeros_like(array)
-        for dy in range(-self.neighborhood_radius, self.neighborhood_radius + 1):
-            for dx in range(-self.neighborhood_radius, self.neighborhood_radius + 1):
-                if kernel[dy + self.neighborhood_radius, dx + self.neighborhood_radius] == 1:
-                    result += np.roll(np.roll(array, dy, axis=0), dx, axis=1)
-        return result
-    
-    def reset(self):
-        self.grid = np.zeros((self.height, self.width), dtype=np.int8)
-        self.generation = 0
-        self.history.clear()
-        self.history.save_state(self.grid)
-
-
 class AutomatonRenderer:
     """Handles all rendering using PIL for performance"""
     
@@ -376,6 +64,17 @@ class AutomatonRenderer:
         self.grid_image = None
         self.photo = None
         self.canvas_image_id = None
+        self.timer = None
+        
+        # Pixels of the frame on screen, kept so parts of it can be redrawn,
+        # and the (view_row, view_col, cell_size) they were drawn at
+        self.pixels = None
+        self.drawn_view = None
+        self.scheduler = frame_scheduler.FrameScheduler(canvas, self._redraw)
+        
+        # Cells crossed by the paint stroke since the last flush
+        self.stroke = []
+        self.stroke_job = None
         
         # Drag state
         self.is_dragging_left = False
@@ -387,44 +86,188 @@ class AutomatonRenderer:
         self.drag_start_view_col = 0
         
         self._update_view_dimensions()
-
+    
     def _update_view_dimensions(self):
         canvas_width = self.canvas.winfo_width() or 800
         canvas_height = self.canvas.winfo_height() or 600
         self.visible_rows = canvas_height // self.cell_size + 1
         self.visible_cols = canvas_width // self.cell_size + 1
-
+    
     def draw_grid(self):
+        """Redraw the whole view at the next frame"""
+        self.scheduler.request_full()
+    
+    def draw_cells(self, min_row, max_row, min_col, max_col):
+        """Redraw a rectangle of cells (inclusive bounds) at the next frame"""
+        self.scheduler.mark_dirty(min_row, max_row, min_col, max_col)
+    
+    def scroll_to(self, view_row, view_col):
+        """
+        Move the viewport
+        
+        The next frame shifts the pixels already drawn by the pan offset
+        and only rasterises the rows and columns that scrolled into view.
+        """
+        self.view_row, self.view_col = view_row, view_col
+        self.scheduler.schedule()
+    
+    def _redraw(self, full, rects):
+        """FrameScheduler callback: bring the frame on screen up to date"""
         if not self.canvas.winfo_exists():
             return
-            
-        visible_width = self.visible_cols * self.cell_size
-        visible_height = self.visible_rows * self.cell_size
+        if full or not self._frame_is_current():
+            self.render_frame()
+            return
         
-        self.grid_image = Image.new('RGB', (visible_width, visible_height), (255, 255, 255))
-        draw = ImageDraw.Draw(self.grid_image)
+        d_row = self.view_row - self.drawn_view[0]
+        d_col = self.view_col - self.drawn_view[1]
+        if abs(d_row) >= self.visible_rows or abs(d_col) >= self.visible_cols:
+            self.render_frame()
+            return
         
-        for r in range(self.view_row, min(self.view_row + self.visible_rows, self.automaton.height)):
-            for c in range(self.view_col, min(self.view_col + self.visible_cols, self.automaton.width)):
-                x = (c - self.view_col) * self.cell_size
-                y = (r - self.view_row) * self.cell_size
-                
-                cell_state = self.automaton.get_cell(r, c)
-                cell_color = self.automaton.ruleset.get_rgb(cell_state)
-                
-                x1, y1 = x, y
-                x2, y2 = x + self.cell_size, y + self.cell_size
-                
-                draw.rectangle([x1, y1, x2, y2], fill=cell_color, outline=cell_color)
+        # Clip the dirty rectangles to the viewport, as [top, bottom) x [left, right)
+        clipped = []
+        for min_row, max_row, min_col, max_col in rects:
+            top = max(min_row, self.view_row)
+            bottom = min(max_row + 1, self.view_row + self.visible_rows, self.automaton.height)
+            left = max(min_col, self.view_col)
+            right = min(max_col + 1, self.view_col + self.visible_cols, self.automaton.width)
+            if top < bottom and left < right:
+                clipped.append((top, bottom, left, right))
+        
+        # Past half the viewport one full frame is cheaper than patches
+        area = sum((bottom - top) * (right - left) for top, bottom, left, right in clipped)
+        if area * 2 > self.visible_rows * self.visible_cols:
+            self.render_frame()
+            return
+        if not clipped and not (d_row or d_col):
+            return
         
-        self.canvas.update_idletasks()
+        timer = self.timer
+        start = time.perf_counter() if timer else 0
+        
+        if d_row or d_col:
+            # The whole frame is sent anyway, so the patches go with it
+            self._shift_frame(d_row, d_col)
+            for rect in clipped:
+                self._render_cells(*rect)
+            if timer:
+                start = timer.lap("render", start)
+            self._show_frame()
+        else:
+            for rect in clipped:
+                self._blit(*self._render_cells(*rect))
         
-        if self.canvas_image_id:
-            self.canvas.delete(self.canvas_image_id)
-            self.canvas_image_id = None
+        if timer:
+            timer.lap("blit", start)
+            timer.tick("frame")
+    
+    def render_frame(self):
+        """Rasterise and show the whole viewport now"""
+        if not self.canvas.winfo_exists():
+            return
+        
+        timer = self.timer
+        start = time.perf_counter() if timer else 0
+        visible_width = self.visible_cols * self.cell_size
+        visible_height = self.visible_rows * self.cell_size
         
-        self.photo = ImageTk.PhotoImage(self.grid_image)
-        self.canvas_image_id = self.canvas.create_image(0, 0, anchor="nw", image=self.photo)
+        # Only the viewport slice is read, so a memory-mapped grid pages in
+        # just the visible cells
+        view = np.asarray(self.automaton.grid[self.view_row:self.view_row + self.visible_rows,
+                                              self.view_col:self.view_col + self.visible_cols])
+        palette = raster.build_palette(self.automaton.ruleset.state_rgb)
+        
+        pixels = np.full((visible_height, visible_width, 3), 255, dtype=np.uint8)
+        rows, cols = view.shape
+        if rows and cols:
+            cells = raster.rasterise(view, palette, self.cell_size)
+            pixels[:rows * self.cell_size, :cols * self.cell_size] = cells.reshape(rows * self.cell_size, -1, 3)
+        self.pixels = pixels
+        self.drawn_view = (self.view_row, self.view_col, self.cell_size)
+        if timer:
+            start = timer.lap("render", start)
+        
+        self._show_frame()
+        
+        if timer:
+            timer.lap("blit", start)
+            timer.tick("frame")
+    
+    def _show_frame(self):
+        """Send the whole of self.pixels to the canvas"""
+        visible_height, visible_width = self.pixels.shape[:2]
+        self.grid_image = Image.fromarray(self.pixels, 'RGB')
+        
+        # Reuse the Tk photo while the viewport size is unchanged
+        if self.photo is not None and self.photo.width() == visible_width and self.photo.height() == visible_height:
+            self.photo.paste(self.grid_image)
+        else:
+            self.photo = ImageTk.PhotoImage(self.grid_image)
+            if self.canvas_image_id:
+                self.canvas.itemconfig(self.canvas_image_id, image=self.photo)
+        
+        if not self.canvas_image_id:
+            self.canvas_image_id = self.canvas.create_image(0, 0, anchor="nw", image=self.photo)
+            self.canvas.tag_lower(self.canvas_image_id)
+    
+    def _frame_is_current(self):
+        """True when self.pixels is on screen at the current cell size and viewport size"""
+        return (self.pixels is not None and self.photo is not None
+                and self.drawn_view[2] == self.cell_size
+                and self.pixels.shape[:2] == (self.visible_rows * self.cell_size, self.visible_cols * self.cell_size))
+    
+    def _shift_frame(self, d_row, d_col):
+        """Move the drawn pixels by a pan of whole cells and rasterise the strips that scrolled in"""
+        # NumPy copies overlapping slices as if through a temporary
+        dy = d_row * self.cell_size
+        dx = d_col * self.cell_size
+        height, width = self.pixels.shape[:2]
+        self.pixels[max(0, -dy):height - max(0, dy), max(0, -dx):width - max(0, dx)] = \
+            self.pixels[max(0, dy):height - max(0, -dy), max(0, dx):width - max(0, -dx)]
+        self.drawn_view = (self.view_row, self.view_col, self.cell_size)
+        
+        top, left = self.view_row, self.view_col
+        bottom, right = top + self.visible_rows, left + self.visible_cols
+        if d_row > 0:
+            self._render_cells(bottom - d_row, bottom, left, right)
+        elif d_row < 0:
+            self._render_cells(top, top - d_row, left, right)
+        if d_col > 0:
+            self._render_cells(top, bottom, right - d_col, right)
+        elif d_col < 0:
+            self._render_cells(top, bottom, left, left - d_col)
+    
+    def _render_cells(self, top, bottom, left, right):
+        """
+        Rasterise viewport cells [top, bottom) x [left, right) into self.pixels
+        
+        Returns:
+            (x, y, pixels) of the block that was redrawn
+        """
+        cell_size = self.cell_size
+        y = (top - self.view_row) * cell_size
+        x = (left - self.view_col) * cell_size
+        block = self.pixels[y:y + (bottom - top) * cell_size, x:x + (right - left) * cell_size]
+        
+        # Cells past the grid edge stay background white
+        view = np.asarray(self.automaton.grid[top:min(bottom, self.automaton.height),
+                                              left:min(right, self.automaton.width)])
+        rows, cols = view.shape
+        block[rows * cell_size:] = 255
+        block[:, cols * cell_size:] = 255
+        if rows and cols:
+            palette = raster.build_palette(self.automaton.ruleset.state_rgb)
+            cells = raster.rasterise(view, palette, cell_size)
+            block[:rows * cell_size, :cols * cell_size] = cells.reshape(rows * cell_size, -1, 3)
+        return x, y, block
+    
+    def _blit(self, x, y, pixels):
+        """Copy a block of pixels into the photo on screen at (x, y)"""
+        # PhotoImage.paste() always sends the whole frame, so the block goes
+        # through a small photo and Tk's own copy instead
+        patch = ImageTk.PhotoImage(Image.fromarray(pixels, 'RGB'))
+        self.photo.tk.call(str(self.photo), "copy", str(patch), "-to", x, y)
     
     def toggle_cell(self, event):
         """Handle left click - start painting"""
@@ -438,10 +281,10 @@ class AutomatonRenderer:
             self.automaton.toggle_cell(row, col)
             self.last_drag_cell = (row, col)
             self.is_dragging_left = True
-            self.draw_grid()
+            self.draw_cells(row, row, col, col)
     
     def on_left_drag(self, event):
-        """Handle left click + drag - paint cells"""
+        """Handle left click + drag - paint every cell along the mouse path"""
         if not self.is_dragging_left or not controller.toggleable():
             return
         
@@ -449,13 +292,36 @@ class AutomatonRenderer:
         col = self.view_col + int(event.x // self.cell_size)
         
         if (row, col) != self.last_drag_cell:
-            if 0 <= row < self.automaton.height and 0 <= col < self.automaton.width:
-                self.automaton.toggle_cell(row, col)
-                self.last_drag_cell = (row, col)
-                self.draw_grid()
+            rows, cols = raster.line_cells(self.last_drag_cell, (row, col))
+            inside = (rows >= 0) & (rows < self.automaton.height) & (cols >= 0) & (cols < self.automaton.width)
+            self.stroke.extend(zip(rows[inside].tolist(), cols[inside].tolist()))
+            self.last_drag_cell = (row, col)
+            
+            # Motion events arrive faster than frames; apply them together when idle
+            if self.stroke_job is None:
+                self.stroke_job = self.canvas.after_idle(self.flush_stroke)
+    
+    def flush_stroke(self):
+        """Apply the buffered stroke to the grid and redraw the cells it touched"""
+        if self.stroke_job is not None:
+            self.canvas.after_cancel(self.stroke_job)
+            self.stroke_job = None
+        if not self.stroke:
+            return
+        
+        cells = np.array(self.stroke)
+        self.stroke = []
+        
+        # A cell crossed twice is toggled twice, as it would be one event at a time
+        flat, times = np.unique(cells[:, 0] * self.automaton.width + cells[:, 1], return_counts=True)
+        rows, cols = np.divmod(flat, self.automaton.width)
+        self.automaton.toggle_cells(rows, cols, times)
+        for run in raster.cell_runs(cells[:, 0], cells[:, 1]):
+            self.draw_cells(*run)
     
     def on_left_release(self, event):
         """Handle left click release - stop painting"""
+        self.flush_stroke()
         self.is_dragging_left = False
         self.last_drag_cell = None
     
@@ -481,10 +347,8 @@ class AutomatonRenderer:
         new_view_row = self.drag_start_view_row + dy_cells
         new_view_col = self.drag_start_view_col + dx_cells
         
-        self.view_row = max(0, min(self.automaton.height - self.visible_rows, new_view_row))
-        self.view_col = max(0, min(self.automaton.width - self.visible_cols, new_view_col))
-        
-        self.draw_grid()
+        self.scroll_to(max(0, min(self.automaton.height - self.visible_rows, new_view_row)),
+                       max(0, min(self.automaton.width - self.visible_cols, new_view_col)))
     
     def on_right_release(self, event):
         """Handle right click release - stop panning"""
@@ -525,16 +389,17 @@ class AutomatonRenderer:
         left_key = keybind_settings.get_keybind('move_left')
         right_key = keybind_settings.get_keybind('move_right')
         
+        view_row, view_col = self.view_row, self.view_col
         if event.keysym == up_key:
-            self.view_row = max(0, self.view_row - 1)
+            view_row = max(0, view_row - 1)
         elif event.keysym == down_key:
-            self.view_row = min(self.automaton.height - self.visible_rows, self.view_row + 1)
+            view_row = min(self.automaton.height - self.visible_rows, view_row + 1)
         elif event.keysym == left_key:
-            self.view_col = max(0, self.view_col - 1)
+            view_col = max(0, view_col - 1)
         elif event.keysym == right_key:
-            self.view_col = min(self.automaton.width - self.visible_cols, self.view_col + 1)
-        self.draw_grid()
-        
+            view_col = min(self.automaton.width - self.visible_cols, view_col + 1)
+        self.scroll_to(view_row, view_col)
+    
     def center_view(self):
         self.view_row = max(0, (self.automaton.height - self.visible_rows) // 2)
         self.view_col = max(0, (self.automaton.width - self.visible_cols) // 2)
@@ -552,6 +417,11 @@ class AutomatonController:
         self.automata_speed = 250
         self.speed_label = None
         self.speed_label_id = None
+        self.recorder = None
+        self.cycle_reported = False
+        self.timer = None
+        self.hud = None
+        self.profile = None
     
     def play(self):
         self.toggle = False
@@ -592,27 +462,42 @@ class AutomatonController:
     
     def neighbours_optimized(self):
         """Use bounding box optimization if beneficial"""
-        bbox = self.automaton.get_active_bounding_box()
-        
-        if bbox is None:
+        if not self.automaton.evolve_auto():
             return
         
-        min_row, max_row, min_col, max_col = bbox
-        bbox_area = (max_row - min_row + 1) * (max_col - min_col + 1)
-        total_area = self.automaton.height * self.automaton.width
-        
-        # Use bounding box ONLY if active region is less than 20% of total grid
-        # Above 20%, the overhead isn't worth it
-        if bbox_area < total_area * 0.2:
-            self.automaton.evolve_with_bounding_box()
-        else:
-            # Use regular fast evolution for larger patterns
-            self.automaton.evolve()
+        if self.recorder:
+            self.recorder.add(self.automaton.generation, self.automaton.grid)
         
         self.renderer.draw_grid()
+        start = time.perf_counter() if self.timer else 0
         if density_control:
             density_control.update_generation()
             density_control.update_counts()
+        self.check_cycle()
+        if self.timer:
+            self.timer.lap("stats", start)
+            self.hud.update()
+    
+    def check_cycle(self):
+        """Report once when the run settles into a still life or oscillator"""
+        period = self.automaton.cycle_period
+        if not period:
+            self.cycle_reported = False
+            return
+        if self.cycle_reported:
+            return
+        
+        self.cycle_reported = True
+        start = self.automaton.cycles.start
+        if period == 1:
+            message = f"Still life from generation {start}"
+        else:
+            message = f"Period {period} cycle from generation {start}"
+        
+        if density_control and density_control.pause_on_cycle.get():
+            self.pause()
+            message += " - paused"
+        self.show_speed_notification(message)
     
     def undo_generation(self, event=None):
         """Undo last generation"""
@@ -648,6 +533,66 @@ class AutomatonController:
                 density_control.update_counts()
             self.show_speed_notification(f"Redo → Gen {self.automaton.generation}")
     
+    def toggle_recording(self, event=None):
+        """Start or stop streaming generations to a timeline file"""
+        if self.recorder:
+            recorder = self.recorder
+            self.recorder = None
+            try:
+                recorder.close()
+            except OSError as e:
+                self.show_speed_notification(f"Recording failed after {recorder.frames_written} frames: {e}")
+            else:
+                message = f"Recording saved ({recorder.frames_written} frames"
+                if recorder.frames_dropped:
+                    message += f", {recorder.frames_dropped} dropped"
+                self.show_speed_notification(message + ")")
+        else:
+            if self.automaton.is_mapped:
+                self.show_speed_notification("Large grids cannot be recorded")
+                return
+            
+            filename = filedialog.asksaveasfilename(
+                defaultextension=".timeline",
+                filetypes=[("Timeline Files", "*.timeline"), ("All Files", "*.*")],
+                title="Record Timeline"
+            )
+            if not filename:
+                return
+            
+            try:
+                self.recorder = timeline.TimelineWriter(filename, self.automaton.grid.shape,
+                                                        self.automaton.ruleset.state_colors)
+            except OSError as e:
+                self.show_speed_notification(f"Record failed: {e}")
+                return
+            self.recorder.add(self.automaton.generation, self.automaton.grid)
+            self.show_speed_notification("Recording...")
+        
+        if density_control:
+            density_control.record_btn.config(text="Stop Recording" if self.recorder else "Start Recording")
+    
+    def toggle_hud(self, event=None):
+        """Show or hide per-phase timings over the grid"""
+        if self.timer:
+            self.hud.clear()
+            self.timer = self.hud = None
+            self.show_speed_notification("Performance HUD off")
+        else:
+            self.timer = phase_timer.PhaseTimer()
+            self.hud = phase_timer.PhaseHUD(self.renderer.canvas, self.timer)
+            self.show_speed_notification("Performance HUD on")
+        
+        # The engine and renderer share the controller's timer
+        self.automaton.timer = self.timer
+        self.renderer.timer = self.timer
+    
+    def toggle_profile(self, event=None):
+        """Profile the next few seconds of the simulation to the profiles folder"""
+        if self.profile is None:
+            self.profile = sampling_profiler.ProfileCapture(self.root, "grid", self.show_speed_notification)
+        self.profile.toggle()
+    
     def increase_speed(self):
         self.automata_speed = max(10, self.automata_speed - 20)
         self.show_speed_notification(f"Speed: {self.automata_speed}ms")
@@ -689,7 +634,7 @@ class AutomatonController:
             self.speed_label_id = None
         
         self.root.after(1000, remove_notification)
-        
+    
     def toggleable(self):
         return self.toggle
 
@@ -726,6 +671,13 @@ class DensityControl:
         self.generation_label = tk.Label(gen_frame, text="0", font=("Arial", 11), bg="#f0f0f0", fg="#0066cc")
         self.generation_label.pack(side="left")
         
+        # Population of each state over the run, as a sparkline
+        self.population_canvas = tk.Canvas(self.top_frame, width=250, height=48, bg="white",
+                                           highlightthickness=1, highlightbackground="#cccccc")
+        self.population_canvas.pack(padx=5, pady=(0, 5))
+        self.population_history = None
+        self.population_chart = None
+        
         sep1 = tk.Frame(self.top_frame, height=2, bg="#cccccc")
         sep1.pack(fill="x", pady=5)
         
@@ -761,10 +713,30 @@ class DensityControl:
                              bg="#4CAF50", fg="white", font=("Arial", 9, "bold"))
         apply_btn.pack(pady=5, fill="x", padx=10)
         
+        # Blank seed draws a new one; the last seed used is shown so a run can be repeated
+        seed_frame = tk.Frame(self.buttons_frame, bg="#f0f0f0")
+        seed_frame.pack(fill="x", padx=10, pady=(0, 2))
+        tk.Label(seed_frame, text="Seed:", bg="#f0f0f0", font=("Arial", 9)).pack(side="left")
+        self.seed_entry = tk.Entry(seed_frame, width=12, font=("Arial", 9))
+        self.seed_entry.pack(side="left", padx=(4, 0))
+        self.last_seed_label = tk.Label(self.buttons_frame, text="Last seed: -", bg="#f0f0f0",
+                                        font=("Arial", 8), fg="#666666")
+        self.last_seed_label.pack(anchor="w", padx=10)
+        
+        self.seed_visible_only = tk.BooleanVar(value=False)
+        visible_check = tk.Checkbutton(self.buttons_frame, text="Seed visible area only",
+                                       variable=self.seed_visible_only, bg="#f0f0f0", font=("Arial", 9))
+        visible_check.pack(anchor="w", padx=10, pady=(0, 5))
+        
         clear_btn = tk.Button(self.buttons_frame, text="Clear All", command=self.clear_grid,
                              bg="#f44336", fg="white", font=("Arial", 9, "bold"))
         clear_btn.pack(fill="x", padx=10, pady=(2, 5))
         
+        self.pause_on_cycle = tk.BooleanVar(value=False)
+        cycle_check = tk.Checkbutton(self.buttons_frame, text="Pause when a cycle is found",
+                                     variable=self.pause_on_cycle, bg="#f0f0f0", font=("Arial", 9))
+        cycle_check.pack(anchor="w", padx=10, pady=(0, 5))
+        
         save_btn = tk.Button(self.buttons_frame, text="Save Grid State", command=self.save_grid_state,
                             bg="#2196F3", fg="white", font=("Arial", 9, "bold"))
         save_btn.pack(fill="x", padx=10, pady=(5, 2))
@@ -773,6 +745,31 @@ class DensityControl:
                             bg="#FF9800", fg="white", font=("Arial", 9, "bold"))
         load_btn.pack(fill="x", padx=10, pady=(2, 5))
         
+        import_btn = tk.Button(self.buttons_frame, text="Import Pattern", command=self.import_pattern,
+                              bg="#009688", fg="white", font=("Arial", 9, "bold"))
+        import_btn.pack(fill="x", padx=10, pady=(5, 2))
+        
+        export_btn = tk.Button(self.buttons_frame, text="Export Pattern", command=self.export_pattern,
+                              bg="#607D8B", fg="white", font=("Arial", 9, "bold"))
+        export_btn.pack(fill="x", padx=10, pady=(2, 5))
+        
+        mapped_btn = tk.Button(self.buttons_frame, text="Open Large Grid", command=self.open_mapped_grid,
+                              bg="#795548", fg="white", font=("Arial", 9, "bold"))
+        mapped_btn.pack(fill="x", padx=10, pady=(2, 5))
+        
+        self.record_btn = tk.Button(self.buttons_frame, text="Start Recording",
+                                    command=lambda: controller.toggle_recording(),
+                                    bg="#E91E63", fg="white", font=("Arial", 9, "bold"))
+        self.record_btn.pack(fill="x", padx=10, pady=(5, 2))
+        
+        replay_btn = tk.Button(self.buttons_frame, text="Replay Timeline", command=self.replay_timeline,
+                              bg="#9C27B0", fg="white", font=("Arial", 9, "bold"))
+        replay_btn.pack(fill="x", padx=10, pady=(2, 2))
+        
+        animation_btn = tk.Button(self.buttons_frame, text="Export Animation", command=self.export_animation,
+                                 bg="#3F51B5", fg="white", font=("Arial", 9, "bold"))
+        animation_btn.pack(fill="x", padx=10, pady=(2, 5))
+        
         self.max_screen_height = screen_height - 20
         self.panel_height = 0
         
@@ -790,12 +787,9 @@ class DensityControl:
         
         if filename:
             try:
-                with open(filename, 'wb') as f:
-                    pickle.dump({
-                        'grid': automaton.grid,
-                        'generation': automaton.generation,
-                        'state_colors': automaton.ruleset.state_colors
-                    }, f)
+                gridstate.save(filename, automaton.grid, automaton.generation,
+                               automaton.ruleset.state_colors,
+                               gridstate.ruleset_hash(automaton.ruleset))
                 controller.show_speed_notification(f"Grid saved!")
             except Exception as e:
                 controller.show_speed_notification(f"Save failed: {e}")
@@ -811,29 +805,178 @@ class DensityControl:
         
         if filename:
             try:
-                with open(filename, 'rb') as f:
-                    data = pickle.load(f)
-                
                 controller.pause()
                 
-                automaton.grid = data['grid']
-                automaton.generation = data['generation']
+                if automaton.is_mapped:
+                    # Stream straight into the mapped file rather than into RAM
+                    grid, header = gridstate.load(filename, out=automaton.grid)
+                else:
+                    grid, header = gridstate.load(filename)
                 
-                current_states = set(automaton.ruleset.state_colors.keys())
-                max_current_state = max(current_states)
+                if automaton.is_mapped or grid.shape == automaton.grid.shape:
+                    automaton.grid = grid.astype(np.int8, copy=False)
+                else:
+                    # Keep the current grid size and copy in the overlapping part
+                    rows = min(grid.shape[0], automaton.height)
+                    cols = min(grid.shape[1], automaton.width)
+                    automaton.grid = np.zeros((automaton.height, automaton.width), dtype=np.int8)
+                    automaton.grid[:rows, :cols] = grid[:rows, :cols]
+                automaton.generation = header["generation"]
                 
-                mask = automaton.grid > max_current_state
-                automaton.grid[mask] = 0
+                current_states = set(automaton.ruleset.state_colors.keys())
+                automaton.clamp_states(max(current_states))
                 
                 self.generation = automaton.generation
                 self.generation_label.config(text=str(self.generation))
                 self.update_counts()
                 renderer.draw_grid()
                 
-                controller.show_speed_notification(f"Grid loaded!")
+                if header.get("ruleset_hash") and header["ruleset_hash"] != gridstate.ruleset_hash(automaton.ruleset):
+                    controller.show_speed_notification("Grid loaded (saved with different rules)")
+                else:
+                    controller.show_speed_notification(f"Grid loaded!")
             except Exception as e:
                 controller.show_speed_notification(f"Load failed: {e}")
     
+    def replay_timeline(self):
+        """Open a recorded timeline and scrub through it on the main canvas"""
+        if not automaton:
+            return
+        
+        filename = filedialog.askopenfilename(
+            filetypes=[("Timeline Files", "*.timeline"), ("All Files", "*.*")],
+            title="Replay Timeline"
+        )
+        
+        if filename:
+            try:
+                reader = timeline.TimelineReader(filename)
+            except (OSError, ValueError) as e:
+                controller.show_speed_notification(f"Replay failed: {e}")
+                return
+            
+            if reader.shape != automaton.grid.shape:
+                reader.close()
+                controller.show_speed_notification("Timeline was recorded on a different grid size")
+                return
+            
+            controller.pause()
+            
+            def show_frame(generation, cells, pointers):
+                # Written in place so a mapped grid stays mapped, which skips
+                # the grid setter; the cycle detector must not keep the old hash
+                automaton.grid[:] = cells
+                automaton.reset_cycle_detection()
+                automaton.generation = generation
+                renderer.draw_grid()
+                self.update_generation()
+                self.update_counts()
+            
+            timeline.TimelinePlayer(self.root, reader, show_frame)
+    
+    def export_animation(self):
+        """Render the next generations to a GIF/APNG/video in a background process"""
+        if not automaton:
+            return
+        
+        if automaton.is_mapped:
+            controller.show_speed_notification("Large grids can't be exported as animations")
+            return
+        
+        controller.pause()
+        grid = automaton.grid.copy()
+        rules = [{"current_state": rule.current_state, "conditions": rule.conditions,
+                  "next_state": rule.next_state, "color": rule.color} for rule in automaton.ruleset.rules]
+        colors = dict(automaton.ruleset.state_colors)
+        
+        def write_job(path, generations):
+            export_animation.write_job(path, "grid", grid, rules, colors, generations,
+                                       neighborhood_type=automaton.neighborhood_type,
+                                       neighborhood_radius=automaton.neighborhood_radius)
+        
+        export_animation.ExportWindow(self.root, grid.shape, write_job, controller.show_speed_notification)
+    
+    def import_pattern(self):
+        """Load an RLE or macrocell pattern into the middle of a cleared grid"""
+        if not automaton:
+            return
+        
+        filename = filedialog.askopenfilename(
+            filetypes=[("Pattern Files", "*.rle *.mc"), ("RLE", "*.rle"), ("Macrocell", "*.mc"), ("All Files", "*.*")],
+            title="Import Pattern"
+        )
+        
+        if filename:
+            try:
+                controller.pause()
+                
+                info = patterns.read_info(filename)
+                automaton.reset()
+                offset = ((automaton.height - info["height"]) // 2, (automaton.width - info["width"]) // 2)
+                patterns.read_pattern(filename, out=automaton.grid, offset=offset)
+                automaton.clamp_states(max(automaton.ruleset.state_colors.keys()))
+                automaton.history.clear()
+                automaton.history.save_state(automaton.grid)
+                
+                self.reset_generation()
+                self.update_counts()
+                renderer.draw_grid()
+                
+                message = f"Imported {info['width']}x{info['height']} pattern"
+                if info["width"] > automaton.width or info["height"] > automaton.height:
+                    message += " (clipped)"
+                controller.show_speed_notification(message)
+            except Exception as e:
+                controller.show_speed_notification(f"Import failed: {e}")
+    
+    def export_pattern(self):
+        if not automaton:
+            return
+        
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".rle",
+            filetypes=[("RLE", "*.rle"), ("Macrocell", "*.mc"), ("All Files", "*.*")],
+            title="Export Pattern"
+        )
+        
+        if filename:
+            try:
+                patterns.write_pattern(filename, automaton.grid)
+                controller.show_speed_notification("Pattern exported!")
+            except Exception as e:
+                controller.show_speed_notification(f"Export failed: {e}")
+    
+    def open_mapped_grid(self):
+        """Run on an uncompressed .gridstate file mapped from disk instead of in RAM"""
+        global TOTAL_ROWS, TOTAL_COLS, mapped_grid_path
+        if not automaton:
+            return
+        
+        filename = filedialog.askopenfilename(
+            filetypes=[("Grid State Files", "*.gridstate"), ("All Files", "*.*")],
+            title="Open Large Grid"
+        )
+        
+        if filename:
+            try:
+                controller.pause()
+                sync_mapped_grid()
+                
+                grid, header = gridstate.open_mapped(filename)
+                automaton.attach_grid(grid, header["generation"])
+                mapped_grid_path = filename
+                TOTAL_ROWS, TOTAL_COLS = grid.shape
+                
+                automaton.clamp_states(max(automaton.ruleset.state_colors.keys()))
+                renderer.center_view()
+                self.update_generation()
+                self.update_counts()
+                renderer.draw_grid()
+                
+                controller.show_speed_notification(f"Mapped {TOTAL_ROWS}x{TOTAL_COLS} grid")
+            except Exception as e:
+                controller.show_speed_notification(f"Open failed: {e}")
+    
     def toggle_panel(self):
         screen_width = self.root.winfo_screenwidth()
         
@@ -874,6 +1017,12 @@ class DensityControl:
         states = sorted(automaton.ruleset.state_colors.keys())
         num_states = len(states)
         
+        if self.population_chart:
+            self.population_chart.clear()
+        self.population_history = population_series.PopulationSeries(states)
+        self.population_chart = population_series.PopulationChart(
+            self.population_canvas, self.population_history, {state: automaton.ruleset.get_color(state) for state in states})
+        
         sizes = self.calculate_optimal_sizes(num_states)
         
         if sizes['use_scrollbar']:
@@ -933,13 +1082,15 @@ class DensityControl:
         if not automaton:
             return
         
-        state_counts = Counter()
-        unique, counts = np.unique(automaton.grid, return_counts=True)
-        state_counts = dict(zip(unique, counts))
+        state_counts = automaton.count_states()
         
         for state, label in self.state_count_labels.items():
             count = state_counts.get(state, 0)
             label.config(text=str(count))
+        
+        if self.population_history:
+            self.population_history.add(automaton.generation, state_counts)
+            self.population_chart.update()
     
     def update_generation(self):
         self.generation = automaton.generation
@@ -948,6 +1099,8 @@ class DensityControl:
     def reset_generation(self):
         self.generation = 0
         self.generation_label.config(text="0")
+        if self.population_history:
+            self.population_history.reset()
     
     def get_density_ratios(self):
         ratios = {}
@@ -959,12 +1112,31 @@ class DensityControl:
                 ratios[state] = 0
         return ratios
     
+    def get_seed(self):
+        """Seed typed by the user, or None to draw a new one"""
+        try:
+            return int(self.seed_entry.get().strip()) & 0xFFFFFFFF
+        except ValueError:
+            return None
+    
+    def seed_region(self):
+        """The visible cells as (min_row, max_row, min_col, max_col) when seeding only those"""
+        if not self.seed_visible_only.get():
+            return None
+        max_row = min(automaton.height, renderer.view_row + renderer.visible_rows) - 1
+        max_col = min(automaton.width, renderer.view_col + renderer.visible_cols) - 1
+        return (renderer.view_row, max_row, renderer.view_col, max_col)
+    
+    def reseed(self):
+        seed = automaton.seed_density(self.get_density_ratios(), self.get_seed(), self.seed_region())
+        if seed is not None:
+            self.last_seed_label.config(text=f"Last seed: {seed}")
+    
     def apply_density(self):
         was_running = controller.automata
         controller.pause()
         
-        ratios = self.get_density_ratios()
-        apply_density_internal(ratios)
+        self.reseed()
         self.reset_generation()
         renderer.draw_grid()
         self.update_counts()
@@ -1033,28 +1205,28 @@ def setup_in_frame(root_win, container, back_func, sparse_grid=False, wrapping=T
     
     def zoom_handler(event):
         renderer.zoom(event)
-
+    
     zoom_in_key = keybind_settings.get_keybind('zoom_in')
     zoom_out_key = keybind_settings.get_keybind('zoom_out')
-
+    
     if zoom_in_key == "MouseWheel_Up" or zoom_out_key == "MouseWheel_Down":
         root.bind("<MouseWheel>", zoom_handler)
         root.bind("<Button-5>", zoom_handler)
         root.bind("<Button-4>", zoom_handler)
-
+    
     if zoom_in_key not in ["MouseWheel_Up", "MouseWheel_Down"]:
         root.bind(f"<{zoom_in_key}>", zoom_handler)
     if zoom_out_key not in ["MouseWheel_Up", "MouseWheel_Down"]:
         root.bind(f"<{zoom_out_key}>", zoom_handler)
-
+    
     def move_handler(event):
         renderer.move(event)
-
+    
     root.bind(f"<{keybind_settings.get_keybind('move_up')}>", move_handler)
     root.bind(f"<{keybind_settings.get_keybind('move_down')}>", move_handler)
     root.bind(f"<{keybind_settings.get_keybind('move_left')}>", move_handler)
     root.bind(f"<{keybind_settings.get_keybind('move_right')}>", move_handler)
-
+    
     root.bind(f"<{keybind_settings.get_keybind('play_pause')}>", controller.onoff)
     root.bind(f"<{keybind_settings.get_keybind('reset')}>", controller.reset)
     root.bind(f"<{keybind_settings.get_keybind('back')}>", go_back)
@@ -1070,8 +1242,12 @@ def setup_in_frame(root_win, container, back_func, sparse_grid=False, wrapping=T
     
     root.bind("<period>", lambda e: controller.step_forward())
     root.bind("<greater>", lambda e: controller.step_forward())
-
     
+    root.bind(f"<{keybind_settings.get_keybind('record')}>", controller.toggle_recording)
+    root.bind(f"<{keybind_settings.get_keybind('hud')}>", controller.toggle_hud)
+    root.bind(f"<{keybind_settings.get_keybind('profile')}>", controller.toggle_profile)
+
+
 def draw_grid():
     global renderer, density_control
     if renderer and root:
@@ -1085,6 +1261,7 @@ def draw_grid():
 def change_rules(rules, colors):
     if automaton:
         automaton.ruleset.change_rules(rules, colors)
+        automaton.reset_cycle_detection()
         if density_control:
             density_control.update_states()
             density_control.update_counts()
@@ -1095,39 +1272,40 @@ def change_rules(rules, colors):
             if valid_states:
                 max_valid_state = max(valid_states)
                 
-                invalid_mask = automaton.grid > max_valid_state
-                automaton.grid[invalid_mask] = 0
+                automaton.clamp_states(max_valid_state)
                 
                 if renderer:
                     renderer.draw_grid()
                     density_control.update_counts()
 
 
-def apply_density_internal(density_ratios):
-    total_weight = sum(density_ratios.values())
-    if total_weight == 0:
-        return
-    
-    weighted_states = []
-    for state, weight in density_ratios.items():
-        weighted_states.extend([state] * weight)
-    
-    random_states = np.random.choice(weighted_states, size=(automaton.height, automaton.width))
-    automaton.grid = random_states.astype(np.int8)
-
-
 def apply_current_density():
     if density_control:
-        ratios = density_control.get_density_ratios()
-        apply_density_internal(ratios)
+        density_control.reseed()
+
+
+def sync_mapped_grid():
+    """Flush a memory-mapped grid and record its generation in the file header"""
+    if automaton and automaton.is_mapped and mapped_grid_path:
+        automaton.grid.flush()
+        gridstate.update_header(mapped_grid_path, generation=automaton.generation)
 
 
 def go_back(event):
-    global grid_frame, controller, density_control, automaton, renderer
+    global grid_frame, controller, density_control, automaton, renderer, mapped_grid_path
     
     if controller:
         controller.automata = False
         controller.pause()
+        if controller.recorder:
+            controller.toggle_recording()
+        if controller.profile:
+            controller.profile.cancel()
+    if renderer:
+        renderer.scheduler.cancel()
+    
+    sync_mapped_grid()
+    mapped_grid_path = None
     
     if grid_frame:
         grid_frame.pack_forget()
@@ -5,14 +5,21 @@ Pointers move around the grid, changing cell states based on rules
 """
 
 import tkinter as tk
-from collections import Counter
-import operator
-import random
 import time
 import copy
+from tkinter import filedialog
+import numpy as np
+import export_animation
+import frame_scheduler
+import population_series
+import raster
+import keybind_settings
+import sampling_profiler
+import timeline
+from pointer_engine import Pointer, PointerWorld, closest_direction
 
 try:
-    from PIL import Image, ImageTk, ImageDraw
+    from PIL import Image, ImageTk
     PIL_AVAILABLE = True
 except ImportError:
     PIL_AVAILABLE = False
@@ -26,7 +33,7 @@ root = None
 canvas = None
 TOTAL_ROWS = 0
 TOTAL_COLS = 0
-CELLS = None
+world = None  # pointer_engine.PointerWorld holding cells, pointers and rules
 CELL_SIZE = 25
 MIN_CELL_SIZE = 4
 MAX_CELL_SIZE = 50
@@ -36,28 +43,41 @@ row_view = 0
 col_view = 0
 toggle = True
 automata = False
-RULES = []
 STATE_COLORS = {0: "#ffffff", 1: "#808080"}
 STATE_RGB = {0: (255, 255, 255), 1: (128, 128, 128)}
 MAX_POINTERS = 1000
-pointers = []
-generation = 0
 density_control = None
 cell_rectangles = {}
+drawn_view = None  # (row_view, col_view, CELL_SIZE) that cell_rectangles were drawn at
+arrow_images = {}  # (CELL_SIZE, direction) -> PhotoImage of the arrow sprite
+arrow_items = []  # [canvas image item, (x, y, image) it shows or None when hidden]
+scheduler = None  # frame_scheduler.FrameScheduler batching redraws into frames
 back_callback = None
 show_arrows = False
 simulation_speed = 100
+steps_per_tick = 1  # Generations run per play tick; above 1 they run as one batch
+auto_steps = False  # Tune steps_per_tick to fill FRAME_BUDGET_MS each tick
 use_sparse = False
 wrapping_enabled = True
+recorder = None  # timeline.TimelineWriter while recording
+cycle_reported = False  # True once the current cycle has been announced
+profile_capture = None  # sampling_profiler.ProfileCapture, created on first use
 
 
 # Edge buffer for non-wrapping mode
 EDGE_BUFFER = 100  # Extra cells beyond viewport on each side
 
+# Batched play: stepping time aimed for per tick when auto-tuning, and the
+# most generations one tick may run
+FRAME_BUDGET_MS = 12
+MAX_STEPS_PER_TICK = 1 << 22
+
 # Drag state
 is_dragging_left = False
 is_dragging_right = False
 last_drag_cell = None
+stroke = []  # Cells crossed by the paint stroke since the last flush
+stroke_job = None
 drag_start_x = 0
 drag_start_y = 0
 drag_start_view_row = 0
@@ -83,26 +103,28 @@ class GridState:
         for p in pointers_list:
             new_p = Pointer(p.row, p.col, p.direction, p.user_created)
             new_p.visible = p.visible
+            new_p.count = p.count
             self.pointers.append(new_p)
         
         self.generation = gen
     
     def restore(self):
-        """Restore this state to the global variables"""
-        global CELLS, pointers, generation
-        
+        """Restore this state into the world"""
         if use_sparse:
-            CELLS = dict(self.cells)
+            world.cells = dict(self.cells)
         else:
-            CELLS = [row[:] for row in self.cells]
+            world.cells = [row[:] for row in self.cells]
         
-        pointers.clear()
+        pointers = []
         for p in self.pointers:
             new_p = Pointer(p.row, p.col, p.direction, p.user_created)
             new_p.visible = p.visible
+            new_p.count = p.count
             pointers.append(new_p)
+        world.set_pointers(pointers)
         
-        generation = self.generation
+        world.generation = self.generation
+        world.recount()
 
 
 def save_state():
@@ -114,7 +136,7 @@ def save_state():
         history = history[:history_index + 1]
     
     # Add new state
-    state = GridState(CELLS, pointers, generation)
+    state = GridState(world.cells, world.pointers, world.generation)
     history.append(state)
     
     # Limit history size
@@ -142,7 +164,7 @@ def undo(event=None):
         density_control.update_counts()
     
     draw_grid()
-    show_notification(f"Undo → Gen {generation}")
+    show_notification(f"Undo → Gen {world.generation}")
 
 
 def redo(event=None):
@@ -163,25 +185,27 @@ def redo(event=None):
         density_control.update_counts()
     
     draw_grid()
-    show_notification(f"Redo → Gen {generation}")
+    show_notification(f"Redo → Gen {world.generation}")
 
 
 def single_step(event=None):
     """Execute one generation step"""
     if not automata:
         step_generation()
-        show_notification(f"Step +1 → Gen {generation}")
+        show_notification(f"Step +1 → Gen {world.generation}")
 
 
 def step_generation():
     """Execute one generation (called by both play loop and single-step)"""
-    global generation
+    if not world.step_generation():
+        pause()
+        show_notification(f"Pointer limit reached ({MAX_POINTERS}) - simulation paused")
+    else:
+        check_cycle()
     
-    for pointer in pointers:
-        if pointer.visible:
-            pointer.step(RULES)
+    if recorder:
+        recorder.add(world.generation, world.to_array(), timeline.pointers_to_array(world.pointers))
     
-    generation += 1
     save_state()
     
     if density_control:
@@ -191,6 +215,119 @@ def step_generation():
     draw_grid()
 
 
+def step_batch(steps):
+    """
+    Run steps generations as one batch, then update the panel and screen once
+    
+    Unlike step_generation, no undo state is saved and a recording gets
+    one frame per batch rather than one per generation.
+    """
+    if not world.advance(steps):
+        pause()
+        show_notification(f"Pointer limit reached ({MAX_POINTERS}) - simulation paused")
+    else:
+        check_cycle()
+    
+    if recorder:
+        recorder.add(world.generation, world.to_array(), timeline.pointers_to_array(world.pointers))
+    
+    if density_control:
+        density_control.update_generation()
+        density_control.update_counts()
+    
+    draw_grid()
+
+
+def check_cycle():
+    """Report once when cells and pointers return to an earlier state"""
+    global cycle_reported
+    
+    period = world.cycle_period
+    if not period:
+        cycle_reported = False
+        return
+    if cycle_reported:
+        return
+    
+    cycle_reported = True
+    # Batched play only checks at batch ends, so period may be a multiple
+    shortest = world.shortest_period()
+    if shortest:
+        message = f"Period {shortest} cycle from generation {world.cycles.start}"
+    else:
+        message = f"Cycle with a period dividing {period} from generation {world.cycles.start}"
+    if density_control and density_control.pause_on_cycle.get():
+        pause()
+        message += " - paused"
+    show_notification(message)
+
+
+def toggle_profile(event=None):
+    """Profile the next few seconds of the simulation to the profiles folder"""
+    global profile_capture
+    
+    if profile_capture is None:
+        profile_capture = sampling_profiler.ProfileCapture(root, "pointer", show_notification)
+    profile_capture.toggle()
+
+
+def toggle_recording(event=None):
+    """Start or stop streaming generations to a timeline file"""
+    global recorder
+    
+    if recorder:
+        finished = recorder
+        recorder = None
+        try:
+            finished.close()
+        except OSError as e:
+            show_notification(f"Recording failed after {finished.frames_written} frames: {e}")
+        else:
+            message = f"Recording saved ({finished.frames_written} frames"
+            if finished.frames_dropped:
+                message += f", {finished.frames_dropped} dropped"
+            show_notification(message + ")")
+    else:
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".timeline",
+            filetypes=[("Timeline Files", "*.timeline"), ("All Files", "*.*")],
+            title="Record Timeline"
+        )
+        if not filename:
+            return
+        
+        try:
+            recorder = timeline.TimelineWriter(filename, (TOTAL_ROWS, TOTAL_COLS), STATE_COLORS)
+        except OSError as e:
+            show_notification(f"Record failed: {e}")
+            return
+        recorder.add(world.generation, world.to_array(), timeline.pointers_to_array(world.pointers))
+        show_notification("Recording...")
+    
+    if density_control:
+        density_control.record_btn.config(text="Stop Recording" if recorder else "Start Recording")
+
+
+def show_replay_frame(generation, cells, pointers):
+    """Load one timeline frame into the world and draw it"""
+    if use_sparse:
+        rows, cols = np.nonzero(cells)
+        world.cells = dict(zip(zip(rows.tolist(), cols.tolist()), cells[rows, cols].tolist()))
+    else:
+        world.cells = cells.tolist()
+    world.recount()
+    
+    world.set_pointers([] if pointers is None else
+                       [Pointer(row, col, direction, count=count)
+                        for row, col, direction, count in pointers.tolist()])
+    world.generation = generation
+    
+    if density_control:
+        density_control.update_generation()
+        density_control.update_counts()
+    draw_grid()
+
+
 def show_notification(message):
     """Show temporary notification on canvas"""
     # Clear any existing notification
@@ -224,34 +361,22 @@ def show_notification(message):
 
 def get_cell(row, col):
     """Get cell state - works for both sparse and dense"""
-    if use_sparse:
-        return CELLS.get((row, col), 0)
-    else:
-        if 0 <= row < TOTAL_ROWS and 0 <= col < TOTAL_COLS:
-            return CELLS[row][col]
-        return 0
+    return world.get_cell(row, col)
 
 
 def set_cell(row, col, state):
     """Set cell state - works for both sparse and dense"""
-    if use_sparse:
-        if state == 0:
-            if (row, col) in CELLS:
-                del CELLS[(row, col)]
-        else:
-            CELLS[(row, col)] = state
-    else:
-        if 0 <= row < TOTAL_ROWS and 0 <= col < TOTAL_COLS:
-            CELLS[row][col] = state
+    world.set_cell(row, col, state)
+    world.reset_cycle_detection()
 
 
 def setup_in_frame(root_win, container, back_func, min_cell_size=4, max_cell_size=50, 
-                   sparse_mode=False, wrapping=True):
+                   sparse_mode=False, wrapping=True, merge_duplicates=False):
     """Initialize pointer automaton interface"""
-    global root, canvas, TOTAL_ROWS, TOTAL_COLS, CELLS, CELL_SIZE, ROWS, COLS
-    global row_view, col_view, toggle, automata, pointers, density_control
+    global root, canvas, TOTAL_ROWS, TOTAL_COLS, world, CELL_SIZE, ROWS, COLS
+    global row_view, col_view, toggle, automata, density_control
     global MIN_CELL_SIZE, MAX_CELL_SIZE, back_callback, pointer_frame
-    global use_sparse, wrapping_enabled, history, history_index
+    global use_sparse, wrapping_enabled, history, history_index, scheduler
     
     root = root_win
     back_callback = back_func
@@ -285,10 +410,9 @@ def setup_in_frame(root_win, container, back_func, min_cell_size=4, max_cell_siz
         TOTAL_COLS = viewport_cols + (2 * EDGE_BUFFER)
     
     # Initialize storage based on mode
-    if use_sparse:
-        CELLS = {}
-    else:
-        CELLS = [[0 for _ in range(TOTAL_COLS)] for _ in range(TOTAL_ROWS)]
+    world = PointerWorld(TOTAL_ROWS, TOTAL_COLS, wrapping=wrapping_enabled, 
+                         sparse=use_sparse, max_pointers=MAX_POINTERS,
+                         merge_duplicates=merge_duplicates)
 
     ROWS = (root.winfo_screenheight() // CELL_SIZE) + 1
     COLS = (root.winfo_screenwidth() // CELL_SIZE) + 1
@@ -305,12 +429,15 @@ def setup_in_frame(root_win, container, back_func, min_cell_size=4, max_cell_siz
 
     canvas = tk.Canvas(pointer_frame, width=COLS*CELL_SIZE, height=ROWS*CELL_SIZE, bg="white")
     canvas.pack()
+    arrow_images.clear()
+    arrow_items.clear()
+    scheduler = frame_scheduler.FrameScheduler(canvas, redraw)
     
     # Place initial pointer at center of VIEWPORT (not grid)
     initial_row = row_view + ROWS // 2
     initial_col = col_view + COLS // 2
     initial_pointer = Pointer(initial_row, initial_col, user_created=True)
-    pointers.append(initial_pointer)
+    world.add_pointer(initial_pointer)
     
     # Save initial state
     save_state()
@@ -343,132 +470,8 @@ def setup_in_frame(root_win, container, back_func, min_cell_size=4, max_cell_siz
     root.bind("<Control-y>", redo)
     root.bind("<period>", single_step)
     root.bind("<greater>", single_step)
-
-
-class Pointer:
-    """Represents a pointer that moves around the grid"""
-    
-    def __init__(self, row, col, direction=0, user_created=False):
-        self.row = row
-        self.col = col
-        self.direction = direction
-        self.user_created = user_created
-        self.visible = True
-        self.arrow_id = None
-    
-    def step(self, rules):
-        """Execute one step: apply rules then move forward"""
-        current_state = get_cell(self.row, self.col)
-        
-        applicable_rules = [r for r in rules if r["current_state"] == current_state]
-        
-        for rule in applicable_rules:
-            if rule["type"] == "rotation":
-                self.direction = (self.direction + rule["angle"]) % 360
-            
-            elif rule["type"] == "face":
-                self.direction = rule["direction"]
-            
-            elif rule["type"] == "movement":
-                if rule["relative"]:
-                    dx = rule["x"]
-                    dy = rule["y"]
-                    if wrapping_enabled:
-                        self.row = (self.row + dy) % TOTAL_ROWS
-                        self.col = (self.col + dx) % TOTAL_COLS
-                    else:
-                        self.row = max(0, min(TOTAL_ROWS - 1, self.row + dy))
-                        self.col = max(0, min(TOTAL_COLS - 1, self.col + dx))
-                else:
-                    if wrapping_enabled:
-                        self.row = rule["y"] % TOTAL_ROWS
-                        self.col = rule["x"] % TOTAL_COLS
-                    else:
-                        self.row = max(0, min(TOTAL_ROWS - 1, rule["y"]))
-                        self.col = max(0, min(TOTAL_COLS - 1, rule["x"]))
-            
-            elif rule["type"] == "clone":
-                # CHECK LIMIT BEFORE CREATING
-                if len(pointers) < MAX_POINTERS:
-                    new_pointer = Pointer(self.row, self.col, self.direction)
-                    pointers.append(new_pointer)
-                else:
-                    pause()
-                    show_notification(f"Pointer limit reached ({MAX_POINTERS}) - simulation paused")
-            
-            if rule["next_state"] is not None:
-                set_cell(self.row, self.col, rule["next_state"])
-        
-        # Move forward in current direction
-        direction_map = {
-            0: (0, -1),
-            90: (1, 0),
-            180: (0, 1),
-            270: (-1, 0),
-            45: (1, -1),
-            135: (1, 1),
-            225: (-1, 1),
-            315: (-1, -1)
-        }
-        
-        if self.direction in direction_map:
-            dc, dr = direction_map[self.direction]
-        else:
-            closest = min(direction_map.keys(), key=lambda x: abs(x - self.direction))
-            dc, dr = direction_map[closest]
-        
-        # Apply movement with wrapping check
-        if wrapping_enabled:
-            self.row = (self.row + dr) % TOTAL_ROWS
-            self.col = (self.col + dc) % TOTAL_COLS
-        else:
-            # Clamp to grid bounds (including buffer zone)
-            self.row = max(0, min(TOTAL_ROWS - 1, self.row + dr))
-            self.col = max(0, min(TOTAL_COLS - 1, self.col + dc))
-    
-    def rotate(self):
-        self.direction = (self.direction + 45) % 360
-        if self.direction == 0:
-            self.visible = False
-    
-    def draw_arrow(self):
-        """Draw arrow on canvas with tag for easy deletion"""
-        if not self.visible or not show_arrows:
-            return
-        
-        if not (row_view <= self.row < row_view + ROWS and 
-                col_view <= self.col < col_view + COLS):
-            return
-        
-        x = (self.col - col_view) * CELL_SIZE + CELL_SIZE // 2
-        y = (self.row - row_view) * CELL_SIZE + CELL_SIZE // 2
-        
-        arrow_length = min(CELL_SIZE/2, 30)
-        arrow_width = arrow_length * 0.3
-        
-        import math
-        angle_rad = math.radians(self.direction)
-        
-        tip_x = x + arrow_length * math.sin(angle_rad)
-        tip_y = y - arrow_length * math.cos(angle_rad)
-        
-        base_angle1 = angle_rad + math.radians(150)
-        base_angle2 = angle_rad - math.radians(150)
-        
-        base1_x = x + arrow_width * math.sin(base_angle1)
-        base1_y = y - arrow_width * math.cos(base_angle1)
-        
-        base2_x = x + arrow_width * math.sin(base_angle2)
-        base2_y = y - arrow_width * math.cos(base_angle2)
-        
-        # Draw filled triangle with tag for easy deletion
-        self.arrow_id = canvas.create_polygon(
-            tip_x, tip_y,
-            base1_x, base1_y,
-            base2_x, base2_y,
-            fill="red", outline="darkred", width=2,
-            tags="pointer_arrow"  # Add tag so all arrows can be deleted at once
-        )
+    root.bind(f"<{keybind_settings.get_keybind('record')}>", toggle_recording)
+    root.bind(f"<{keybind_settings.get_keybind('profile')}>", toggle_profile)
 
 
 class DensityControl:
@@ -503,6 +506,13 @@ class DensityControl:
         self.generation_label = tk.Label(gen_frame, text="0", font=("Arial", 11), bg="#f0f0f0", fg="#0066cc")
         self.generation_label.pack(side="left")
         
+        # Population of each state over the run, as a sparkline
+        self.population_canvas = tk.Canvas(self.top_frame, width=250, height=48, bg="white",
+                                           highlightthickness=1, highlightbackground="#cccccc")
+        self.population_canvas.pack(padx=5, pady=(0, 5))
+        self.population_history = None
+        self.population_chart = None
+        
         pointer_frame = tk.Frame(self.top_frame, bg="#f0f0f0")
         pointer_frame.pack(fill="x", pady=(0, 5))
         
@@ -546,11 +556,129 @@ class DensityControl:
                              bg="#f44336", fg="white", font=("Arial", 9, "bold"))
         clear_btn.pack(fill="x", padx=10, pady=5)
         
+        self.pause_on_cycle = tk.BooleanVar(value=False)
+        cycle_check = tk.Checkbutton(self.buttons_frame, text="Pause when a cycle is found",
+                                     variable=self.pause_on_cycle, bg="#f0f0f0", font=("Arial", 9))
+        cycle_check.pack(anchor="w", padx=10, pady=(0, 5))
+        
+        # Generations per play tick; more than one runs as a batch with a
+        # single redraw, and Auto sizes the batch to the frame budget
+        steps_frame = tk.Frame(self.buttons_frame, bg="#f0f0f0")
+        steps_frame.pack(fill="x", padx=10, pady=(0, 5))
+        tk.Label(steps_frame, text="Steps/frame:", bg="#f0f0f0", font=("Arial", 9)).pack(side="left")
+        self.steps_entry = tk.Entry(steps_frame, width=9, font=("Arial", 9))
+        self.steps_entry.insert(0, str(steps_per_tick))
+        self.steps_entry.pack(side="left", padx=(4, 0))
+        self.steps_entry.bind("<Return>", self.apply_steps_per_tick)
+        self.steps_entry.bind("<FocusOut>", self.apply_steps_per_tick)
+        self.auto_steps = tk.BooleanVar(value=auto_steps)
+        auto_check = tk.Checkbutton(steps_frame, text="Auto", variable=self.auto_steps,
+                                    command=self.apply_steps_per_tick, bg="#f0f0f0", font=("Arial", 9))
+        auto_check.pack(side="left", padx=(4, 0))
+        
+        # Run many generations without drawing; a lone ant's highway is
+        # applied whole periods at a time
+        skip_frame = tk.Frame(self.buttons_frame, bg="#f0f0f0")
+        skip_frame.pack(fill="x", padx=10, pady=(0, 5))
+        self.skip_entry = tk.Entry(skip_frame, width=10, font=("Arial", 9))
+        self.skip_entry.insert(0, "10000")
+        self.skip_entry.pack(side="left")
+        skip_btn = tk.Button(skip_frame, text="Skip Ahead", command=self.skip_ahead,
+                             bg="#607D8B", fg="white", font=("Arial", 9, "bold"))
+        skip_btn.pack(side="left", fill="x", expand=True, padx=(4, 0))
+        
+        self.record_btn = tk.Button(self.buttons_frame, text="Start Recording", command=toggle_recording,
+                                    bg="#E91E63", fg="white", font=("Arial", 9, "bold"))
+        self.record_btn.pack(fill="x", padx=10, pady=(5, 2))
+        
+        replay_btn = tk.Button(self.buttons_frame, text="Replay Timeline", command=self.replay_timeline,
+                              bg="#9C27B0", fg="white", font=("Arial", 9, "bold"))
+        replay_btn.pack(fill="x", padx=10, pady=(2, 2))
+        
+        animation_btn = tk.Button(self.buttons_frame, text="Export Animation", command=self.export_animation,
+                                 bg="#3F51B5", fg="white", font=("Arial", 9, "bold"))
+        animation_btn.pack(fill="x", padx=10, pady=(2, 5))
+        
         self.max_screen_height = screen_height - 20
         self.panel_height = 0
         
         self.scrollable_frame.bind("<Configure>", self.update_scroll_region)
     
+    def apply_steps_per_tick(self, event=None):
+        try:
+            steps = int(self.steps_entry.get().strip())
+        except ValueError:
+            steps = steps_per_tick
+        set_steps_per_tick(steps, self.auto_steps.get())
+        self.show_steps_per_tick()
+    
+    def show_steps_per_tick(self):
+        if self.steps_entry.get() != str(steps_per_tick):
+            self.steps_entry.delete(0, "end")
+            self.steps_entry.insert(0, str(steps_per_tick))
+    
+    def skip_ahead(self):
+        """Advance by the number of generations in the skip entry"""
+        try:
+            generations = int(self.skip_entry.get().strip())
+        except ValueError:
+            show_notification("Enter a number of generations to skip")
+            return
+        if generations <= 0:
+            return
+        
+        pause()
+        start = time.perf_counter()
+        if not world.advance(generations):
+            show_notification(f"Pointer limit reached ({MAX_POINTERS}) - skip stopped")
+        else:
+            show_notification(f"Skipped to Gen {world.generation} in {time.perf_counter() - start:.2f}s")
+            check_cycle()
+        
+        save_state()
+        self.update_generation()
+        self.update_counts()
+        draw_grid()
+    
+    def replay_timeline(self):
+        filename = filedialog.askopenfilename(
+            filetypes=[("Timeline Files", "*.timeline"), ("All Files", "*.*")],
+            title="Replay Timeline"
+        )
+        
+        if filename:
+            try:
+                reader = timeline.TimelineReader(filename)
+            except (OSError, ValueError) as e:
+                show_notification(f"Replay failed: {e}")
+                return
+            
+            if reader.shape != (TOTAL_ROWS, TOTAL_COLS):
+                reader.close()
+                show_notification("Timeline was recorded on a different grid size")
+                return
+            
+            pause()
+            timeline.TimelinePlayer(self.root, reader, show_replay_frame)
+    
+    def export_animation(self):
+        """Render the next generations to a GIF/APNG/video in a background process"""
+        if not world:
+            return
+        
+        pause()
+        cells = world.to_array()
+        pointers = timeline.pointers_to_array(world.pointers)
+        rules = copy.deepcopy(world.rules)
+        colors = dict(STATE_COLORS)
+        
+        def write_job(path, generations):
+            export_animation.write_job(path, "pointer", cells, rules, colors, generations,
+                                       pointers=pointers, wrapping=world.wrapping,
+                                       merge_duplicates=world.merge_duplicates)
+        
+        export_animation.ExportWindow(self.root, cells.shape, write_job, show_notification)
+    
     def toggle_panel(self):
         screen_width = self.root.winfo_screenwidth()
         
@@ -594,6 +722,12 @@ class DensityControl:
         states = sorted(STATE_COLORS.keys())
         num_states = len(states)
         
+        if self.population_chart:
+            self.population_chart.clear()
+        self.population_history = population_series.PopulationSeries(states)
+        self.population_chart = population_series.PopulationChart(self.population_canvas, self.population_history,
+                                                                  dict(STATE_COLORS))
+        
         sizes = self.calculate_optimal_sizes(num_states)
         
         if sizes['use_scrollbar']:
@@ -641,48 +775,45 @@ class DensityControl:
         self.scroll_canvas.configure(scrollregion=self.scroll_canvas.bbox("all"))
     
     def update_counts(self):
-        state_counts = Counter()
-        
-        if use_sparse:
-            for state in CELLS.values():
-                state_counts[state] += 1
-        else:
-            for row in CELLS:
-                for cell in row:
-                    state_counts[cell] += 1
+        state_counts = world.count_states()
         
         for state, label in self.state_count_labels.items():
             count = state_counts.get(state, 0)
             label.config(text=str(count))
         
-        self.pointer_label.config(text=str(len(pointers)))
+        if self.population_history:
+            self.population_history.add(world.generation, state_counts)
+            self.population_chart.update()
+        
+        # Merged duplicates are one entry standing for several pointers
+        population = world.population
+        if population == len(world.pointers):
+            self.pointer_label.config(text=str(population))
+        else:
+            self.pointer_label.config(text=f"{population} ({len(world.pointers)} groups)")
     
     def update_generation(self):
-        self.generation_label.config(text=str(generation))
+        self.generation_label.config(text=str(world.generation))
     
     def reset_generation(self):
-        global generation
-        generation = 0
+        world.generation = 0
         self.generation_label.config(text="0")
+        if self.population_history:
+            self.population_history.reset()
     
     def clear_grid(self):
-        global automata, CELLS, pointers, generation
+        global automata, history_index
         was_running = automata
         pause()
         
-        if use_sparse:
-            CELLS.clear()
-        else:
-            CELLS = [[0 for _ in range(TOTAL_COLS)] for _ in range(TOTAL_ROWS)]
-        
-        generation = 0
+        world.clear_cells()
+        world.generation = 0
         
         # Place pointer at center of screen
         initial_row = row_view + ROWS // 2
         initial_col = col_view + COLS // 2
         initial_pointer = Pointer(initial_row, initial_col, user_created=True)
-        pointers.clear()
-        pointers.append(initial_pointer)
+        world.set_pointers([initial_pointer])
         
         # Reset history
         history.clear()
@@ -694,6 +825,52 @@ class DensityControl:
         draw_grid()
 
 
+def arrow_image(direction):
+    """Arrow sprite for the current cell size, rasterised on first use"""
+    direction = closest_direction(direction)
+    image = arrow_images.get((CELL_SIZE, direction))
+    if image is None:
+        sprite = raster.arrow_sprite(CELL_SIZE, direction)
+        image = arrow_images[(CELL_SIZE, direction)] = ImageTk.PhotoImage(Image.fromarray(sprite, "RGBA"))
+    return image
+
+
+def draw_arrows():
+    """
+    Show an arrow on every visible pointer in the viewport
+    
+    Arrows are canvas image items sharing one sprite per (cell size,
+    direction). Items from the last frame are moved and re-pointed rather
+    than deleted and created again, and spare ones are hidden.
+    """
+    used = 0
+    if show_arrows:
+        for pointer in world.pointers_within(row_view, row_view + ROWS - 1, col_view, col_view + COLS - 1):
+            if not pointer.visible:
+                continue
+            
+            placed = ((pointer.col - col_view) * CELL_SIZE, (pointer.row - row_view) * CELL_SIZE,
+                      arrow_image(pointer.direction))
+            if used == len(arrow_items):
+                item = canvas.create_image(placed[0], placed[1], image=placed[2], anchor="nw",
+                                           tags="pointer_arrow")
+                arrow_items.append([item, placed])
+            else:
+                item, shown = arrow_items[used]
+                if shown != placed:
+                    canvas.coords(item, placed[0], placed[1])
+                    canvas.itemconfigure(item, image=placed[2], state="normal")
+                    arrow_items[used][1] = placed
+            used += 1
+    
+    for entry in arrow_items[used:]:
+        if entry[1] is not None:
+            canvas.itemconfigure(entry[0], state="hidden")
+            entry[1] = None
+    canvas.tag_raise("pointer_arrow")
+    canvas.tag_raise("notification")
+
+
 def get_state_color(state):
     return STATE_COLORS.get(state, "#ffffff")
 
@@ -712,11 +889,41 @@ def update_state_rgb():
 
 
 def draw_grid():
+    """Redraw the whole view at the next frame"""
+    if scheduler:
+        scheduler.request_full()
+
+
+def mark_cells(cells):
+    """Redraw just the given (row, col) cells at the next frame"""
+    if scheduler:
+        for r, c in cells:
+            scheduler.mark_dirty(r, r, c, c)
+
+
+def redraw(full, rects):
+    """FrameScheduler callback: bring the canvas up to date"""
+    if root is None or world is None or not canvas.winfo_exists():
+        return
+    if full or drawn_view is None or drawn_view[2] != CELL_SIZE:
+        render_grid()
+        return
+    
+    if (row_view, col_view) != drawn_view[:2]:
+        scroll_from(drawn_view[0], drawn_view[1])
+    
+    draw_cells((r, c) for min_row, max_row, min_col, max_col in rects
+               for r in range(max(min_row, row_view), min(max_row + 1, row_view + ROWS, TOTAL_ROWS))
+               for c in range(max(min_col, col_view), min(max_col + 1, col_view + COLS, TOTAL_COLS)))
+
+
+def render_grid():
     """TKINTER LAZY RENDERING - only draw non-zero cells as rectangles"""
-    global cell_rectangles
+    global cell_rectangles, drawn_view
     
     if root is None:
         return
+    drawn_view = (row_view, col_view, CELL_SIZE)
     
     # Set background to state 0 color
     canvas.config(bg=STATE_COLORS.get(0, "#ffffff"))
@@ -726,23 +933,16 @@ def draw_grid():
         canvas.delete(rect_id)
     cell_rectangles.clear()
     
-    # CRITICAL FIX: Delete ALL arrow objects from canvas, not just tracked ones
-    canvas.delete("pointer_arrow")
-    
-    # Also clear arrow_id references in all pointers
-    for pointer in pointers:
-        pointer.arrow_id = None
-    
     # LAZY RENDERING: Collect only non-zero cells in viewport
     if use_sparse:
-        cells_to_draw = {(r, c): s for (r, c), s in CELLS.items()
+        cells_to_draw = {(r, c): s for (r, c), s in world.cells.items()
                         if row_view <= r < row_view + ROWS and col_view <= c < col_view + COLS and s != 0}
     else:
         # Dense mode: still only draw non-zero visible cells
         cells_to_draw = {}
         for r in range(row_view, min(row_view + ROWS, TOTAL_ROWS)):
             for c in range(col_view, min(col_view + COLS, TOTAL_COLS)):
-                state = CELLS[r][c]
+                state = world.cells[r][c]
                 if state != 0:
                     cells_to_draw[(r, c)] = state
     
@@ -757,16 +957,89 @@ def draw_grid():
         x2, y2 = x + CELL_SIZE, y + CELL_SIZE
         
         # Use tkinter canvas rectangles for lazy rendering
-        rect_id = canvas.create_rectangle(x1, y1, x2, y2, fill=cell_color, outline="")
+        rect_id = canvas.create_rectangle(x1, y1, x2, y2, fill=cell_color, outline="", tags="cell")
         cell_rectangles[(r, c)] = rect_id
     
-    # Draw pointer arrows
-    for pointer in pointers:
-        pointer.draw_arrow()
+    draw_arrows()
     
     root.update_idletasks()
 
 
+def draw_cells(cells):
+    """Redraw just the given (row, col) cells now, instead of the whole viewport"""
+    background = STATE_COLORS.get(0, "#ffffff")
+    for r, c in cells:
+        if not (row_view <= r < row_view + ROWS and col_view <= c < col_view + COLS):
+            continue
+        
+        rect_id = cell_rectangles.pop((r, c), None)
+        if rect_id:
+            canvas.delete(rect_id)
+        
+        cell_state = get_cell(r, c)
+        if cell_state != 0:
+            x = (c - col_view) * CELL_SIZE
+            y = (r - row_view) * CELL_SIZE
+            cell_rectangles[(r, c)] = canvas.create_rectangle(
+                x, y, x + CELL_SIZE, y + CELL_SIZE,
+                fill=STATE_COLORS.get(cell_state, background), outline="", tags="cell")
+    
+    # New rectangles are created on top, so lift the arrows back over them
+    canvas.tag_raise("pointer_arrow")
+    canvas.tag_raise("notification")
+
+
+def view_cells_outside(row_a, col_a, row_b, col_b):
+    """Cells in the viewport at (row_a, col_a) that are not in the one at (row_b, col_b)"""
+    rows = range(max(0, row_a), min(row_a + ROWS, TOTAL_ROWS))
+    cols = range(max(0, col_a), min(col_a + COLS, TOTAL_COLS))
+    for r in rows:
+        if row_b <= r < row_b + ROWS:
+            for c in cols:
+                if not col_b <= c < col_b + COLS:
+                    yield (r, c)
+        else:
+            for c in cols:
+                yield (r, c)
+
+
+def scroll_view(new_row_view, new_col_view):
+    """Move the viewport; the next frame moves the drawn cells rather than redrawing them"""
+    global row_view, col_view
+    
+    row_view, col_view = new_row_view, new_col_view
+    if scheduler:
+        scheduler.schedule()
+
+
+def scroll_from(old_row_view, old_col_view):
+    """
+    Pan the drawn cells from the viewport at (old_row_view, old_col_view)
+    
+    Only the strips of cells that scrolled out of view are deleted and
+    only those that scrolled in are drawn.
+    """
+    global drawn_view
+    
+    d_row = row_view - old_row_view
+    d_col = col_view - old_col_view
+    if abs(d_row) >= ROWS or abs(d_col) >= COLS:
+        render_grid()
+        return
+    
+    for cell in view_cells_outside(old_row_view, old_col_view, row_view, col_view):
+        rect_id = cell_rectangles.pop(cell, None)
+        if rect_id:
+            canvas.delete(rect_id)
+    
+    entering = list(view_cells_outside(row_view, col_view, old_row_view, old_col_view))
+    drawn_view = (row_view, col_view, CELL_SIZE)
+    canvas.move("cell", -d_col * CELL_SIZE, -d_row * CELL_SIZE)
+    
+    draw_arrows()
+    draw_cells(entering)
+
+
 # Left click drag to paint cells
 def on_left_press(event):
     """Start left drag painting"""
@@ -789,12 +1062,12 @@ def on_left_press(event):
         
         if density_control:
             density_control.update_counts()
-        draw_grid()
+        mark_cells([(row, col)])
 
 
 def on_left_drag(event):
-    """Continue left drag painting"""
-    global last_drag_cell
+    """Continue left drag painting along the mouse path"""
+    global last_drag_cell, stroke_job
     
     if not is_dragging_left or toggle == False:
         return
@@ -802,22 +1075,44 @@ def on_left_drag(event):
     row = row_view + int(event.y // CELL_SIZE)
     col = col_view + int(event.x // CELL_SIZE)
     
-    if (row, col) != last_drag_cell and 0 <= row < TOTAL_ROWS and 0 <= col < TOTAL_COLS:
-        num_states = len(STATE_RGB)
-        current_state = get_cell(row, col)
-        new_state = (current_state + 1) % num_states
-        set_cell(row, col, new_state)
-        
+    if (row, col) != last_drag_cell:
+        rows, cols = raster.line_cells(last_drag_cell, (row, col))
+        stroke.extend((r, c) for r, c in zip(rows.tolist(), cols.tolist())
+                      if 0 <= r < TOTAL_ROWS and 0 <= c < TOTAL_COLS)
         last_drag_cell = (row, col)
         
-        if density_control:
-            density_control.update_counts()
-        draw_grid()
+        # Motion events arrive faster than frames; apply them together when idle
+        if stroke_job is None:
+            stroke_job = root.after_idle(flush_stroke)
+
+
+def flush_stroke():
+    """Apply the buffered stroke and redraw only the cells it touched"""
+    global stroke_job
+    
+    if stroke_job is not None:
+        root.after_cancel(stroke_job)
+        stroke_job = None
+    if not stroke or world is None:
+        stroke.clear()
+        return
+    
+    num_states = len(STATE_RGB)
+    for row, col in stroke:
+        world.set_cell(row, col, (world.get_cell(row, col) + 1) % num_states)
+    world.reset_cycle_detection()
+    
+    touched = set(stroke)
+    stroke.clear()
+    if density_control:
+        density_control.update_counts()
+    mark_cells(touched)
 
 
 def on_left_release(event):
     """End left drag painting"""
     global is_dragging_left, last_drag_cell
+    flush_stroke()
     is_dragging_left = False
     last_drag_cell = None
 
@@ -836,8 +1131,6 @@ def on_right_press(event):
 
 def on_right_drag(event):
     """Pan viewport with right drag"""
-    global row_view, col_view
-    
     if not is_dragging_right:
         return
     
@@ -850,10 +1143,8 @@ def on_right_drag(event):
     new_view_row = drag_start_view_row + dy_cells
     new_view_col = drag_start_view_col + dx_cells
     
-    row_view = max(0, min(TOTAL_ROWS - ROWS, new_view_row))
-    col_view = max(0, min(TOTAL_COLS - COLS, new_view_col))
-    
-    draw_grid()
+    scroll_view(max(0, min(TOTAL_ROWS - ROWS, new_view_row)),
+                max(0, min(TOTAL_COLS - COLS, new_view_col)))
 
 
 def on_right_release(event):
@@ -873,11 +1164,8 @@ def on_right_release(event):
         col = col_view + int(event.x // CELL_SIZE)
         
         if 0 <= row < TOTAL_ROWS and 0 <= col < TOTAL_COLS:
-            existing_pointer = None
-            for pointer in pointers:
-                if pointer.row == row and pointer.col == col:
-                    existing_pointer = pointer
-                    break
+            on_cell = world.pointers_at(row, col)
+            existing_pointer = on_cell[0] if on_cell else None
             
             if existing_pointer:
                 if not existing_pointer.visible:
@@ -887,8 +1175,9 @@ def on_right_release(event):
                     existing_pointer.rotate()
             else:
                 new_pointer = Pointer(row, col, direction=0, user_created=True)
-                pointers.append(new_pointer)
+                world.add_pointer(new_pointer)
             
+            world.reset_cycle_detection()
             draw_grid()
     
     is_dragging_right = False
@@ -906,12 +1195,26 @@ def play():
     automata = True
     
     def step_loop():
+        global steps_per_tick
         if automata:
             start_time = time.time()
             
-            step_generation()
+            if steps_per_tick == 1 and not auto_steps:
+                step_generation()
+            else:
+                step_batch(steps_per_tick)
             
             elapsed = time.time() - start_time
+            if auto_steps:
+                # Scale towards the budget, at most doubling or halving per tick
+                scale = FRAME_BUDGET_MS / max(elapsed * 1000, 0.1)
+                steps_per_tick = max(1, min(MAX_STEPS_PER_TICK, steps_per_tick * 2,
+                                            max(steps_per_tick // 2, int(steps_per_tick * scale))))
+                if density_control:
+                    density_control.show_steps_per_tick()
+                root.after(1, step_loop)
+                return
+            
             target_delay_sec = simulation_speed / 1000.0
             remaining = max(1, int((target_delay_sec - elapsed) * 1000))
             
@@ -948,18 +1251,18 @@ def zoom(event):
 
 
 def move(event):
-    global row_view, col_view
+    new_row_view, new_col_view = row_view, col_view
     
     if event.keysym == "Up":
-        row_view = max(0, row_view - 1)
+        new_row_view = max(0, row_view - 1)
     elif event.keysym == "Down":
-        row_view = min(TOTAL_ROWS - ROWS, row_view + 1)
+        new_row_view = min(TOTAL_ROWS - ROWS, row_view + 1)
     elif event.keysym == "Left":
-        col_view = max(0, col_view - 1)
+        new_col_view = max(0, col_view - 1)
     elif event.keysym == "Right":
-        col_view = min(TOTAL_COLS - COLS, col_view + 1)
+        new_col_view = min(TOTAL_COLS - COLS, col_view + 1)
     
-    draw_grid()
+    scroll_view(new_row_view, new_col_view)
 
 
 def onoff(event):
@@ -970,21 +1273,16 @@ def onoff(event):
 
 
 def reset(event):
-    global CELLS, pointers, generation, history, history_index
-    
-    if use_sparse:
-        CELLS.clear()
-    else:
-        CELLS = [[0 for _ in range(TOTAL_COLS)] for _ in range(TOTAL_ROWS)]
+    global history, history_index
     
-    generation = 0
+    world.clear_cells()
+    world.generation = 0
     
     # Place pointer at center of screen
     initial_row = row_view + ROWS // 2
     initial_col = col_view + COLS // 2
     initial_pointer = Pointer(initial_row, initial_col, user_created=True)
-    pointers.clear()
-    pointers.append(initial_pointer)
+    world.set_pointers([initial_pointer])
     
     # Reset history
     history.clear()
@@ -1000,14 +1298,15 @@ def reset(event):
 
 
 def change_rules(rules, colors):
-    global RULES, STATE_COLORS
+    global STATE_COLORS
     
     if not rules:
         print("Warning: No rules provided")
         return
     
     try:
-        RULES = rules
+        world.rules = rules
+        world.reset_cycle_detection()
         STATE_COLORS = {int(k) if isinstance(k, str) else k: v for k, v in colors.items()}
         update_state_rgb()
         
@@ -1026,24 +1325,32 @@ def set_simulation_speed(speed):
     simulation_speed = max(10, min(5000, speed))
 
 
+def set_steps_per_tick(steps, auto=False):
+    global steps_per_tick, auto_steps
+    steps_per_tick = max(1, min(MAX_STEPS_PER_TICK, steps))
+    auto_steps = auto
+
+
 def go_back(event):
-    global pointer_frame, pointers, CELLS, generation, automata, history, history_index
+    global pointer_frame, world, automata, history, history_index
     if pointer_frame:
         pointer_frame.pack_forget()
     if density_control:
         density_control.toggle_button.place_forget()
         density_control.panel_frame.place_forget()
     
-    pointers.clear()
     automata = False
-    generation = 0
+    if recorder:
+        toggle_recording()
+    if profile_capture:
+        profile_capture.cancel()
+    if scheduler:
+        scheduler.cancel()
+    root.unbind(f"<{keybind_settings.get_keybind('record')}>")
+    root.unbind(f"<{keybind_settings.get_keybind('profile')}>")
     history.clear()
     history_index = -1
-    
-    if use_sparse:
-        CELLS.clear()
-    else:
-        CELLS = None
+    world = None
     
     import PSettings
     import PSettings_Pannel
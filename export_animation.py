@@ -0,0 +1,546 @@
+"""
+export_animation.py - Animated GIF / APNG / video export
+Frames are rendered headlessly with the palette pipeline in raster.py and
+encoded in a separate Python process, so the UI keeps running while a long
+export is written. The child process reports progress on stdout.
+
+Sources:
+    - a recorded .timeline file
+    - a job file (.npz) holding a grid or pointer state plus its rules,
+      run forward for a number of generations
+
+Outputs by extension: .gif through Pillow, .png (APNG) through a small
+streaming writer, anything else (.mp4, .webm, ...) through an ffmpeg pipe
+when ffmpeg is installed.
+
+Usage:
+    python -m export_animation run.timeline run.gif --cell-size 4 --fps 20
+"""
+
+import argparse
+import json
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import tkinter as tk
+import zlib
+from tkinter import filedialog
+import numpy as np
+
+import raster
+import timeline
+from grid_engine import RuleSet, CellularAutomaton
+from pointer_engine import Pointer, PointerWorld
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+POINTER_RGB = (255, 0, 0)
+MAX_GIF_COLORS = 256
+
+
+def hex_to_rgb(hex_color):
+    hex_color = hex_color.lstrip('#')
+    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+
+
+def write_job(path, kind, cells, rules, state_colors, generations, **options):
+    """
+    Save everything a child process needs to run and render a simulation
+    
+    Args:
+        kind: "grid" or "pointer"
+        cells: 2D array of the starting states
+        rules: Rule dicts as stored in neighbour_save / pointer_save
+        state_colors: {state: "#rrggbb"}
+        generations: Number of generations after the first frame
+        options: neighborhood_type / neighborhood_radius for grids,
+                 pointers ((n, 4) row, col, direction, count), wrapping and
+                 merge_duplicates for pointers
+    """
+    pointers = np.asarray(options.pop("pointers", np.zeros((0, timeline.POINTER_COLUMNS))),
+                          dtype=np.int32).reshape(-1, timeline.POINTER_COLUMNS)
+    settings = {
+        "kind": kind,
+        "rules": rules,
+        "state_colors": {str(state): color for state, color in state_colors.items()},
+        "generations": int(generations),
+        "options": options
+    }
+    np.savez_compressed(path, cells=np.asarray(cells, dtype=np.int8), pointers=pointers,
+                        settings=np.array(json.dumps(settings)))
+
+
+def job_frames(path):
+    """
+    Load a job file
+    
+    Returns:
+        (frames, frame_count, state_colors) where frames yields (cells, pointers)
+    """
+    with np.load(path) as data:
+        cells = data["cells"]
+        pointers = data["pointers"]
+        settings = json.loads(str(data["settings"]))
+    
+    state_colors = {int(state): color for state, color in settings["state_colors"].items()}
+    generations = settings["generations"]
+    options = settings["options"]
+    
+    if settings["kind"] == "grid":
+        ruleset = RuleSet()
+        ruleset.change_rules(settings["rules"], dict(state_colors))
+        automaton = CellularAutomaton(cells.shape[1], cells.shape[0], ruleset, history_size=0,
+                                      neighborhood_type=options.get("neighborhood_type", "moore"),
+                                      neighborhood_radius=options.get("neighborhood_radius", 1))
+        automaton.grid = cells.copy()
+        
+        def frames():
+            yield automaton.grid, None
+            for _ in range(generations):
+                automaton.evolve_auto()
+                yield automaton.grid, None
+    else:
+        world = PointerWorld(cells.shape[0], cells.shape[1], wrapping=options.get("wrapping", True),
+                             merge_duplicates=options.get("merge_duplicates", False))
+        world.cells = cells.tolist()
+        world.recount()
+        world.rules = settings["rules"]
+        world.set_pointers([Pointer(int(r), int(c), int(d), count=int(n)) for r, c, d, n in pointers])
+        
+        def frames():
+            yield world.to_array(), timeline.pointers_to_array(world.pointers)
+            for _ in range(generations):
+                world.step_generation()
+                yield world.to_array(), timeline.pointers_to_array(world.pointers)
+    
+    return frames(), generations + 1, state_colors
+
+
+def timeline_frames(path, every=1):
+    """Frames of a recorded timeline, keeping one in every `every`"""
+    reader = timeline.TimelineReader(path)
+    count = (len(reader) + every - 1) // every
+    
+    def frames():
+        try:
+            for i, (generation, cells, pointers) in enumerate(reader.frames()):
+                if i % every == 0:
+                    yield cells, pointers
+        finally:
+            reader.close()
+    
+    return frames(), count, reader.palette
+
+
+class FrameRenderer:
+    """Turns state arrays into images with one palette lookup per frame"""
+    
+    def __init__(self, state_colors, cell_size):
+        self.cell_size = cell_size
+        state_rgb = {state: hex_to_rgb(color) for state, color in state_colors.items()}
+        
+        # Pointers get an extra palette entry after the last state
+        self.pointer_index = max(state_rgb.keys(), default=0) + 1
+        state_rgb[self.pointer_index] = POINTER_RGB
+        self.palette = raster.build_palette(state_rgb)
+    
+    def indexed(self, cells, pointers):
+        """Cell-size scaled array of palette indexes"""
+        index = np.clip(np.asarray(cells), 0, self.pointer_index - 1).astype(np.uint8)
+        if pointers is not None and len(pointers):
+            index = index.copy()
+            index[pointers[:, 0], pointers[:, 1]] = self.pointer_index
+        
+        if self.cell_size > 1:
+            index = np.repeat(np.repeat(index, self.cell_size, axis=0), self.cell_size, axis=1)
+        return index
+    
+    def rgb(self, cells, pointers):
+        return self.palette.take(self.indexed(cells, pointers), axis=0)
+    
+    def palette_image(self, cells, pointers):
+        """Mode "P" image using the state palette, so GIFs need no quantising"""
+        image = Image.fromarray(self.indexed(cells, pointers), "P")
+        image.putpalette(self.palette.ravel().tolist())
+        return image
+
+
+class ApngWriter:
+    """
+    Writes an animated PNG one palette frame at a time
+    
+    Pillow's APNG writer keeps every frame in memory until it saves, which
+    long exports cannot afford. Here each frame is compressed and written
+    as it arrives, cropped to the area that changed since the previous
+    frame; an unchanged frame lengthens the previous frame's delay instead.
+    Only the last frame is held, and the frame count in the acTL chunk is
+    patched in by close().
+    """
+    
+    SIGNATURE = b"\x89PNG\r\n\x1a\n"
+    
+    def __init__(self, path, palette, duration_ms):
+        self.file = open(path, "wb")
+        self.palette = np.asarray(palette, dtype=np.uint8)
+        self.duration_ms = duration_ms
+        self.previous = None
+        # [x, y, width, height, repeats, compressed rows], written once the next frame differs
+        self.pending = None
+        self.sequence = 0
+        self.frames = 0
+        self.actl_offset = None
+    
+    def _chunk(self, kind, data):
+        self.file.write(struct.pack(">I", len(data)) + kind + data
+                        + struct.pack(">I", zlib.crc32(kind + data)))
+    
+    def _start(self, height, width):
+        self.file.write(self.SIGNATURE)
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0))
+        self.actl_offset = self.file.tell()
+        self._chunk(b"acTL", struct.pack(">II", 0, 0))
+        self._chunk(b"PLTE", self.palette.tobytes())
+    
+    def add(self, index):
+        """Append a frame given as a 2D array of palette indexes"""
+        index = np.asarray(index, dtype=np.uint8)
+        if self.previous is None:
+            self._start(*index.shape)
+            top, bottom, left, right = 0, index.shape[0], 0, index.shape[1]
+        else:
+            changed = index != self.previous
+            rows = np.flatnonzero(changed.any(axis=1))
+            if not len(rows):
+                self.pending[4] += 1
+                return
+            cols = np.flatnonzero(changed.any(axis=0))
+            top, bottom, left, right = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+        
+        self._flush()
+        region = index[top:bottom, left:right]
+        # Every scanline starts with filter type 0 (none)
+        scanlines = np.zeros((region.shape[0], region.shape[1] + 1), dtype=np.uint8)
+        scanlines[:, 1:] = region
+        self.pending = [int(left), int(top), region.shape[1], region.shape[0], 1,
+                        zlib.compress(scanlines.tobytes())]
+        self.previous = index
+    
+    def _flush(self):
+        if self.pending is None:
+            return
+        x, y, width, height, repeats, data = self.pending
+        self.pending = None
+        
+        # The delay numerator is 16 bits; long holds drop to centiseconds
+        delay, denominator = self.duration_ms * repeats, 1000
+        if delay > 0xFFFF:
+            delay, denominator = min(delay // 10, 0xFFFF), 100
+        self._chunk(b"fcTL", struct.pack(">IIIIIHHBB", self.sequence, width, height, x, y,
+                                         delay, denominator, 0, 0))
+        self.sequence += 1
+        if self.frames == 0:
+            self._chunk(b"IDAT", data)
+        else:
+            self._chunk(b"fdAT", struct.pack(">I", self.sequence) + data)
+            self.sequence += 1
+        self.frames += 1
+    
+    def close(self):
+        try:
+            if self.previous is not None:
+                self._flush()
+                self._chunk(b"IEND", b"")
+                self.file.seek(self.actl_offset)
+                self._chunk(b"acTL", struct.pack(">II", self.frames, 0))
+        finally:
+            self.file.close()
+
+
+def encode(frames, frame_count, state_colors, output_path, cell_size=4, fps=20, progress=None):
+    """
+    Render and encode frames to output_path
+    
+    progress(done, total) is called after each frame.
+    """
+    renderer = FrameRenderer(state_colors, cell_size)
+    extension = os.path.splitext(output_path)[1].lower()
+    
+    def counted(images):
+        for done, image in enumerate(images, start=1):
+            yield image
+            if progress:
+                progress(done, frame_count)
+    
+    if extension in (".gif", ".png", ".apng"):
+        if len(renderer.palette) > MAX_GIF_COLORS:
+            raise ValueError(f"GIF/APNG export supports at most {MAX_GIF_COLORS - 1} states")
+        duration = max(1, int(1000 / fps))
+        
+        if extension != ".gif":
+            writer = ApngWriter(output_path, renderer.palette, duration)
+            try:
+                for cells, pointers in counted(frames):
+                    writer.add(renderer.indexed(cells, pointers))
+            finally:
+                writer.close()
+            return
+        
+        if not PIL_AVAILABLE:
+            raise RuntimeError("Pillow is required for GIF export")
+        images = counted(renderer.palette_image(cells, pointers) for cells, pointers in frames)
+        first = next(images)
+        first.save(output_path, format="GIF", save_all=True, append_images=images,
+                   duration=duration, loop=0)
+        return
+    
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg was not found; export to .gif or .png instead")
+    
+    process = None
+    for cells, pointers in counted(frames):
+        pixels = renderer.rgb(cells, pointers)
+        
+        if process is None:
+            # Most video codecs need even dimensions
+            height, width = pixels.shape[0] + pixels.shape[0] % 2, pixels.shape[1] + pixels.shape[1] % 2
+            process = subprocess.Popen(
+                [ffmpeg, "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24",
+                 "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+                 "-pix_fmt", "yuv420p", output_path],
+                stdin=subprocess.PIPE)
+            frame = np.zeros((height, width, 3), dtype=np.uint8)
+        
+        frame[:pixels.shape[0], :pixels.shape[1]] = pixels
+        process.stdin.write(frame.tobytes())
+    
+    if process:
+        process.stdin.close()
+        if process.wait() != 0:
+            raise RuntimeError("ffmpeg failed")
+
+
+class ExportJob:
+    """
+    Runs one export in a child Python process
+    
+    A reader thread collects the child's progress lines into a queue that
+    the UI polls, so nothing blocks the Tk main loop.
+    """
+    
+    def __init__(self, source_path, output_path, cell_size=4, fps=20, every=1, delete_source=False):
+        # The child runs from this module's folder so it can import the engines
+        self.output_path = os.path.abspath(output_path)
+        self.source_path = os.path.abspath(source_path)
+        self.delete_source = delete_source
+        self.done = 0
+        self.total = 0
+        self.finished = False
+        self.error = None
+        self.messages = queue.Queue()
+        
+        script = os.path.abspath(__file__)
+        self.process = subprocess.Popen(
+            [sys.executable, script, self.source_path, self.output_path,
+             "--cell-size", str(cell_size), "--fps", str(fps), "--every", str(every), "--progress"],
+            cwd=os.path.dirname(script), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        
+        self.thread = threading.Thread(target=self._read_output, daemon=True)
+        self.thread.start()
+    
+    def _read_output(self):
+        for line in self.process.stdout:
+            self.messages.put(line.strip())
+        error_text = self.process.stderr.read().strip()
+        self.messages.put(("exit", self.process.wait(), error_text))
+    
+    def poll(self):
+        """Apply any progress messages; returns True while still running"""
+        while True:
+            try:
+                message = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            
+            if isinstance(message, tuple):
+                _, code, error_text = message
+                self.finished = True
+                if code != 0 and self.error is None:
+                    self.error = error_text.splitlines()[-1] if error_text else f"Export exited with code {code}"
+                self._cleanup()
+            elif message.startswith("progress "):
+                done, total = message.split()[1].split("/")
+                self.done, self.total = int(done), int(total)
+            elif message.startswith("error "):
+                self.error = message[len("error "):]
+        
+        return not self.finished
+    
+    def cancel(self):
+        if not self.finished:
+            self.process.terminate()
+            self.error = "Cancelled"
+    
+    def _cleanup(self):
+        if self.delete_source and os.path.exists(self.source_path):
+            os.remove(self.source_path)
+        if self.error and os.path.exists(self.output_path):
+            # Don't leave a half-written animation behind
+            os.remove(self.output_path)
+
+
+def default_cell_size(shape, target_width=1024):
+    """Largest cell size up to 4 pixels that keeps frames near target_width"""
+    return max(1, min(4, target_width // max(1, shape[1])))
+
+
+class ExportWindow:
+    """
+    Export options followed by a progress bar for one export
+    
+    write_job(path, generations) saves the starting state as a job file;
+    notify(message) reports the result on the calling screen.
+    """
+    
+    BAR_WIDTH = 300
+    
+    def __init__(self, root, shape, write_job, notify):
+        self.root = root
+        self.write_job = write_job
+        self.notify = notify
+        self.job = None
+        
+        self.window = tk.Toplevel(root)
+        self.window.title("Export Animation")
+        self.window.config(bg="#f0f0f0")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        
+        options = tk.Frame(self.window, bg="#f0f0f0")
+        options.pack(padx=10, pady=(10, 5))
+        
+        self.generations_var = tk.IntVar(value=100)
+        self.fps_var = tk.IntVar(value=20)
+        self.cell_size_var = tk.IntVar(value=default_cell_size(shape))
+        for row, (text, variable, upper) in enumerate([("Generations:", self.generations_var, 100000),
+                                                        ("Frames/sec:", self.fps_var, 60),
+                                                        ("Cell size:", self.cell_size_var, 32)]):
+            tk.Label(options, text=text, bg="#f0f0f0").grid(row=row, column=0, sticky="w", pady=2)
+            tk.Spinbox(options, from_=1, to=upper, width=8, textvariable=variable).grid(row=row, column=1, padx=5, pady=2)
+        
+        self.label = tk.Label(self.window, text="", font=("Arial", 10), bg="#f0f0f0")
+        self.label.pack(padx=10, pady=5)
+        
+        self.bar = tk.Canvas(self.window, width=self.BAR_WIDTH, height=16, bg="white", highlightthickness=1)
+        self.bar.pack(padx=10, pady=5)
+        self.fill = self.bar.create_rectangle(0, 0, 0, 16, fill="#4CAF50", outline="")
+        
+        self.action_button = tk.Button(self.window, text="Export...", command=self.start, width=10,
+                                       bg="#4CAF50", fg="white", font=("Arial", 9, "bold"))
+        self.action_button.pack(pady=(5, 10))
+    
+    def _read_int(self, variable, default):
+        try:
+            return max(1, int(variable.get()))
+        except (ValueError, tk.TclError):
+            return default
+    
+    def start(self):
+        output_path = filedialog.asksaveasfilename(
+            parent=self.window,
+            defaultextension=".gif",
+            filetypes=[("Animated GIF", "*.gif"), ("Animated PNG", "*.png"),
+                       ("Video (needs ffmpeg)", "*.mp4 *.webm"), ("All Files", "*.*")],
+            title="Export Animation"
+        )
+        if not output_path:
+            return
+        
+        handle, job_path = tempfile.mkstemp(suffix=".npz", prefix="export_")
+        os.close(handle)
+        try:
+            self.write_job(job_path, self._read_int(self.generations_var, 100))
+        except Exception as e:
+            os.remove(job_path)
+            self.notify(f"Export failed: {e}")
+            return
+        
+        self.job = ExportJob(job_path, output_path, cell_size=self._read_int(self.cell_size_var, 4),
+                             fps=self._read_int(self.fps_var, 20), delete_source=True)
+        self.action_button.config(text="Cancel", command=self.close, bg="#f44336")
+        self.label.config(text="Starting...")
+        self._poll()
+    
+    def _poll(self):
+        if not self.window.winfo_exists():
+            return
+        
+        running = self.job.poll()
+        if self.job.total:
+            fraction = self.job.done / self.job.total
+            self.bar.coords(self.fill, 0, 0, int(self.BAR_WIDTH * fraction), 16)
+            self.label.config(text=f"Frame {self.job.done} of {self.job.total}")
+        
+        if running:
+            self.root.after(100, self._poll)
+            return
+        
+        self.window.destroy()
+        if self.job.error == "Cancelled":
+            self.notify("Export cancelled")
+        elif self.job.error:
+            self.notify(f"Export failed: {self.job.error}")
+        else:
+            self.notify(f"Exported {os.path.basename(self.job.output_path)}")
+    
+    def close(self):
+        if self.job and not self.job.finished:
+            # The poll loop reports the cancellation and closes the window
+            self.job.cancel()
+        else:
+            self.window.destroy()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m export_animation",
+                                     description="Render a timeline or export job to GIF/APNG/video")
+    parser.add_argument("source", help=".timeline file or .npz job file")
+    parser.add_argument("output", help="Output .gif, .png or video file")
+    parser.add_argument("--cell-size", type=int, default=4)
+    parser.add_argument("--fps", type=int, default=20)
+    parser.add_argument("--every", type=int, default=1, help="Keep one timeline frame in every N")
+    parser.add_argument("--progress", action="store_true", help="Print machine-readable progress lines")
+    args = parser.parse_args(argv)
+    
+    def report(done, total):
+        if args.progress:
+            print(f"progress {done}/{total}", flush=True)
+    
+    try:
+        if args.source.endswith(".npz"):
+            frames, count, state_colors = job_frames(args.source)
+        else:
+            frames, count, state_colors = timeline_frames(args.source, max(1, args.every))
+        encode(frames, count, state_colors, args.output, max(1, args.cell_size), max(1, args.fps), report)
+    except Exception as e:
+        if args.progress:
+            print(f"error {e}", flush=True)
+        else:
+            print(f"Error: {e}", file=sys.stderr)
+        return 1
+    
+    if not args.progress:
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
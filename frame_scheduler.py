@@ -0,0 +1,114 @@
+"""
+frame_scheduler.py - Coalesces redraw requests into at most one redraw per frame
+Mouse motion, key repeat, zoom and simulation steps can each ask for a
+redraw many times between two screen refreshes. Instead of drawing on
+every request, callers mark what changed and the scheduler draws once,
+when Tk is idle and at least a frame interval after the last draw.
+
+Changes are either the whole view or rectangles of cells. Overlapping
+rectangles and ones sharing an edge are merged, and past MAX_RECTS they
+collapse into their bounding box, so one flush does a bounded amount of
+work.
+"""
+
+import time
+
+FRAME_MS = 16
+MAX_RECTS = 8
+
+
+def merge_rect(rects, rect):
+    """
+    Add an inclusive (min_row, max_row, min_col, max_col) rectangle to
+    rects, merging it with every rectangle it overlaps or shares an edge
+    with. Rectangles meeting only at a corner stay apart, so a diagonal
+    stroke is not widened to its bounding box.
+    """
+    min_row, max_row, min_col, max_col = rect
+    merged = True
+    while merged:
+        merged = False
+        for other in rects:
+            rows_overlap = other[0] <= max_row and min_row <= other[1]
+            cols_overlap = other[2] <= max_col and min_col <= other[3]
+            rows_touch = other[0] <= max_row + 1 and min_row <= other[1] + 1
+            cols_touch = other[2] <= max_col + 1 and min_col <= other[3] + 1
+            if (rows_overlap and cols_touch) or (cols_overlap and rows_touch):
+                rects.remove(other)
+                min_row, max_row = min(min_row, other[0]), max(max_row, other[1])
+                min_col, max_col = min(min_col, other[2]), max(max_col, other[3])
+                merged = True
+                break
+    rects.append((min_row, max_row, min_col, max_col))
+
+
+def bounding_rect(rects):
+    return (min(r[0] for r in rects), max(r[1] for r in rects),
+            min(r[2] for r in rects), max(r[3] for r in rects))
+
+
+class FrameScheduler:
+    """
+    Runs redraw(full, rects) at most once per frame
+    
+    full is True when the whole view must be drawn; otherwise rects lists
+    the cell rectangles marked dirty since the last redraw (possibly none,
+    when only the view moved).
+    """
+    
+    def __init__(self, widget, redraw, frame_ms=FRAME_MS, max_rects=MAX_RECTS):
+        self.widget = widget
+        self.redraw = redraw
+        self.frame_ms = frame_ms
+        self.max_rects = max_rects
+        self.full = False
+        self.rects = []
+        self.job = None
+        self.last_flush = 0.0
+    
+    def request_full(self):
+        """Redraw the whole view at the next frame"""
+        self.full = True
+        self.rects.clear()
+        self.schedule()
+    
+    def mark_dirty(self, min_row, max_row, min_col, max_col):
+        """Redraw a rectangle of cells (inclusive bounds) at the next frame"""
+        if not self.full:
+            merge_rect(self.rects, (min_row, max_row, min_col, max_col))
+            if len(self.rects) > self.max_rects:
+                self.rects[:] = [bounding_rect(self.rects)]
+        self.schedule()
+    
+    def schedule(self):
+        """Make sure a flush is pending, without marking anything dirty"""
+        if self.job is not None:
+            return
+        
+        wait_ms = int(self.frame_ms - (time.perf_counter() - self.last_flush) * 1000)
+        if wait_ms > 0:
+            self.job = self.widget.after(wait_ms, self.flush)
+        else:
+            self.job = self.widget.after_idle(self.flush)
+    
+    def flush(self):
+        """Redraw now if anything is pending"""
+        pending = self.job is not None
+        self.cancel()
+        if not pending:
+            return
+        
+        full, rects = self.full, self.rects
+        self.full = False
+        self.rects = []
+        self.last_flush = time.perf_counter()
+        self.redraw(full, rects)
+    
+    def cancel(self):
+        """Drop the pending flush, e.g. when the screen closes"""
+        if self.job is not None:
+            try:
+                self.widget.after_cancel(self.job)
+            except Exception:
+                pass
+            self.job = None
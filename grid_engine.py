@@ -0,0 +1,648 @@
+"""
+grid_engine.py - Neighborhood-based automaton engine without any UI
+Holds the rules, undo history and NumPy evolution used by basic_grid,
+so the same engine can be driven headless (see headless.py)
+"""
+
+import operator
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import zobrist
+
+# Cells per row band when evolving or scanning a memory-mapped grid
+BAND_CELLS = 1 << 22
+
+# Cells per independently seeded tile. Fixed, so a seed fills the same
+# grid whatever the number of worker threads
+SEED_TILE_CELLS = 1 << 20
+SEED_WORKERS = min(8, os.cpu_count() or 1)
+# Above this many states a binary search beats one comparison per state
+SEARCH_STATES = 16
+
+
+def density_distribution(ratios):
+    """
+    Turn {state: weight} into (states, cumulative probabilities)
+    
+    Zero-weight states are left out so rounding can never pick them.
+    Returns None when every weight is zero.
+    """
+    states = sorted(state for state, weight in ratios.items() if weight > 0)
+    if not states:
+        return None
+    
+    weights = np.array([ratios[state] for state in states], dtype=np.float64)
+    total = weights.sum()
+    
+    cdf = np.cumsum(weights / total)
+    cdf[-1] = 1.0
+    return np.array(states, dtype=np.int8), cdf
+
+
+def sample_states(rng, shape, distribution):
+    """Array of states drawn from a density_distribution() with a np.random.Generator"""
+    states, cdf = distribution
+    uniform = rng.random(shape)
+    
+    # A state's index is the number of cdf steps at or below the draw
+    if len(cdf) > SEARCH_STATES:
+        index = np.searchsorted(cdf, uniform, side="right")
+    else:
+        index = np.zeros(shape, dtype=np.int8)
+        for step in cdf[:-1]:
+            index += uniform >= step
+    return states[index]
+
+
+def new_seed():
+    """A fresh 32-bit seed from OS entropy, short enough to type back in"""
+    return int(np.random.SeedSequence().generate_state(1)[0])
+
+
+class GenerationHistory:
+    """Store last 5 grid states for undo/redo"""
+    
+    def __init__(self, max_history=5):
+        self.history = []
+        self.max_history = max_history
+        self.current_index = -1
+    
+    def save_state(self, grid):
+        if self.max_history == 0:
+            return
+        
+        if self.current_index < len(self.history) - 1:
+            self.history = self.history[:self.current_index + 1]
+        
+        self.history.append(grid.copy())
+        
+        if len(self.history) > self.max_history:
+            self.history.pop(0)
+            self.current_index = len(self.history) - 1
+        else:
+            self.current_index = len(self.history) - 1
+    
+    def can_undo(self):
+        return self.current_index > 0
+    
+    def can_redo(self):
+        return self.current_index < len(self.history) - 1
+    
+    def undo(self):
+        if self.can_undo():
+            self.current_index -= 1
+            return self.history[self.current_index].copy()
+        return None
+    
+    def redo(self):
+        if self.can_redo():
+            self.current_index += 1
+            return self.history[self.current_index].copy()
+        return None
+    
+    def clear(self):
+        self.history = []
+        self.current_index = -1
+
+
+class Rule:
+    """Single rule defining state transition based on neighbor conditions"""
+    
+    def __init__(self, current_state, conditions, next_state, color):
+        self.current_state = current_state
+        self.conditions = conditions
+        self.next_state = next_state
+        self.color = color
+    
+    def applies_to(self, state, neighbor_counts):
+        if self.current_state != state:
+            return False
+        
+        rel_operators = {"=": operator.eq, "!=": operator.ne, "<": operator.lt, 
+                        "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+        
+        for condition in self.conditions:
+            neighbor_count = neighbor_counts[condition["neighbor_state"]]
+            op = rel_operators[condition["operator"]]
+            if not op(neighbor_count, condition["count"]):
+                return False
+        return True
+
+
+class RuleSet:
+    """Collection of rules defining complete automaton behavior"""
+    
+    def __init__(self):
+        self.rules = []
+        self.state_colors = {0: "#ffffff", 1: "#808080"}
+        self.state_rgb = {}
+        self._update_rgb()
+    
+    def _update_rgb(self):
+        self.state_rgb = {}
+        for state, hex_color in self.state_colors.items():
+            hex_color = hex_color.lstrip('#')
+            self.state_rgb[state] = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+    
+    def add_rule(self, rule):
+        self.rules.append(rule)
+        self.state_colors[rule.next_state] = rule.color
+        self._update_rgb()
+    
+    def apply_rules(self, current_state, neighbor_counts):
+        for rule in self.rules:
+            if rule.applies_to(current_state, neighbor_counts):
+                return rule.next_state
+        return current_state
+    
+    def get_color(self, state):
+        return self.state_colors.get(state, "#ffffff")
+    
+    def get_rgb(self, state):
+        return self.state_rgb.get(state, (255, 255, 255))
+    
+    def set_default_rules(self):
+        """Set Conway's Game of Life rules"""
+        self.rules = [Rule(1, [{"neighbor_state": 1, "operator": "<", "count": 2}], 0, "#ffffff"),
+                      Rule(1, [{"neighbor_state": 1, "operator": ">", "count": 3}], 0, "#ffffff"),
+                      Rule(0, [{"neighbor_state": 1, "operator": "=", "count": 3}], 1, "#808080")]
+        self._update_rgb()
+    
+    def change_rules(self, rules, colors):
+        self.rules = []
+        self.state_colors = colors
+        for rule_dict in rules:
+            rule = Rule(rule_dict["current_state"], rule_dict["conditions"], 
+                       rule_dict["next_state"], rule_dict["color"])
+            self.add_rule(rule)
+
+
+class CellularAutomaton:
+    """Core automaton logic using NumPy for performance"""
+    
+    def __init__(self, width, height, ruleset, use_sparse=False, wrapping=True, 
+                 neighborhood_type="moore", neighborhood_radius=1, history_size=5, detect_cycles=True):
+        self.width = width
+        self.height = height
+        self.ruleset = ruleset
+        self.use_sparse = use_sparse
+        self.wrapping = wrapping
+        self.neighborhood_type = neighborhood_type
+        self.neighborhood_radius = neighborhood_radius
+        self.generation = 0
+        
+        # Incremental Zobrist hash of the grid (None until first needed)
+        # and the hash -> generation table used to spot cycles
+        self.detect_cycles = detect_cycles
+        self.cycles = zobrist.CycleDetector()
+        self.grid_hash = None
+        
+        # Optional phase_timer.PhaseTimer; None keeps timing off
+        self.timer = None
+        
+        self.grid = np.zeros((height, width), dtype=np.int8)
+        self.previous_grid = None
+        
+        # Undo/Redo
+        self.history = GenerationHistory(max_history=history_size)
+        self.history.save_state(self.grid)
+        
+        self._create_kernel()
+    
+    def _create_kernel(self):
+        size = 2 * self.neighborhood_radius + 1
+        
+        if self.neighborhood_type == "moore":
+            self.kernel = np.ones((size, size), dtype=np.int8)
+            self.kernel[self.neighborhood_radius, self.neighborhood_radius] = 0
+        else:
+            self.kernel = np.zeros((size, size), dtype=np.int8)
+            center = self.neighborhood_radius
+            for i in range(size):
+                for j in range(size):
+                    manhattan_dist = abs(i - center) + abs(j - center)
+                    if 0 < manhattan_dist <= self.neighborhood_radius:
+                        self.kernel[i, j] = 1
+    
+    @property
+    def grid(self):
+        return self._grid
+    
+    @grid.setter
+    def grid(self, grid):
+        # A replaced grid (load, undo, reseed) starts a new run
+        self._grid = grid
+        self.reset_cycle_detection()
+    
+    @property
+    def cycle_period(self):
+        """Period of the cycle the last generation landed in, or 0"""
+        return self.cycles.period
+    
+    def reset_cycle_detection(self):
+        """Forget the grid hash and seen generations after the grid was edited"""
+        self.grid_hash = None
+        self.cycles.clear()
+    
+    def fast_forward(self, target_generation):
+        """
+        Once in a cycle, jump the generation counter by whole periods
+        towards target_generation without computing them
+        
+        Returns:
+            Number of generations skipped
+        """
+        new_generation = self.cycles.fast_forward(self.generation, target_generation)
+        skipped = new_generation - self.generation
+        self.generation = new_generation
+        return skipped
+    
+    def _begin_generation(self):
+        """Hash the starting grid in full if edits invalidated the hash"""
+        if self.detect_cycles and self.grid_hash is None:
+            band = self.band_rows()
+            self.grid_hash = 0
+            for start in range(0, self.height, band):
+                self.grid_hash ^= zobrist.grid_hash(self.grid[start:start + band], start)
+            self.cycles.check(self.grid_hash, self.generation)
+    
+    def _track_changes(self, old, new, row_offset=0, col_offset=0):
+        """Update the grid hash from the cells of a region that changed"""
+        if self.detect_cycles:
+            self.grid_hash ^= zobrist.region_delta(old, new, row_offset, col_offset, self.width)
+    
+    def _finish_generation(self, start=0):
+        timer = self.timer
+        self.generation += 1
+        self.history.save_state(self.grid)
+        if timer:
+            start = timer.lap("history", start)
+        if self.detect_cycles:
+            self.cycles.check(self.grid_hash, self.generation)
+            if timer:
+                timer.lap("hash", start)
+        if timer:
+            timer.tick("generation")
+    
+    @property
+    def is_mapped(self):
+        """True when the grid is an np.memmap stored on disk"""
+        return isinstance(self.grid, np.memmap)
+    
+    def attach_grid(self, grid, generation=0):
+        """
+        Replace the grid with an existing array, e.g. an np.memmap
+        
+        Undo history is turned off for memory-mapped grids since every
+        snapshot would be a full in-memory copy.
+        """
+        self.grid = grid
+        self.height, self.width = grid.shape
+        self.generation = generation
+        self.previous_grid = None
+        
+        self.history = GenerationHistory(max_history=0 if self.is_mapped else self.history.max_history)
+        self.history.save_state(self.grid)
+    
+    def seed_density(self, ratios, seed=None, region=None, workers=SEED_WORKERS):
+        """
+        Fill the grid with random states drawn in proportion to ratios
+        
+        region is (min_row, max_row, min_col, max_col), inclusive, to
+        reseed just part of the grid. The cells are filled in row tiles,
+        each with its own generator spawned from seed, so tiles run in
+        parallel and the same seed and region always give the same cells.
+        A memory-mapped grid is written a tile at a time.
+        
+        Returns:
+            The seed used (a new one when seed is None), or None if every
+            ratio is zero
+        """
+        distribution = density_distribution(ratios)
+        if distribution is None:
+            return None
+        if seed is None:
+            seed = new_seed()
+        
+        min_row, max_row, min_col, max_col = region or (0, self.height - 1, 0, self.width - 1)
+        cols = max_col - min_col + 1
+        tile_rows = max(1, SEED_TILE_CELLS // cols)
+        starts = range(min_row, max_row + 1, tile_rows)
+        children = np.random.SeedSequence(seed).spawn(len(starts))
+        
+        def fill(tile):
+            start = starts[tile]
+            rows = min(tile_rows, max_row + 1 - start)
+            rng = np.random.Generator(np.random.PCG64(children[tile]))
+            self.grid[start:start + rows, min_col:max_col + 1] = sample_states(rng, (rows, cols), distribution)
+        
+        if workers > 1 and len(starts) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(fill, range(len(starts))))
+        else:
+            for tile in range(len(starts)):
+                fill(tile)
+        
+        self.reset_cycle_detection()
+        return seed
+    
+    def band_rows(self):
+        """Rows per band, never fewer than the neighbourhood radius"""
+        return max(self.neighborhood_radius, BAND_CELLS // max(self.width, 1))
+    
+    def get_max_neighbors(self):
+        if self.neighborhood_type == "moore":
+            return ((2 * self.neighborhood_radius + 1) ** 2) - 1
+        else:
+            return 4 * self.neighborhood_radius
+    
+    def get_cell(self, row, col):
+        if 0 <= row < self.height and 0 <= col < self.width:
+            return int(self.grid[row, col])
+        return 0
+    
+    def set_cell(self, row, col, state):
+        if 0 <= row < self.height and 0 <= col < self.width:
+            self._edit_cell(row, col, state)
+    
+    def toggle_cell(self, row, col):
+        if 0 <= row < self.height and 0 <= col < self.width:
+            num_states = len(self.ruleset.state_colors)
+            current = int(self.grid[row, col])
+            self._edit_cell(row, col, (current + 1) % num_states)
+    
+    def set_cells(self, rows, cols, states):
+        """
+        Set many cells at once, e.g. a paint stroke
+        
+        rows, cols and states are equal-length arrays; each (row, col)
+        must appear once and lie inside the grid.
+        """
+        rows = np.asarray(rows)
+        cols = np.asarray(cols)
+        states = np.asarray(states).astype(self.grid.dtype)
+        if self.grid_hash is not None:
+            self.grid_hash ^= zobrist.cells_delta(rows * self.width + cols, self.grid[rows, cols], states)
+        self.grid[rows, cols] = states
+        self.cycles.clear()
+    
+    def toggle_cells(self, rows, cols, times=1):
+        """Toggle each cell times times, like that many toggle_cell calls"""
+        num_states = len(self.ruleset.state_colors)
+        current = np.asarray(self.grid[rows, cols]).astype(np.int64)
+        self.set_cells(rows, cols, (current + times) % num_states)
+    
+    def _edit_cell(self, row, col, state):
+        """Set one cell, keeping the grid hash but starting a new run"""
+        if self.grid_hash is not None:
+            index = row * self.width + col
+            self.grid_hash ^= zobrist.cell_key(index, int(self.grid[row, col])) ^ zobrist.cell_key(index, state)
+        self.grid[row, col] = state
+        self.cycles.clear()
+    
+    def get_active_bounding_box(self):
+        """Calculate bounding box containing all non-zero cells"""
+        non_zero = np.argwhere(self.grid != 0)
+        
+        if len(non_zero) == 0:
+            return None
+        
+        min_row = max(0, non_zero[:, 0].min() - self.neighborhood_radius - 1)
+        max_row = min(self.height - 1, non_zero[:, 0].max() + self.neighborhood_radius + 1)
+        min_col = max(0, non_zero[:, 1].min() - self.neighborhood_radius - 1)
+        max_col = min(self.width - 1, non_zero[:, 1].max() + self.neighborhood_radius + 1)
+        
+        return (min_row, max_row, min_col, max_col)
+    
+    def evolve(self):
+        """Execute one generation using vectorized NumPy operations"""
+        timer = self.timer
+        start = time.perf_counter() if timer else 0
+        self._begin_generation()
+        self.previous_grid = self.grid.copy()
+        
+        states = list(self.ruleset.state_colors.keys())
+        
+        neighbor_counts = {}
+        for state in states:
+            state_mask = (self.grid == state).astype(np.int8)
+            neighbor_counts[state] = self._convolve2d(state_mask, self.kernel)
+        if timer:
+            start = timer.lap("neighbours", start)
+        
+        new_grid = self._apply_rules(self.grid, neighbor_counts)
+        if timer:
+            start = timer.lap("rules", start)
+        self._track_changes(self.previous_grid, new_grid)
+        if timer:
+            start = timer.lap("hash", start)
+        
+        self._grid = new_grid
+        self._finish_generation(start)
+    
+    def evolve_with_bounding_box(self):
+        """Evolve only the active region - massive speedup for sparse patterns"""
+        timer = self.timer
+        start = time.perf_counter() if timer else 0
+        self._begin_generation()
+        bbox = self.get_active_bounding_box()
+        
+        if bbox is None:
+            self._finish_generation(start)
+            return
+        
+        min_row, max_row, min_col, max_col = bbox
+        
+        # Extract region WITH PADDING for neighbor counting
+        pad = self.neighborhood_radius
+        padded_min_row = max(0, min_row - pad)
+        padded_max_row = min(self.height - 1, max_row + pad)
+        padded_min_col = max(0, min_col - pad)
+        padded_max_col = min(self.width - 1, max_col + pad)
+        
+        padded_grid = self.grid[padded_min_row:padded_max_row+1, padded_min_col:padded_max_col+1].copy()
+        
+        states = list(self.ruleset.state_colors.keys())
+        
+        # USE FAST CONVOLUTION on padded region
+        neighbor_counts = {}
+        for state in states:
+            state_mask = (padded_grid == state).astype(np.int8)
+            # This uses the FAST np.roll method
+            padded_neighbors = self._convolve2d(state_mask, self.kernel)
+            # Extract just the active region from padded result
+            active_start_row = min_row - padded_min_row
+            active_end_row = active_start_row + (max_row - min_row + 1)
+            active_start_col = min_col - padded_min_col
+            active_end_col = active_start_col + (max_col - min_col + 1)
+            neighbor_counts[state] = padded_neighbors[active_start_row:active_end_row, active_start_col:active_end_col]
+        if timer:
+            start = timer.lap("neighbours", start)
+        
+        active_grid = self.grid[min_row:max_row+1, min_col:max_col+1].copy()
+        
+        new_active_grid = self._apply_rules(active_grid, neighbor_counts)
+        if timer:
+            start = timer.lap("rules", start)
+        self._track_changes(active_grid, new_active_grid, min_row, min_col)
+        if timer:
+            start = timer.lap("hash", start)
+        
+        self.grid[min_row:max_row+1, min_col:max_col+1] = new_active_grid
+        self._finish_generation(start)
+    
+    def evolve_auto(self):
+        """
+        Pick the cheaper evolution method for the current pattern
+        
+        Returns False (and does nothing) when the grid is empty.
+        """
+        if self.is_mapped:
+            self.evolve_banded()
+            return True
+        
+        bbox = self.get_active_bounding_box()
+        
+        if bbox is None:
+            return False
+        
+        min_row, max_row, min_col, max_col = bbox
+        bbox_area = (max_row - min_row + 1) * (max_col - min_col + 1)
+        total_area = self.height * self.width
+        
+        # Use bounding box ONLY if active region is less than 20% of total grid
+        # Above 20%, the overhead isn't worth it
+        if bbox_area < total_area * 0.2:
+            self.evolve_with_bounding_box()
+        else:
+            # Use regular fast evolution for larger patterns
+            self.evolve()
+        return True
+    
+    def evolve_banded(self):
+        """
+        Evolve in place one band of rows at a time
+        
+        Only a band plus radius rows either side is held in memory, so this
+        works on memory-mapped grids far larger than RAM. The rows just above
+        the next band are copied before the band is overwritten, and the
+        first rows are kept for the wrap-around at the bottom. Gives the same
+        result as evolve().
+        """
+        timer = self.timer
+        lap = time.perf_counter() if timer else 0
+        self._begin_generation()
+        r = self.neighborhood_radius
+        height = self.height
+        band = self.band_rows()
+        states = list(self.ruleset.state_colors.keys())
+        
+        first_rows = np.array(self.grid[:r])
+        above = np.array(self.grid[height - r:])
+        
+        for start in range(0, height, band):
+            end = min(start + band, height)
+            
+            # Rows below the band are untouched until the next band,
+            # except past the bottom edge where the saved first rows wrap
+            below = np.array(self.grid[end:end + r])
+            if len(below) < r:
+                below = np.concatenate([below, first_rows[:r - len(below)]])
+            
+            block = np.concatenate([above, self.grid[start:end], below])
+            
+            neighbor_counts = {}
+            for state in states:
+                state_mask = (block == state).astype(np.int8)
+                neighbor_counts[state] = self._convolve2d(state_mask, self.kernel)[r:r + end - start]
+            if timer:
+                lap = timer.lap("neighbours", lap)
+            
+            new_band = self._apply_rules(block[r:r + end - start], neighbor_counts)
+            if timer:
+                lap = timer.lap("rules", lap)
+            
+            above = np.array(self.grid[end - r:end])
+            
+            # Skip unchanged bands so still regions of a mapped file stay clean
+            if not np.array_equal(new_band, block[r:r + end - start]):
+                self._track_changes(block[r:r + end - start], new_band, start)
+                self.grid[start:end] = new_band
+            if timer:
+                lap = timer.lap("hash", lap)
+        
+        self._finish_generation(lap)
+    
+    def count_states(self):
+        """Number of cells in each state, counted a band at a time"""
+        counts = np.zeros(1, dtype=np.int64)
+        band = self.band_rows()
+        
+        for start in range(0, self.height, band):
+            band_counts = np.bincount(np.asarray(self.grid[start:start + band]).ravel().astype(np.intp))
+            if len(band_counts) > len(counts):
+                counts = np.pad(counts, (0, len(band_counts) - len(counts)))
+            counts[:len(band_counts)] += band_counts
+        
+        return {state: int(count) for state, count in enumerate(counts) if count}
+    
+    def clamp_states(self, max_state):
+        """Set any cell above max_state back to 0, a band at a time"""
+        band = self.band_rows()
+        for start in range(0, self.height, band):
+            rows = self.grid[start:start + band]
+            rows[rows > max_state] = 0
+    
+    def _apply_rules(self, region, neighbor_counts):
+        """Return the next states of region given its neighbour counts per state"""
+        new_region = region.copy()
+        
+        for rule in self.ruleset.rules:
+            current_state_mask = (region == rule.current_state)
+            conditions_met = np.ones_like(region, dtype=bool)
+            
+            for condition in rule.conditions:
+                neighbor_state = condition["neighbor_state"]
+                operator_str = condition["operator"]
+                count = condition["count"]
+                
+                neighbor_count_array = neighbor_counts[neighbor_state]
+                
+                if operator_str == "=":
+                    conditions_met &= (neighbor_count_array == count)
+                elif operator_str == "!=":
+                    conditions_met &= (neighbor_count_array != count)
+                elif operator_str == "<":
+                    conditions_met &= (neighbor_count_array < count)
+                elif operator_str == "<=":
+                    conditions_met &= (neighbor_count_array <= count)
+                elif operator_str == ">":
+                    conditions_met &= (neighbor_count_array > count)
+                elif operator_str == ">=":
+                    conditions_met &= (neighbor_count_array >= count)
+            
+            rule_applies = current_state_mask & conditions_met
+            new_region[rule_applies] = rule.next_state
+        
+        return new_region
+    
+    def _convolve2d(self, array, kernel):
+        """Fast convolution using np.roll"""
+        result = np.zeros_like(array)
+        for dy in range(-self.neighborhood_radius, self.neighborhood_radius + 1):
+            for dx in range(-self.neighborhood_radius, self.neighborhood_radius + 1):
+                if kernel[dy + self.neighborhood_radius, dx + self.neighborhood_radius] == 1:
+                    result += np.roll(np.roll(array, dy, axis=0), dx, axis=1)
+        return result
+    
+    def reset(self):
+        if self.is_mapped:
+            self.grid[:] = 0
+            self.reset_cycle_detection()
+        else:
+            self.grid = np.zeros((self.height, self.width), dtype=np.int8)
+        self.generation = 0
+        self.history.clear()
+        self.history.save_state(self.grid)
@@ -0,0 +1,290 @@
+"""
+gridstate.py - Compact binary .gridstate files
+Replaces pickling the whole grid. A file is a small versioned header
+followed by the cells in row chunks, each bit-packed and zlib compressed,
+so grids are saved and loaded a chunk at a time.
+
+Files made by create_mapped store the cells uncompressed instead, one
+byte per cell, so they can be opened as an np.memmap and evolved without
+loading the whole grid into memory.
+
+File layout:
+    8 bytes   magic b"GRIDSTAT"
+    2 bytes   format version (little endian)
+    4 bytes   header length
+    header    UTF-8 JSON: shape, dtype, generation, palette,
+              ruleset_hash, encoding, bits, chunk_rows
+    chunks    4 byte length + data, one per chunk_rows rows. The top bit
+              of the length is set when the data is stored without zlib
+              (random-looking chunks barely compress)
+For the "raw" encoding the header is padded so the cells start at
+data_offset and the header can be rewritten in place.
+"""
+
+import hashlib
+import json
+import struct
+import zlib
+import numpy as np
+
+MAGIC = b"GRIDSTAT"
+VERSION = 1
+CHUNK_CELLS = 1 << 22
+COMPRESSION_LEVEL = 1
+STORED_FLAG = 1 << 31
+RAW_DATA_OFFSET = 4096
+
+_PREFIX = struct.Struct("<8sHI")
+_CHUNK = struct.Struct("<I")
+
+
+class GridStateError(ValueError):
+    """Raised when a file is not a valid .gridstate file"""
+
+
+def ruleset_hash(ruleset):
+    """Short hash of a RuleSet's rules so a loader can spot a rules mismatch"""
+    rules = [{"current_state": rule.current_state,
+              "conditions": rule.conditions,
+              "next_state": rule.next_state} for rule in ruleset.rules]
+    text = json.dumps(rules, sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def bits_for(max_state):
+    """Smallest of 1, 2, 4 or 8 bits that can hold every state"""
+    for bits in (1, 2, 4):
+        if max_state < (1 << bits):
+            return bits
+    return 8
+
+
+def pack_cells(values, bits):
+    """Pack a flat uint8 array into bytes using bits per cell"""
+    if bits == 8:
+        return values.tobytes()
+    if bits == 1:
+        return np.packbits(values, bitorder="little").tobytes()
+    
+    per_byte = 8 // bits
+    padded = np.zeros(-(-len(values) // per_byte) * per_byte, dtype=np.uint8)
+    padded[:len(values)] = values
+    groups = padded.reshape(-1, per_byte)
+    
+    packed = np.zeros(len(groups), dtype=np.uint8)
+    for i in range(per_byte):
+        packed |= groups[:, i] << (bits * i)
+    return packed.tobytes()
+
+
+def unpack_cells(data, bits, count, out=None):
+    """Reverse of pack_cells: count cells as a flat uint8 array"""
+    packed = np.frombuffer(data, dtype=np.uint8)
+    if out is None:
+        out = np.empty(count, dtype=np.uint8)
+    
+    if bits == 8:
+        out[:] = packed[:count]
+        return out
+    if bits == 1:
+        out[:] = np.unpackbits(packed, count=count, bitorder="little")
+        return out
+    
+    per_byte = 8 // bits
+    mask = (1 << bits) - 1
+    groups = np.empty((len(packed), per_byte), dtype=np.uint8)
+    for i in range(per_byte):
+        np.bitwise_and(packed >> (bits * i), mask, out=groups[:, i])
+    out[:] = groups.ravel()[:count]
+    return out
+
+
+def save(path, grid, generation=0, state_colors=None, rules_hash=None):
+    """
+    Write grid to path in the .gridstate format
+    
+    Args:
+        grid: 2D integer array of non-negative cell states
+        generation: Generation number stored in the header
+        state_colors: Optional {state: "#rrggbb"} palette
+        rules_hash: Optional ruleset_hash() of the rules that made the grid
+    """
+    rows, cols = grid.shape
+    max_state = int(grid.max()) if grid.size else 0
+    bits = bits_for(max_state)
+    chunk_rows = max(1, CHUNK_CELLS // max(cols, 1))
+    
+    header = {
+        "shape": [rows, cols],
+        "dtype": str(grid.dtype),
+        "generation": int(generation),
+        "palette": {str(state): color for state, color in (state_colors or {}).items()},
+        "ruleset_hash": rules_hash,
+        "encoding": "packed",
+        "bits": bits,
+        "chunk_rows": chunk_rows
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    
+    with open(path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        
+        for start in range(0, rows, chunk_rows):
+            chunk = np.ascontiguousarray(grid[start:start + chunk_rows], dtype=np.uint8)
+            packed = pack_cells(chunk.ravel(), bits)
+            data = zlib.compress(packed, COMPRESSION_LEVEL)
+            
+            if len(data) >= len(packed):
+                f.write(_CHUNK.pack(len(packed) | STORED_FLAG))
+                f.write(packed)
+            else:
+                f.write(_CHUNK.pack(len(data)))
+                f.write(data)
+
+
+def read_header(f):
+    """Read and check the header from an open binary file"""
+    prefix = f.read(_PREFIX.size)
+    if len(prefix) < _PREFIX.size:
+        raise GridStateError("Not a grid state file")
+    
+    magic, version, header_length = _PREFIX.unpack(prefix)
+    if magic != MAGIC:
+        raise GridStateError("Not a grid state file")
+    if version > VERSION:
+        raise GridStateError(f"Grid state version {version} is newer than supported ({VERSION})")
+    
+    try:
+        header = json.loads(f.read(header_length).decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise GridStateError("Corrupted grid state header")
+    
+    header["version"] = version
+    header.setdefault("encoding", "packed")
+    header["palette"] = {int(state): color for state, color in header.get("palette", {}).items()}
+    return header
+
+
+def load(path, out=None):
+    """
+    Read a .gridstate file one chunk at a time
+    
+    Args:
+        out: Optional preallocated array with the file's shape to decode into
+    
+    Returns:
+        (grid, header)
+    """
+    with open(path, "rb") as f:
+        header = read_header(f)
+        rows, cols = header["shape"]
+        bits = header["bits"]
+        chunk_rows = header["chunk_rows"]
+        
+        if out is None:
+            out = np.empty((rows, cols), dtype=np.dtype(header["dtype"]))
+        elif out.shape != (rows, cols):
+            raise GridStateError(f"Grid is {rows}x{cols}, expected {out.shape[0]}x{out.shape[1]}")
+        
+        if header["encoding"] == "raw":
+            f.seek(header["data_offset"])
+            for start in range(0, rows, chunk_rows):
+                count = min(chunk_rows, rows - start) * cols
+                cells = np.fromfile(f, dtype=np.uint8, count=count)
+                if len(cells) < count:
+                    raise GridStateError("Grid state file is truncated")
+                out[start:start + chunk_rows] = cells.reshape(-1, cols)
+            return out, header
+        
+        buffer = np.empty(chunk_rows * cols, dtype=np.uint8)
+        for start in range(0, rows, chunk_rows):
+            length_bytes = f.read(_CHUNK.size)
+            if len(length_bytes) < _CHUNK.size:
+                raise GridStateError("Grid state file is truncated")
+            
+            length = _CHUNK.unpack(length_bytes)[0]
+            data = f.read(length & ~STORED_FLAG)
+            if not length & STORED_FLAG:
+                try:
+                    data = zlib.decompress(data)
+                except zlib.error:
+                    raise GridStateError("Corrupted grid state data")
+            
+            count = min(chunk_rows, rows - start) * cols
+            cells = unpack_cells(data, bits, count, out=buffer[:count])
+            out[start:start + chunk_rows] = cells.reshape(-1, cols)
+    
+    return out, header
+
+
+def _write_raw_header(f, header):
+    header_bytes = json.dumps(header).encode("utf-8")
+    space = RAW_DATA_OFFSET - _PREFIX.size
+    if len(header_bytes) > space:
+        raise GridStateError("Grid state header too large")
+    
+    f.seek(0)
+    f.write(_PREFIX.pack(MAGIC, VERSION, space))
+    f.write(header_bytes.ljust(space, b" "))
+
+
+def create_mapped(path, shape, generation=0, state_colors=None, rules_hash=None):
+    """
+    Create an uncompressed .gridstate file of all zero cells and map it
+    
+    The file is extended rather than written, so on most file systems a
+    huge grid takes no disk space until cells are set.
+    
+    Returns:
+        np.memmap of int8 cells, opened read-write
+    """
+    rows, cols = shape
+    header = {
+        "shape": [rows, cols],
+        "dtype": "int8",
+        "generation": int(generation),
+        "palette": {str(state): color for state, color in (state_colors or {}).items()},
+        "ruleset_hash": rules_hash,
+        "encoding": "raw",
+        "bits": 8,
+        "chunk_rows": max(1, CHUNK_CELLS // max(cols, 1)),
+        "data_offset": RAW_DATA_OFFSET
+    }
+    
+    with open(path, "wb") as f:
+        _write_raw_header(f, header)
+        f.truncate(RAW_DATA_OFFSET + rows * cols)
+    
+    return np.memmap(path, dtype=np.int8, mode="r+", offset=RAW_DATA_OFFSET, shape=(rows, cols))
+
+
+def open_mapped(path, mode="r+"):
+    """
+    Map the cells of an uncompressed .gridstate file
+    
+    Returns:
+        (np.memmap, header)
+    """
+    with open(path, "rb") as f:
+        header = read_header(f)
+    
+    if header["encoding"] != "raw":
+        raise GridStateError("Grid state file is compressed and cannot be mapped")
+    
+    grid = np.memmap(path, dtype=np.int8, mode=mode, offset=header["data_offset"],
+                     shape=tuple(header["shape"]))
+    return grid, header
+
+
+def update_header(path, **fields):
+    """Rewrite header fields (e.g. generation) of an uncompressed .gridstate file in place"""
+    with open(path, "r+b") as f:
+        header = read_header(f)
+        if header["encoding"] != "raw":
+            raise GridStateError("Only uncompressed grid state headers can be updated")
+        
+        del header["version"]
+        header.update(fields)
+        header["palette"] = {str(state): color for state, color in header["palette"].items()}
+        _write_raw_header(f, header)
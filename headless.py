@@ -0,0 +1,353 @@
+"""
+headless.py - Run cellular automata without a window
+
+Loads a neighbour preset, a pointer preset or a 1D rule number, runs it
+for N generations and writes the results to disk:
+    final_state.npy   - final grid (or final row for 1D); skipped when
+                        the grid runs out-of-core in a --state-file
+    populations.csv   - per-generation state counts and step time
+    summary.json      - settings, total time and throughput
+
+Usage:
+    python -m headless grid --preset Seeds --generations 1000
+    python -m headless pointer --preset "Langton's Ant" --generations 20000
+    python -m headless 1d --rule 110 --generations 5000 --width 4096
+    python -m headless grid --preset Seeds --rows 50000 --cols 50000 --state-file big.gridstate
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import numpy as np
+
+import engine_1D
+import gridstate
+from grid_engine import RuleSet, CellularAutomaton, density_distribution, sample_states, new_seed
+from pointer_engine import Pointer, PointerWorld
+
+NEIGHBOUR_SAVE_DIR = "neighbour_save"
+POINTER_SAVE_DIR = "pointer_save"
+ONE_D_CHUNK = 1024
+
+
+def load_neighbour_preset(preset_name):
+    """
+    Load a neighbour_save preset
+    
+    Returns:
+        (rules, colors) in the form basic_grid.change_rules expects
+    """
+    file_path = os.path.join(NEIGHBOUR_SAVE_DIR, f"{preset_name}.json")
+    with open(file_path, "r") as f:
+        rules = json.load(f)
+    
+    if not isinstance(rules, list) or len(rules) == 0:
+        raise ValueError("Invalid save file format")
+    
+    for rule in rules:
+        required_keys = ["current_state", "conditions", "next_state", "color"]
+        if not all(key in rule for key in required_keys):
+            raise ValueError("Corrupted save file")
+    
+    colors = {}
+    for rule in rules:
+        colors[rule["next_state"]] = rule["color"]
+    return rules, colors
+
+
+def load_pointer_preset(preset_name):
+    """
+    Load a pointer_save preset
+    
+    Returns:
+        (rules, colors) with integer state keys
+    """
+    file_path = os.path.join(POINTER_SAVE_DIR, f"{preset_name}.json")
+    with open(file_path, "r") as f:
+        config = json.load(f)
+    
+    if not isinstance(config, dict) or "rules" not in config or "state_colors" not in config:
+        raise ValueError("Corrupted save file")
+    if not isinstance(config["rules"], list) or len(config["rules"]) == 0:
+        raise ValueError("No rules in save file")
+    
+    colors = {int(k): v for k, v in config["state_colors"].items()}
+    return config["rules"], colors
+
+
+def parse_ratios(text, num_states):
+    """Turn "1,1,0" into {0: 1, 1: 1, 2: 0}; default is equal weights"""
+    if not text:
+        return {state: 1 for state in range(num_states)}
+    
+    weights = [int(part) for part in text.split(",")]
+    return {state: weights[state] if state < len(weights) else 0 for state in range(num_states)}
+
+
+def seed_grid(shape, ratios, rng):
+    """Random grid with states drawn in proportion to ratios"""
+    distribution = density_distribution(ratios)
+    if distribution is None:
+        return np.zeros(shape, dtype=np.int8)
+    return sample_states(rng, shape, distribution)
+
+
+def run_grid(args, rng):
+    rules, colors = load_neighbour_preset(args.preset)
+    ruleset = RuleSet()
+    ruleset.change_rules(rules, colors)
+    num_states = max(ruleset.state_colors.keys()) + 1
+    
+    automaton = CellularAutomaton(args.cols, args.rows, ruleset, wrapping=True,
+                                  neighborhood_type=args.neighbourhood,
+                                  neighborhood_radius=args.radius, history_size=0)
+    ratios = parse_ratios(args.ratios, num_states)
+    
+    if args.state_file:
+        # Out-of-core run: the grid lives in an uncompressed .gridstate file
+        if os.path.exists(args.state_file):
+            grid, header = gridstate.open_mapped(args.state_file)
+            automaton.attach_grid(grid, header["generation"])
+        else:
+            grid = gridstate.create_mapped(args.state_file, (args.rows, args.cols), 0, colors,
+                                           gridstate.ruleset_hash(ruleset))
+            automaton.attach_grid(grid)
+            automaton.seed_density(ratios, args.seed)
+    else:
+        automaton.seed_density(ratios, args.seed)
+    
+    evolve = {"auto": automaton.evolve_auto,
+              "full": automaton.evolve,
+              "bbox": automaton.evolve_with_bounding_box}[args.backend]
+    
+    if automaton.is_mapped:
+        evolve = automaton.evolve_banded
+    
+    def step():
+        evolve()
+        return _counts_list(automaton.count_states(), num_states)
+    
+    initial_counts = _counts_list(automaton.count_states(), num_states)
+    rows, timings, cycle = _run_steps(step, args.generations, initial_counts, automaton, args.on_cycle)
+    
+    if automaton.is_mapped:
+        automaton.grid.flush()
+        gridstate.update_header(args.state_file, generation=automaton.generation)
+        return None, rows, timings, num_states, automaton.height * automaton.width, cycle
+    return automaton.grid, rows, timings, num_states, args.rows * args.cols, cycle
+
+
+def run_pointer(args, rng):
+    rules, colors = load_pointer_preset(args.preset)
+    num_states = max(colors.keys()) + 1
+    
+    world = PointerWorld(args.rows, args.cols, wrapping=not args.no_wrap, sparse=args.backend == "sparse",
+                         merge_duplicates=args.merge)
+    world.rules = rules
+    world.add_pointer(Pointer(args.rows // 2, args.cols // 2, user_created=True))
+    
+    warned = []
+    
+    def step():
+        if not world.step_generation() and not warned:
+            print(f"Pointer limit reached ({world.max_pointers})", file=sys.stderr)
+            warned.append(True)
+        return _counts_list(world.state_counts, num_states)
+    
+    initial_counts = _counts_list(world.state_counts, num_states)
+    rows, timings, cycle = _run_steps(step, args.generations, initial_counts, world, args.on_cycle)
+    return world.to_array(), rows, timings, num_states, world.population, cycle
+
+
+def run_1d(args, rng):
+    rule = engine_1D.Rule1D(args.rule, args.states, args.radius, args.totalistic)
+    
+    row = np.zeros(args.width, dtype=np.uint8)
+    if args.random_start:
+        row[:] = rng.integers(0, rule.states, size=args.width)
+    else:
+        row[args.width // 2] = 1
+    
+    counts = [[0] + list(np.bincount(row, minlength=rule.states))]
+    timings = []
+    block = np.empty((ONE_D_CHUNK + 1, args.width), dtype=np.uint8)
+    done = 0
+    
+    # Compute whole blocks of generations at a time
+    while done < args.generations:
+        chunk = min(ONE_D_CHUNK, args.generations - done)
+        start = time.perf_counter()
+        rule.run(row, chunk, out=block[:chunk + 1])
+        elapsed = time.perf_counter() - start
+        
+        for i in range(1, chunk + 1):
+            counts.append([done + i] + list(np.bincount(block[i], minlength=rule.states)))
+        timings.extend([elapsed / chunk] * chunk)
+        
+        row = block[chunk].copy()
+        done += chunk
+    
+    return row, counts, timings, rule.states, args.width, None
+
+
+def _counts_list(state_counts, num_states):
+    return [state_counts.get(state, 0) for state in range(num_states)]
+
+
+def _run_steps(step, generations, initial_counts, engine=None, on_cycle="continue"):
+    """
+    Call step() generations times, recording counts and time per step
+    
+    With an engine that detects cycles, on_cycle decides what happens once
+    the run repeats a state: "continue", "stop" early, or "skip" whole
+    periods towards the last generation without computing them.
+    
+    Returns:
+        (rows, timings, cycle) where cycle describes the first cycle found or is None
+    """
+    rows = [[0] + list(initial_counts)]
+    timings = []
+    cycle = None
+    generation = 0
+    
+    while generation < generations:
+        start = time.perf_counter()
+        counts = step()
+        timings.append(time.perf_counter() - start)
+        generation += 1
+        rows.append([generation] + list(counts))
+        
+        if engine is None or cycle is not None or not engine.cycle_period:
+            continue
+        
+        cycle = {"period": engine.cycle_period, "start": engine.cycles.start,
+                 "detected": engine.generation, "skipped": 0}
+        if on_cycle == "stop":
+            break
+        if on_cycle == "skip":
+            skipped = engine.fast_forward(engine.generation + generations - generation)
+            cycle["skipped"] = skipped
+            # The state after the skip is the one just computed
+            generation += skipped
+            rows[-1][0] = generation
+    
+    return rows, timings, cycle
+
+
+def write_results(output_dir, final_state, rows, timings, num_states, summary):
+    os.makedirs(output_dir, exist_ok=True)
+    
+    if final_state is not None:
+        np.save(os.path.join(output_dir, "final_state.npy"), final_state)
+    
+    with open(os.path.join(output_dir, "populations.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["generation"] + [f"state_{s}" for s in range(num_states)] + ["step_ms"])
+        for i, row in enumerate(rows):
+            step_ms = timings[i - 1] * 1000 if i > 0 else 0.0
+            writer.writerow([int(v) for v in row] + [f"{step_ms:.4f}"])
+    
+    with open(os.path.join(output_dir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m headless", description="Run an automaton without a window")
+    sub = parser.add_subparsers(dest="kind", required=True)
+    
+    def common(p):
+        p.add_argument("-n", "--generations", type=int, default=1000)
+        p.add_argument("-o", "--output", help="Output folder (default headless_output/<kind>_<time>)")
+        p.add_argument("--seed", type=int, help="Random seed for the initial state (default: a new one, saved in the summary)")
+    
+    grid = sub.add_parser("grid", help="Neighbour preset from neighbour_save/")
+    grid.add_argument("--preset", required=True)
+    grid.add_argument("--rows", type=int, default=256)
+    grid.add_argument("--cols", type=int, default=256)
+    grid.add_argument("--radius", type=int, default=1)
+    grid.add_argument("--neighbourhood", choices=["moore", "von_neumann"], default="moore")
+    grid.add_argument("--backend", choices=["auto", "full", "bbox"], default="auto")
+    grid.add_argument("--ratios", help="Comma separated density weights per state, e.g. 3,1")
+    grid.add_argument("--state-file", help="Run out-of-core on this uncompressed .gridstate file "
+                                           "(created and seeded if missing)")
+    common(grid)
+    
+    pointer = sub.add_parser("pointer", help="Pointer preset from pointer_save/")
+    pointer.add_argument("--preset", required=True)
+    pointer.add_argument("--rows", type=int, default=256)
+    pointer.add_argument("--cols", type=int, default=256)
+    pointer.add_argument("--backend", choices=["dense", "sparse"], default="dense")
+    pointer.add_argument("--no-wrap", action="store_true")
+    pointer.add_argument("--merge", action="store_true",
+                         help="Step pointers with the same position and direction as one group")
+    
+    for p in (grid, pointer):
+        p.add_argument("--on-cycle", choices=["continue", "stop", "skip"], default="continue",
+                       help="What to do once the run repeats an earlier state")
+    common(pointer)
+    
+    one_d = sub.add_parser("1d", help="1D rule number")
+    one_d.add_argument("--rule", type=engine_1D.parse_rule_number, required=True,
+                       help="Rule number, any length (4-state radius-3 rules run to about 9900 digits)")
+    one_d.add_argument("--states", type=int, default=2)
+    one_d.add_argument("--radius", type=int, default=1)
+    one_d.add_argument("--totalistic", action="store_true")
+    one_d.add_argument("--width", type=int, default=4096)
+    one_d.add_argument("--random-start", action="store_true")
+    common(one_d)
+    
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # Always seed, and report the seed, so any run can be repeated
+    if args.seed is None:
+        args.seed = new_seed()
+    rng = np.random.default_rng(args.seed)
+    
+    runners = {"grid": run_grid, "pointer": run_pointer, "1d": run_1d}
+    try:
+        final_state, rows, timings, num_states, size, cycle = runners[args.kind](args, rng)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    
+    total = sum(timings)
+    if args.kind == "1d":
+        # Long rule numbers are shortened to keep the folder name valid
+        digits = engine_1D.format_rule_number(args.rule)
+        name = f"rule{digits}" if len(digits) <= 40 else f"rule{digits[:16]}_{len(digits)}digits"
+    else:
+        name = args.preset
+    output_dir = args.output or os.path.join("headless_output", f"{args.kind}_{name}_{time.strftime('%Y%m%d_%H%M%S')}")
+    
+    summary = {
+        "kind": args.kind,
+        "name": name,
+        "generations": int(rows[-1][0]),
+        "backend": getattr(args, "backend", "numpy"),
+        "seed": args.seed,
+        "total_seconds": total,
+        "ms_per_step": total / len(timings) * 1000 if timings else 0.0,
+        "final_population": {str(s): int(c) for s, c in enumerate(rows[-1][1:])},
+        "cycle": cycle
+    }
+    if args.kind == "1d":
+        summary["rule"] = digits
+    if args.kind == "pointer":
+        summary["pointers"] = size
+        summary["steps_per_second"] = len(timings) / total if total > 0 else None
+    else:
+        summary["cells_per_second"] = size * len(timings) / total if total > 0 else None
+    
+    write_results(output_dir, final_state, rows, timings, num_states, summary)
+    print(f"{args.kind} {name}: {summary['generations']} generations in {total:.3f}s -> {output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -28,7 +28,10 @@ DEFAULT_KEYBINDS = {
     "redo": "Control-y",
     "step_forward": "period",
     "speed_up": "plus",
-    "speed_down": "minus"
+    "speed_down": "minus",
+    "record": "Control-r",
+    "hud": "F3",
+    "profile": "F9"
 }
 
 # Current keybinds (loaded from file or defaults)
@@ -128,7 +131,10 @@ def show_collision_error(key, conflicting_action):
         "redo": "Redo",
         "step_forward": "Step Forward",
         "speed_up": "Speed Up",
-        "speed_down": "Speed Down"
+        "speed_down": "Speed Down",
+        "record": "Start / Stop Recording",
+        "hud": "Toggle Performance HUD",
+        "profile": "Capture Profile"
     }
     
     display_name = action_names.get(conflicting_action, conflicting_action)
@@ -498,7 +504,10 @@ def setup_in_frame(root, container, back_func):
             ("Redo", "redo"),
             ("Step Forward", "step_forward"),
             ("Speed Up", "speed_up"),
-            ("Speed Down", "speed_down")
+            ("Speed Down", "speed_down"),
+            ("Record", "record"),
+            ("Performance HUD", "hud"),
+            ("Capture Profile", "profile")
         ]),
         ("Navigation", [
             ("Move Up", "move_up"),
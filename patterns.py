@@ -0,0 +1,499 @@
+"""
+patterns.py - RLE and macrocell pattern import/export
+Reads and writes the run-length (.rle) and macrocell (.mc) formats used by
+Golly and other Life tools. Both readers decode with NumPy, straight into
+a NumPy grid or a sparse {(row, col): state} dict, and never build a
+Python object per cell for the NumPy target.
+
+RLE states: b/. = 0, o = 1, A-X = 1-24, and p-y before A-X adds
+24 per letter (pA = 25, qA = 49, ...).
+"""
+
+import os
+import re
+import numpy as np
+
+RLE_CHUNK_BYTES = 1 << 22
+RLE_LINE_LENGTH = 70
+
+_HEADER_RE = re.compile(rb"x\s*=\s*(\d+)\s*,\s*y\s*=\s*(\d+)(?:\s*,\s*rule\s*=\s*(\S+))?")
+
+# Byte -> state for RLE cell tags, -1 for anything that is not a tag
+_RLE_STATES = np.full(256, -1, dtype=np.int16)
+_RLE_STATES[ord("b")] = 0
+_RLE_STATES[ord(".")] = 0
+_RLE_STATES[ord("o")] = 1
+_RLE_STATES[ord("A"):ord("X") + 1] = np.arange(1, 25)
+
+_NEWLINE = ord("$")
+
+
+class PatternError(ValueError):
+    """Raised when a pattern file cannot be parsed"""
+
+
+def read_pattern(path, out=None, offset=(0, 0)):
+    """
+    Read an .rle or .mc file
+    
+    Args:
+        out: Optional NumPy grid or dict to decode into. A new int8 grid
+             sized to the pattern is made when omitted.
+        offset: (row, col) of the pattern's top-left corner in out.
+                Cells outside a NumPy grid are clipped.
+    
+    Returns:
+        (out, info) where info has "width", "height" and "rule"
+    """
+    if os.path.splitext(path)[1].lower() == ".mc":
+        return read_macrocell(path, out, offset)
+    return read_rle(path, out, offset)
+
+
+def read_info(path):
+    """
+    Size and rule of a pattern without placing it
+    
+    Only the header is read for RLE. Macrocell files have no size in
+    their header, so the tree is decoded to find the live bounding box.
+    """
+    if os.path.splitext(path)[1].lower() == ".mc":
+        return _decode_macrocell(path)[3]
+    with open(path, "rb") as f:
+        return _read_rle_header(f)
+
+
+def write_pattern(path, grid, rule=None):
+    """Write grid, cropped to its live cells, as .mc or .rle by extension"""
+    if os.path.splitext(path)[1].lower() == ".mc":
+        write_macrocell(path, grid, rule)
+    else:
+        write_rle(path, grid, rule)
+
+
+def _place_runs(out, rows, cols, lengths, states, offset):
+    """Write runs of equal cells into a NumPy grid or dict"""
+    keep = states != 0
+    rows, cols, lengths, states = rows[keep] + offset[0], cols[keep] + offset[1], lengths[keep], states[keep]
+    
+    if isinstance(out, dict):
+        cell_rows, cell_cols, cell_states = _expand_runs(rows, cols, lengths, states)
+        out.update(zip(zip(cell_rows.tolist(), cell_cols.tolist()), cell_states.tolist()))
+        return
+    
+    height, width = out.shape
+    inside = (rows >= 0) & (rows < height)
+    rows, cols, lengths, states = rows[inside], cols[inside], lengths[inside], states[inside]
+    
+    # Clip runs to the grid's columns
+    start = np.maximum(cols, 0)
+    end = np.minimum(cols + lengths, width)
+    inside = end > start
+    rows, start, lengths, states = rows[inside], start[inside], (end - start)[inside], states[inside]
+    
+    cell_rows, cell_cols, cell_states = _expand_runs(rows, start, lengths, states)
+    out[cell_rows, cell_cols] = cell_states
+
+
+def _expand_runs(rows, cols, lengths, states):
+    """Turn runs into per-cell coordinate arrays"""
+    total = int(lengths.sum())
+    run_index = np.repeat(np.arange(len(lengths)), lengths)
+    run_start = np.cumsum(lengths) - lengths
+    step = np.arange(total) - run_start[run_index]
+    return rows[run_index], cols[run_index] + step, states[run_index]
+
+
+def _read_rle_header(f):
+    """Skip comment lines and parse the "x = , y = , rule = " line"""
+    for line in f:
+        line = line.strip()
+        if not line or line.startswith(b"#"):
+            continue
+        
+        match = _HEADER_RE.match(line)
+        if not match:
+            raise PatternError("Missing RLE header line")
+        
+        rule = match.group(3).decode("ascii", "replace") if match.group(3) else None
+        return {"width": int(match.group(1)), "height": int(match.group(2)), "rule": rule}
+    
+    raise PatternError("Empty RLE file")
+
+
+def _parse_rle_chunk(data, row, col):
+    """
+    Decode a whitespace-free RLE chunk ending on a tag
+    
+    Returns:
+        (rows, cols, lengths, states, row, col) with the position after the chunk
+    """
+    codes = np.frombuffer(data, dtype=np.uint8)
+    index = np.arange(len(codes))
+    
+    is_digit = (codes >= ord("0")) & (codes <= ord("9"))
+    is_prefix = (codes >= ord("p")) & (codes <= ord("y"))
+    is_tag = ~is_digit & ~is_prefix
+    
+    tag_pos = np.flatnonzero(is_tag)
+    tags = codes[tag_pos]
+    
+    is_newline = tags == _NEWLINE
+    states = _RLE_STATES[tags].astype(np.int64)
+    if np.any((states < 0) & ~is_newline):
+        bad = chr(tags[(states < 0) & ~is_newline][0])
+        raise PatternError(f"Unexpected character {bad!r} in RLE data")
+    
+    # Multi-state prefix letters directly before A-X
+    digits_end = tag_pos
+    if is_prefix.any():
+        has_prefix = np.zeros(len(tag_pos), dtype=bool)
+        has_prefix[tag_pos > 0] = is_prefix[tag_pos[tag_pos > 0] - 1]
+        if np.any(has_prefix & ((tags < ord("A")) | (tags > ord("X")))):
+            raise PatternError("State prefix must be followed by A-X")
+        prefix_codes = codes[np.maximum(tag_pos - 1, 0)].astype(np.int64)
+        states += np.where(has_prefix, (prefix_codes - ord("p") + 1) * 24, 0)
+        digits_end = tag_pos - has_prefix
+    
+    # Run counts: the digits that end just before each tag (or its prefix)
+    last_non_digit = np.maximum.accumulate(np.where(is_digit, -1, index))
+    before = np.maximum(digits_end - 1, 0)
+    num_digits = np.where(digits_end > 0, digits_end - 1 - last_non_digit[before], 0)
+    
+    counts = np.ones(len(tag_pos), dtype=np.int64)
+    counted = np.flatnonzero(num_digits)
+    if len(counted):
+        counted_end = digits_end[counted]
+        counted_digits = num_digits[counted]
+        values = np.zeros(len(counted), dtype=np.int64)
+        for j in range(1, int(counted_digits.max()) + 1):
+            has_digit = counted_digits >= j
+            values[has_digit] += (codes[counted_end[has_digit] - j].astype(np.int64) - ord("0")) * 10 ** (j - 1)
+        counts[counted] = values
+    
+    # Row of each run, and its column measured from the last "$"
+    row_steps = np.where(is_newline, counts, 0)
+    run_rows = row + np.cumsum(row_steps) - row_steps
+    
+    lengths = np.where(is_newline, 0, counts)
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    last_newline = np.maximum.accumulate(np.where(is_newline, np.arange(len(tag_pos)), -1))
+    row_base = np.where(last_newline >= 0, ends[np.maximum(last_newline, 0)], -col)
+    run_cols = starts - row_base
+    
+    if len(tag_pos):
+        row = int(run_rows[-1] + row_steps[-1])
+        col = 0 if is_newline[-1] else int(run_cols[-1] + lengths[-1])
+    
+    cells = ~is_newline
+    return run_rows[cells], run_cols[cells], lengths[cells], states[cells], row, col
+
+
+def read_rle(path, out=None, offset=(0, 0)):
+    """Stream an RLE file into out; see read_pattern"""
+    with open(path, "rb") as f:
+        info = _read_rle_header(f)
+        
+        if out is None:
+            out = np.zeros((info["height"], info["width"]), dtype=np.int8)
+        
+        row = col = 0
+        carry = b""
+        finished = False
+        
+        while not finished:
+            chunk = f.read(RLE_CHUNK_BYTES)
+            if not chunk:
+                break
+            
+            data = carry + chunk.translate(None, b" \t\r\n")
+            end = data.find(b"!")
+            if end >= 0:
+                data = data[:end]
+                finished = True
+                carry = b""
+            else:
+                # Hold back a trailing count or prefix until its tag arrives
+                cut = len(data.rstrip(b"0123456789pqrstuvwxy"))
+                data, carry = data[:cut], data[cut:]
+            
+            if data:
+                rows, cols, lengths, states, row, col = _parse_rle_chunk(data, row, col)
+                _place_runs(out, rows, cols, lengths, states, offset)
+        
+        if carry:
+            raise PatternError("RLE data ends in the middle of a run")
+    
+    return out, info
+
+
+def _rle_tag(state, two_state):
+    if two_state:
+        return "o" if state else "b"
+    if state == 0:
+        return "."
+    if state <= 24:
+        return chr(ord("A") + state - 1)
+    return chr(ord("p") + (state - 25) // 24) + chr(ord("A") + (state - 25) % 24)
+
+
+def _crop_to_live(grid):
+    """Smallest block of grid that holds every non-zero cell"""
+    live_rows = np.flatnonzero(np.any(grid != 0, axis=1))
+    if len(live_rows) == 0:
+        return np.zeros((0, 0), dtype=np.int8)
+    
+    live_cols = np.flatnonzero(np.any(grid[live_rows[0]:live_rows[-1] + 1] != 0, axis=0))
+    return np.asarray(grid[live_rows[0]:live_rows[-1] + 1, live_cols[0]:live_cols[-1] + 1])
+
+
+def write_rle(path, grid, rule=None):
+    """Write grid as RLE, cropped to its live cells"""
+    grid = _crop_to_live(grid)
+    height, width = grid.shape
+    two_state = grid.size == 0 or int(grid.max()) <= 1
+    
+    header = f"x = {width}, y = {height}"
+    if rule:
+        header += f", rule = {rule}"
+    
+    with open(path, "w") as f:
+        f.write(header + "\n")
+        
+        line = ""
+        blank_rows = 0
+        for r in range(height):
+            row = grid[r]
+            live = np.flatnonzero(row)
+            if len(live) == 0:
+                blank_rows += 1
+                continue
+            
+            tokens = []
+            if r > 0:
+                newlines = blank_rows + 1
+                tokens.append(f"{newlines}$" if newlines > 1 else "$")
+            blank_rows = 0
+            
+            # Runs of equal states, ending at the last live cell
+            row = row[:live[-1] + 1]
+            change = np.flatnonzero(np.diff(row)) + 1
+            starts = np.concatenate([[0], change])
+            ends = np.concatenate([change, [len(row)]])
+            for start, end in zip(starts, ends):
+                length = end - start
+                tag = _rle_tag(int(row[start]), two_state)
+                tokens.append(f"{length}{tag}" if length > 1 else tag)
+            
+            for token in tokens:
+                if len(line) + len(token) > RLE_LINE_LENGTH:
+                    f.write(line + "\n")
+                    line = ""
+                line += token
+        
+        f.write(line + "!\n")
+
+
+def read_macrocell(path, out=None, offset=(0, 0)):
+    """
+    Read a macrocell file into out; see read_pattern
+    
+    The pattern's live bounding box is placed at offset.
+    """
+    rows, cols, states, info = _decode_macrocell(path)
+    
+    if out is None:
+        out = np.zeros((info["height"], info["width"]), dtype=np.int8)
+    
+    _place_runs(out, rows, cols, np.ones(len(rows), dtype=np.int64), states, offset)
+    return out, info
+
+
+def _decode_macrocell(path):
+    """
+    Expand a macrocell quadtree into live cell coordinates
+    
+    The tree is expanded one level at a time with NumPy, so repeated
+    subtrees are decoded without recursion.
+    
+    Returns:
+        (rows, cols, states, info) relative to the live bounding box
+    """
+    rule = None
+    leaves = {}
+    children = {}
+    levels = {}
+    leaf_level = None
+    
+    with open(path, "r") as f:
+        first = f.readline()
+        if not first.startswith("[M2]"):
+            raise PatternError("Not a macrocell file")
+        
+        node = 0
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("#"):
+                if line.startswith("#R"):
+                    rule = line[2:].strip() or None
+                continue
+            
+            node += 1
+            if line[0] in ".*$":
+                # Two-state 8x8 leaf: rows of . and * separated by $
+                tile = np.zeros((8, 8), dtype=np.int8)
+                for r, text in enumerate(line.split("$")[:8]):
+                    tile[r, :len(text)] = [ch == "*" for ch in text[:8]]
+                leaves[node] = tile
+                levels[node] = 3
+                leaf_level = 3
+                continue
+            
+            parts = line.split()
+            try:
+                values = [int(p) for p in parts]
+            except ValueError:
+                raise PatternError(f"Bad macrocell line {node}")
+            if len(values) != 5:
+                raise PatternError(f"Bad macrocell line {node}")
+            
+            level = values[0]
+            if level == 1:
+                # Multi-state 2x2 leaf: nw ne sw se states
+                leaves[node] = np.array(values[1:], dtype=np.int8).reshape(2, 2)
+                levels[node] = 1
+                leaf_level = 1
+            else:
+                if any(child >= node for child in values[1:]):
+                    raise PatternError(f"Macrocell node {node} refers forward")
+                children[node] = values[1:]
+                levels[node] = level
+    
+    if node == 0:
+        raise PatternError("Macrocell file has no nodes")
+    
+    count = node + 1
+    child_table = np.zeros((count, 4), dtype=np.int64)
+    for n, kids in children.items():
+        child_table[n] = kids
+    
+    # Expand from the root down to the leaves
+    node_ids = np.array([node])
+    node_rows = np.zeros(1, dtype=np.int64)
+    node_cols = np.zeros(1, dtype=np.int64)
+    level = levels[node]
+    quadrant_rows = np.array([0, 0, 1, 1])
+    quadrant_cols = np.array([0, 1, 0, 1])
+    
+    while level > (leaf_level or 1) and len(node_ids):
+        half = 1 << (level - 1)
+        kids = child_table[node_ids]
+        node_rows = (node_rows[:, None] + quadrant_rows * half).ravel()
+        node_cols = (node_cols[:, None] + quadrant_cols * half).ravel()
+        node_ids = kids.ravel()
+        
+        live = node_ids != 0
+        node_ids, node_rows, node_cols = node_ids[live], node_rows[live], node_cols[live]
+        level -= 1
+    
+    size = 2 if leaf_level == 1 else 8
+    tiles = np.zeros((count, size, size), dtype=np.int8)
+    for n, tile in leaves.items():
+        tiles[n] = tile
+    
+    cells = tiles[node_ids]
+    tile_index, cell_r, cell_c = np.nonzero(cells)
+    rows = node_rows[tile_index] + cell_r
+    cols = node_cols[tile_index] + cell_c
+    states = cells[tile_index, cell_r, cell_c]
+    
+    if len(rows):
+        rows = rows - rows.min()
+        cols = cols - cols.min()
+        info = {"width": int(cols.max()) + 1, "height": int(rows.max()) + 1, "rule": rule}
+    else:
+        info = {"width": 0, "height": 0, "rule": rule}
+    
+    return rows, cols, states.astype(np.int64), info
+
+
+def write_macrocell(path, grid, rule=None):
+    """
+    Write grid as a macrocell file, cropped to its live cells
+    
+    Identical subtrees are shared by numbering each level's distinct
+    blocks with np.unique, so large repetitive patterns stay small.
+    """
+    grid = _crop_to_live(grid)
+    two_state = grid.size == 0 or int(grid.max()) <= 1
+    leaf_size = 8 if two_state else 2
+    leaf_level = 3 if two_state else 1
+    
+    # Pad to a power-of-two square of at least one leaf
+    size = leaf_size
+    while size < max(grid.shape):
+        size *= 2
+    padded = np.zeros((size, size), dtype=np.int8)
+    padded[:grid.shape[0], :grid.shape[1]] = grid
+    
+    n = size // leaf_size
+    tiles = padded.reshape(n, leaf_size, n, leaf_size).swapaxes(1, 2).reshape(n * n, -1)
+    
+    lines = []
+    ids = _number_blocks(tiles, lines, 0, lambda tile: _leaf_line(tile, leaf_size, two_state))
+    ids = ids.reshape(n, n)
+    level = leaf_level
+    
+    while ids.shape[0] > 1:
+        n = ids.shape[0] // 2
+        level += 1
+        quads = ids.reshape(n, 2, n, 2).swapaxes(1, 2).reshape(n * n, 4)
+        ids = _number_blocks(quads, lines, len(lines), lambda kids, lvl=level: f"{lvl} " + " ".join(str(k) for k in kids))
+        ids = ids.reshape(n, n)
+    
+    if not lines:
+        # Empty pattern: a single empty leaf as the root
+        lines.append(_leaf_line(np.zeros(leaf_size * leaf_size, dtype=np.int8), leaf_size, two_state))
+    
+    with open(path, "w") as f:
+        f.write("[M2] (NEA-repo)\n")
+        if rule:
+            f.write(f"#R {rule}\n")
+        f.write("\n".join(lines) + "\n")
+
+
+def _number_blocks(blocks, lines, first_id, describe):
+    """
+    Give each distinct non-empty block a node number, appending its line
+    
+    Returns:
+        Node number per block, 0 for empty blocks
+    """
+    unique, inverse = np.unique(blocks, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    node_numbers = np.zeros(len(unique), dtype=np.int64)
+    
+    next_id = first_id + 1
+    for i, block in enumerate(unique):
+        if not block.any():
+            continue
+        lines.append(describe(block))
+        node_numbers[i] = next_id
+        next_id += 1
+    
+    return node_numbers[inverse]
+
+
+def _leaf_line(tile, leaf_size, two_state):
+    if not two_state:
+        return "1 " + " ".join(str(int(v)) for v in tile)
+    
+    rows = []
+    for row in tile.reshape(leaf_size, leaf_size):
+        rows.append("".join("*" if v else "." for v in row).rstrip("."))
+    while rows and rows[-1] == "":
+        rows.pop()
+    return "".join(row + "$" for row in rows) or "$"
@@ -1,320 +1,739 @@
 """
 Performance Benchmarking Tool
-Compares different storage methods for cellular automata
-Creates graphs and reports for documentation
+Times the real engines headless: CellularAutomaton evolution for every
+neighbour_save preset, PointerWorld / Pointer.step for every pointer_save
+preset and the 1D Rule1D.step, across grid sizes, radii and backends.
+Writes machine-readable JSON plus graphs and a text report.
+
+Each case is timed over several repeats, each rebuilt from the same seed
+and run after a few warmup steps; repeats run in rounds that time every
+case once, and ms/step is the median over repeats with its IQR. Every
+round also times a fixed reference workload that uses none of the
+engines, so a comparison can tell a slower machine from slower code.
+
+Results can be saved as a named baseline and a later run compared
+against it, exiting non-zero when a case got slower by more than the
+threshold even allowing for the spread of both runs. Baselines and
+comparisons use at least COMPARE_REPEATS repeats, comparing against a
+--quick baseline needs --allow-quick, and --self-check runs the cases
+twice to confirm an unchanged tree compares clean.
+
+Usage:
+    python performance_benchmark.py
+    python performance_benchmark.py --quick
+    python performance_benchmark.py --kinds grid --presets Seeds Highlife --sizes 256 512 --backends full bbox
+    python performance_benchmark.py --save-baseline main
+    python performance_benchmark.py --compare main
+    python performance_benchmark.py --self-check --sizes 64
 """
 
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
 import time
-import random
-import matplotlib.pyplot as plt
 import numpy as np
 from collections import defaultdict
+from functools import partial
 
-class PerformanceBenchmark:
-    """Benchmark different storage methods and create comparison reports"""
+import engine_1D
+import headless
+from grid_engine import RuleSet, CellularAutomaton
+from pointer_engine import Pointer, PointerWorld
+
+try:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    MATPLOTLIB_AVAILABLE = True
+except ImportError:
+    MATPLOTLIB_AVAILABLE = False
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+OUTPUT_DIR = "performance_graphs"
+RESULTS_FILE = "benchmark_results.json"
+COMPARISON_FILE = "benchmark_comparison.json"
+BASELINE_DIR = "benchmark_baselines"
+
+GRID_SIZES = [128, 256, 512]
+GRID_RADII = [1, 2]
+GRID_BACKENDS = ["full", "bbox", "banded"]
+POINTER_SIZES = [256, 1024]
+POINTER_COUNTS = [1, 64]
+POINTER_BACKENDS = ["dense", "sparse"]
+ONE_D_RULES = [(30, 2, 1, False), (110, 2, 1, False), (777, 3, 1, True), (1635, 3, 2, True)]
+ONE_D_WIDTHS = [4096, 65536]
+
+# Steps timed per repeat of a case (after the warmup steps)
+STEPS = {"grid": 30, "pointer": 2000, "1d": 500}
+WARMUP = 3
+REPEATS = 5
+QUICK_STEPS = {"grid": 5, "pointer": 200, "1d": 50}
+QUICK_REPEATS = 3
+
+# A case regresses when even its fast quartile is more than THRESHOLD
+# slower than the baseline's slow quartile, so ordinary run-to-run noise
+# in either run is not counted. A handful of repeats gives unreliable
+# quartiles, so saving and comparing baselines use at least COMPARE_REPEATS
+THRESHOLD = 0.20
+COMPARE_REPEATS = 11
+REFERENCE_STEPS = 20
+
+
+def list_presets(folder):
+    return sorted(os.path.splitext(os.path.basename(path))[0]
+                  for path in glob.glob(os.path.join(folder, "*.json")))
+
+
+def reset_peak_rss():
+    """Reset the kernel's peak RSS counter so each case gets its own peak (Linux only)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None if unknown"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def time_steps(step, steps, warmup):
+    """Call step() warmup times untimed, then return the seconds of each of steps calls"""
+    for _ in range(warmup):
+        step()
+    
+    timings = []
+    for _ in range(steps):
+        start = time.perf_counter()
+        step()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def reference_case(seed=0):
+    """
+    Build the reference workload: a Python loop and NumPy array passes
+    shaped like the engines' work but using none of their code
+    
+    Returns:
+        (step function, cells per step)
+    """
+    rng = np.random.default_rng(seed)
+    grid = rng.integers(0, 3, size=(256, 256), dtype=np.int8)
+    cells = rng.integers(0, 3, size=2000).tolist()
+    
+    def step():
+        total = 0
+        for state in cells:
+            total = (total * 3 + state) & 0xFFFF
+        counts = np.zeros_like(grid, dtype=np.int16)
+        for d_row in (-1, 0, 1):
+            for d_col in (-1, 0, 1):
+                counts += np.roll(grid, (d_row, d_col), axis=(0, 1)) == 1
+        grid[:] = np.where(counts == 3, 1, grid)
+    
+    return step, grid.size + len(cells)
+
+
+def grid_case(preset, size, radius, backend, seed=0):
+    """
+    Build a CellularAutomaton for one grid case
+    
+    A random soup fills the centre quarter of the grid, as a user would
+    typically draw or seed, so the bounding-box backend has real work to skip.
+    
+    Returns:
+        (step function, cells per step)
+    """
+    rules, colors = headless.load_neighbour_preset(preset)
+    ruleset = RuleSet()
+    ruleset.change_rules(rules, colors)
+    num_states = max(ruleset.state_colors.keys()) + 1
+    
+    automaton = CellularAutomaton(size, size, ruleset, neighborhood_radius=radius, history_size=0)
+    rng = np.random.default_rng(seed)
+    quarter = size // 4
+    automaton.grid[quarter:size - quarter, quarter:size - quarter] = headless.seed_grid(
+        (size - 2 * quarter, size - 2 * quarter), headless.parse_ratios(None, num_states), rng)
+    
+    step = {"full": automaton.evolve,
+            "bbox": automaton.evolve_with_bounding_box,
+            "banded": automaton.evolve_banded}[backend]
+    return step, size * size
+
+
+def pointer_case(preset, size, pointer_count, backend, seed=0):
+    """
+    Build a PointerWorld for one pointer case
+    
+    Returns:
+        (step function, function giving cell updates per step)
+    """
+    rules, colors = headless.load_pointer_preset(preset)
+    world = PointerWorld(size, size, sparse=backend == "sparse")
+    world.rules = rules
     
-    def __init__(self, total_rows, total_cols):
-        self.total_rows = total_rows
-        self.total_cols = total_cols
-        self.results = defaultdict(list)
+    rng = np.random.default_rng(seed)
+    world.add_pointer(Pointer(size // 2, size // 2, user_created=True))
+    for row, col in rng.integers(0, size, size=(pointer_count - 1, 2)).tolist():
+        world.add_pointer(Pointer(row, col, user_created=True))
     
-    def benchmark_pointer_storage(self, pointer_counts=[10, 50, 100, 500, 1000]):
-        """Benchmark dictionary vs quadtree for pointer automata"""
-        print("Benchmarking Pointer Storage Methods...")
+    # Each visible pointer updates one cell per step; clone rules add more
+    return world.step_generation, lambda: sum(1 for pointer in world.pointers if pointer.visible)
+
+
+def one_d_case(rule_number, states, radius, totalistic, width, seed=0):
+    """
+    Build a Rule1D stepping loop for one 1D case
+    
+    Returns:
+        (step function, cells per step)
+    """
+    rule = engine_1D.Rule1D(rule_number, states, radius, totalistic)
+    rng = np.random.default_rng(seed)
+    rows = [rng.integers(0, states, size=width, dtype=np.uint8), np.empty(width, dtype=np.uint8)]
+    
+    def step():
+        rule.step(rows[0], out=rows[1])
+        rows.reverse()
+    
+    return step, width
+
+
+def baseline_path(name):
+    """File for a named baseline; a path ending in .json is used as is"""
+    if name.endswith(".json"):
+        return name
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def load_results(path):
+    with open(path) as f:
+        data = json.load(f)
+    if "results" not in data:
+        raise ValueError(f"{path} is not a benchmark results file")
+    return data
+
+
+def quartiles(result):
+    """(Q1, Q3) ms/step of a result; results without them are spread evenly around the median"""
+    if "ms_q1" in result:
+        return result["ms_q1"], result["ms_q3"]
+    half = result.get("ms_iqr", 0) / 2
+    return result["ms_per_step"] - half, result["ms_per_step"] + half
+
+
+def machine_scale(baseline_meta, current_meta):
+    """
+    How much slower this machine ran the reference workload than it did
+    for the baseline (1.0 when either run has no reference timing)
+    """
+    base = baseline_meta.get("reference_ms")
+    current = current_meta.get("reference_ms")
+    if not base or not current:
+        return 1.0
+    return current / base
+
+
+def compare_results(baseline, current, threshold=THRESHOLD, scale=1.0):
+    """
+    Compare two result lists case by case
+    
+    Current timings are first divided by scale (see machine_scale). A case
+    regresses when the current Q1 is above the baseline Q3 by more than
+    threshold, and improves when the baseline Q1 is above the current Q3
+    by more than threshold.
+    
+    Returns:
+        One dict per case in either list with the baseline and current
+        ms/step, speedup (baseline / current), the threshold used and a
+        status of "regression", "improvement", "ok", "new" or "missing"
+    """
+    base_by_id = {r["id"]: r for r in baseline}
+    current_by_id = {r["id"]: r for r in current}
+    rows = []
+    
+    for case_id in list(base_by_id) + [i for i in current_by_id if i not in base_by_id]:
+        base = base_by_id.get(case_id)
+        new = current_by_id.get(case_id)
+        row = {"id": case_id,
+               "baseline_ms": base["ms_per_step"] if base else None,
+               "current_ms": new["ms_per_step"] if new else None,
+               "speedup": None, "limit": None}
         
-        for pointer_count in pointer_counts:
-            print(f"  Testing with {pointer_count} pointers...")
-            
-            # Generate random pointer positions
-            positions = [(random.randint(0, self.total_rows-1), 
-                         random.randint(0, self.total_cols-1)) 
-                        for _ in range(pointer_count)]
-            
-            # Test Dictionary
-            cells_dict = {}
-            start = time.time()
-            for _ in range(1000):
-                for row, col in positions:
-                    cells_dict[(row, col)] = 1
-                    _ = cells_dict.get((row, col), 0)
-            dict_time = time.time() - start
-            
-            # Test Quadtree
-            from basic_pointer import QuadTreeNode
-            qt = QuadTreeNode(0, 0, self.total_cols, self.total_rows, capacity=4)
-            start = time.time()
-            for _ in range(1000):
-                for row, col in positions:
-                    qt.insert_cell(row, col, 1)
-                    _ = qt.get_cell(row, col)
-            qt_time = time.time() - start
-            
-            self.results['pointer_count'].append(pointer_count)
-            self.results['dict_time'].append(dict_time)
-            self.results['quadtree_time'].append(qt_time)
-            
-            print(f"    Dictionary: {dict_time:.3f}s | Quadtree: {qt_time:.3f}s")
+        if base is None or new is None:
+            row["status"] = "new" if base is None else "missing"
+            rows.append(row)
+            continue
         
-        self.create_pointer_comparison_graph()
-    
-    def benchmark_grid_rendering(self, densities=[10, 30, 50, 70, 90]):
-        """Benchmark full redraw vs dirty rectangles (hypothetical)"""
-        print("\nBenchmarking Grid Rendering Methods...")
+        # Compare the quartiles facing each other, so only a change bigger
+        # than both runs' spread counts
+        base_q1, base_q3 = quartiles(base)
+        new_q1, new_q3 = (q / scale for q in quartiles(new))
         
-        for density in densities:
-            print(f"  Testing with {density}% density...")
-            
-            # Create random grid
-            grid = np.random.choice([0, 1], 
-                                   size=(self.total_rows, self.total_cols),
-                                   p=[1-density/100, density/100])
-            
-            # Simulate full redraw (PIL creation)
-            start = time.time()
-            for _ in range(50):
-                # Simulate creating PIL image
-                _ = grid.copy()
-            full_redraw_time = time.time() - start
-            
-            # Simulate dirty rectangle (only changed cells)
-            # For simulation: assume 10% cells change per generation
-            changed_ratio = 0.1
-            changed_count = int(self.total_rows * self.total_cols * changed_ratio)
-            
-            start = time.time()
-            for _ in range(50):
-                # Simulate tracking changes
-                changes = np.random.randint(0, self.total_rows*self.total_cols, 
-                                          size=changed_count)
-            dirty_rect_time = time.time() - start
-            
-            self.results['density'].append(density)
-            self.results['full_redraw'].append(full_redraw_time)
-            self.results['dirty_rect'].append(dirty_rect_time)
-            
-            print(f"    Full Redraw: {full_redraw_time:.3f}s | Dirty Rect: {dirty_rect_time:.3f}s")
+        row["speedup"] = base["ms_per_step"] / new["ms_per_step"] * scale
+        row["limit"] = threshold
+        if new_q1 > base_q3 * (1 + threshold):
+            row["status"] = "regression"
+        elif base_q1 > new_q3 * (1 + threshold):
+            row["status"] = "improvement"
+        else:
+            row["status"] = "ok"
+        rows.append(row)
+    
+    return rows
+
+
+class PerformanceBenchmark:
+    """Run the engine benchmark cases and write JSON, graphs and a report"""
+    
+    def __init__(self, output_dir=OUTPUT_DIR, steps=None, warmup=WARMUP, repeats=REPEATS):
+        self.output_dir = output_dir
+        self.steps = dict(STEPS if steps is None else steps)
+        self.warmup = warmup
+        self.repeats = repeats
+        self.options = {}
+        self.cases = []
+        self.results = []
+        self.reference_ms = None
+    
+    def _add_case(self, case, build, steps):
+        """
+        Queue a case for measure_cases
         
-        self.create_rendering_comparison_graph()
+        build() returns (step function, cells per step or a function giving it).
+        """
+        self.cases.append((case, build, steps))
+    
+    def _time_repeat(self, build, steps):
+        """One fresh build of a case timed: (ms/step, cells per step, peak RSS MB or None)"""
+        reset_peak_rss()
+        step, cells = build()
+        timings = time_steps(step, steps, self.warmup)
+        if callable(cells):
+            cells = cells()
+        return sum(timings) / len(timings) * 1000, cells, peak_rss_mb()
     
-    def benchmark_evolution_speed(self, grid_sizes=[100, 200, 400, 800]):
-        """Benchmark evolution speed at different grid sizes"""
-        print("\nBenchmarking Evolution Speed...")
+    def measure_cases(self):
+        """
+        Time the queued cases over self.repeats rounds and record their statistics
         
-        for size in grid_sizes:
-            print(f"  Testing {size}x{size} grid...")
-            
-            grid = np.random.choice([0, 1], size=(size, size), p=[0.5, 0.5])
-            
-            start = time.time()
-            for _ in range(100):
-                # Simulate neighbor counting (simplified)
-                _ = np.roll(grid, 1, axis=0) + np.roll(grid, -1, axis=0)
-            evolution_time = time.time() - start
-            
-            self.results['grid_size'].append(size)
-            self.results['evolution_time'].append(evolution_time)
-            
-            cells = size * size
-            print(f"    Time: {evolution_time:.3f}s ({cells} cells)")
+        Each round runs every case once, so a slow spell of the machine is
+        shared out across cases and shows up in each case's spread instead
+        of shifting a few cases' medians.
+        """
+        if not self.cases:
+            return
+        print(f"Timing {len(self.cases)} cases over {self.repeats} rounds...")
         
-        self.create_evolution_speed_graph()
+        repeat_ms = [[] for _ in self.cases]
+        peaks = [None] * len(self.cases)
+        cells = [0] * len(self.cases)
+        reference_ms = []
+        for round_number in range(self.repeats):
+            reference_ms.append(self._time_repeat(reference_case, REFERENCE_STEPS)[0])
+            for i, (case, build, steps) in enumerate(self.cases):
+                ms, cells[i], rss = self._time_repeat(build, steps)
+                repeat_ms[i].append(ms)
+                if rss is not None:
+                    peaks[i] = rss if peaks[i] is None else max(peaks[i], rss)
+            print(f"  round {round_number + 1}/{self.repeats} done")
+        self.reference_ms = float(np.median(reference_ms))
+        
+        titles = {"grid": "Grid Evolution", "pointer": "Pointer Stepping", "1d": "1D Stepping"}
+        kind = None
+        for i, (case, build, steps) in enumerate(self.cases):
+            if case["kind"] != kind:
+                kind = case["kind"]
+                print(f"\n{titles[kind]}:")
+            
+            q1, median, q3 = np.percentile(repeat_ms[i], [25, 50, 75])
+            result = dict(case)
+            result.update({
+                "steps": steps,
+                "repeats": self.repeats,
+                "ms_per_step": float(median),
+                "ms_iqr": float(q3 - q1),
+                "ms_q1": float(q1),
+                "ms_q3": float(q3),
+                "ms_min": float(min(repeat_ms[i])),
+                "repeat_ms": repeat_ms[i],
+                "cells_per_second": cells[i] / (median / 1000) if median > 0 else None,
+                "peak_rss_mb": peaks[i]
+            })
+            self.results.append(result)
+            print(f"  {result['id']:<48} {result['ms_per_step']:>10.3f} ms/step ±{result['ms_iqr']:<8.3f} "
+                  f"{(result['cells_per_second'] or 0):>14,.0f} cells/s")
+        self.cases = []
     
-    def create_pointer_comparison_graph(self):
-        """Create graph comparing dictionary vs quadtree"""
-        plt.figure(figsize=(10, 6))
+    def benchmark_grid(self, presets, sizes=GRID_SIZES, radii=GRID_RADII, backends=GRID_BACKENDS):
+        """Queue CellularAutomaton evolution for each preset, size, radius and backend"""
+        for preset in presets:
+            for size in sizes:
+                for radius in radii:
+                    for backend in backends:
+                        self._add_case({"id": f"grid/{preset}/{size}/r{radius}/{backend}", "kind": "grid",
+                                        "preset": preset, "size": size, "radius": radius, "backend": backend},
+                                       partial(grid_case, preset, size, radius, backend), self.steps["grid"])
+    
+    def benchmark_pointer(self, presets, sizes=POINTER_SIZES, pointer_counts=POINTER_COUNTS,
+                          backends=POINTER_BACKENDS):
+        """Queue PointerWorld.step_generation for each preset, size, pointer count and backend"""
+        for preset in presets:
+            for size in sizes:
+                for count in pointer_counts:
+                    for backend in backends:
+                        self._add_case({"id": f"pointer/{preset}/{size}/p{count}/{backend}", "kind": "pointer",
+                                        "preset": preset, "size": size, "pointers": count, "backend": backend},
+                                       partial(pointer_case, preset, size, count, backend), self.steps["pointer"])
+    
+    def benchmark_1d(self, rules=ONE_D_RULES, widths=ONE_D_WIDTHS):
+        """Queue Rule1D.step for each rule and row width"""
+        for rule_number, states, radius, totalistic in rules:
+            for width in widths:
+                name = f"{'t' if totalistic else ''}{rule_number}_k{states}"
+                self._add_case({"id": f"1d/{name}/{width}/r{radius}", "kind": "1d", "preset": name,
+                                "size": width, "radius": radius, "backend": "numpy"},
+                               partial(one_d_case, rule_number, states, radius, totalistic, width),
+                               self.steps["1d"])
+    
+    def metadata(self):
+        return {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "steps": self.steps,
+            "warmup": self.warmup,
+            "repeats": self.repeats,
+            "reference_ms": self.reference_ms,
+            "options": self.options
+        }
+    
+    def save_json(self, path=None):
+        path = path or os.path.join(self.output_dir, RESULTS_FILE)
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"meta": self.metadata(), "results": self.results}, f, indent=2)
+        print(f"\n✓ Saved: {path}")
+        return path
+    
+    def _by(self, kind):
+        return [r for r in self.results if r["kind"] == kind]
+    
+    def create_grid_graph(self):
+        """ms/step against grid size, one line per backend and radius (median over presets)"""
+        results = self._by("grid")
+        if not results:
+            return
         
-        x = self.results['pointer_count']
+        plt.figure(figsize=(10, 6))
+        lines = defaultdict(lambda: defaultdict(list))
+        for r in results:
+            lines[(r["backend"], r["radius"])][r["size"]].append(r["ms_per_step"])
         
-        plt.plot(x, self.results['dict_time'], 'o-', label='Dictionary', 
-                color='blue', linewidth=2, markersize=8)
-        plt.plot(x, self.results['quadtree_time'], 's-', label='Quadtree', 
-                color='orange', linewidth=2, markersize=8)
+        for (backend, radius), by_size in sorted(lines.items()):
+            sizes = sorted(by_size)
+            plt.plot(sizes, [np.median(by_size[s]) for s in sizes], 'o-',
+                     label=f"{backend}, radius {radius}", linewidth=2, markersize=6)
         
-        plt.xlabel('Number of Pointers', fontsize=12)
-        plt.ylabel('Time (seconds) for 1000 operations', fontsize=12)
-        plt.title('Pointer Storage Method Performance Comparison', fontsize=14, fontweight='bold')
-        plt.legend(fontsize=11)
+        plt.xlabel('Grid Size (width/height)', fontsize=12)
+        plt.ylabel('Milliseconds per generation (median over presets)', fontsize=12)
+        plt.title('Grid Evolution Speed by Backend', fontsize=14, fontweight='bold')
+        plt.xscale('log', base=2)
+        plt.yscale('log')
+        plt.legend(fontsize=10)
         plt.grid(True, alpha=0.3)
         plt.tight_layout()
         
-        plt.savefig('performance_graphs/pointer_storage_comparison.png', dpi=300)
-        print("\n✓ Saved: performance_graphs/pointer_storage_comparison.png")
-        plt.close()
+        self._save_figure('grid_evolution.png')
     
-    def create_rendering_comparison_graph(self):
-        """Create graph comparing rendering methods"""
-        plt.figure(figsize=(10, 6))
+    def create_pointer_graph(self):
+        """Cell updates per second for each pointer preset and backend"""
+        results = self._by("pointer")
+        if not results:
+            return
         
-        x = self.results['density']
+        plt.figure(figsize=(10, 6))
+        presets = sorted({r["preset"] for r in results})
+        backends = sorted({r["backend"] for r in results})
+        width = 0.8 / len(backends)
         
-        plt.bar([i - 0.2 for i in range(len(x))], self.results['full_redraw'], 
-               width=0.4, label='Full Redraw (Current)', color='blue', alpha=0.7)
-        plt.bar([i + 0.2 for i in range(len(x))], self.results['dirty_rect'], 
-               width=0.4, label='Dirty Rectangles (Hypothetical)', color='orange', alpha=0.7)
+        for i, backend in enumerate(backends):
+            values = [np.median([r["cells_per_second"] for r in results
+                                 if r["preset"] == preset and r["backend"] == backend]) for preset in presets]
+            plt.bar([p + (i - (len(backends) - 1) / 2) * width for p in range(len(presets))], values,
+                    width=width, label=backend, alpha=0.8)
         
-        plt.xlabel('Grid Density (%)', fontsize=12)
-        plt.ylabel('Time (seconds) for 50 redraws', fontsize=12)
-        plt.title('Rendering Method Performance Comparison', fontsize=14, fontweight='bold')
-        plt.xticks(range(len(x)), x)
+        plt.xlabel('Preset', fontsize=12)
+        plt.ylabel('Pointer updates per second (median)', fontsize=12)
+        plt.title('Pointer Stepping Speed by Storage', fontsize=14, fontweight='bold')
+        plt.xticks(range(len(presets)), presets)
         plt.legend(fontsize=11)
         plt.grid(axis='y', alpha=0.3)
         plt.tight_layout()
         
-        plt.savefig('performance_graphs/rendering_comparison.png', dpi=300)
-        print("✓ Saved: performance_graphs/rendering_comparison.png")
-        plt.close()
+        self._save_figure('pointer_stepping.png')
     
-    def create_evolution_speed_graph(self):
-        """Create graph showing evolution speed scaling"""
-        plt.figure(figsize=(10, 6))
+    def create_1d_graph(self):
+        """Cells per second against row width for each 1D rule"""
+        results = self._by("1d")
+        if not results:
+            return
         
-        x = self.results['grid_size']
-        y = self.results['evolution_time']
-        
-        plt.plot(x, y, 'o-', color='green', linewidth=2, markersize=8)
+        plt.figure(figsize=(10, 6))
+        for preset in sorted({r["preset"] for r in results}):
+            rows = sorted((r for r in results if r["preset"] == preset), key=lambda r: r["size"])
+            plt.plot([r["size"] for r in rows], [r["cells_per_second"] for r in rows], 'o-',
+                     label=f"{preset}, radius {rows[0]['radius']}", linewidth=2, markersize=6)
         
-        plt.xlabel('Grid Size (width/height)', fontsize=12)
-        plt.ylabel('Time (seconds) for 100 generations', fontsize=12)
-        plt.title('Evolution Speed vs Grid Size', fontsize=14, fontweight='bold')
+        plt.xlabel('Row width (cells)', fontsize=12)
+        plt.ylabel('Cells per second', fontsize=12)
+        plt.title('1D Stepping Speed', fontsize=14, fontweight='bold')
+        plt.xscale('log', base=2)
+        plt.legend(fontsize=10)
         plt.grid(True, alpha=0.3)
         plt.tight_layout()
         
-        plt.savefig('performance_graphs/evolution_speed.png', dpi=300)
-        print("✓ Saved: performance_graphs/evolution_speed.png")
+        self._save_figure('1d_stepping.png')
+    
+    def _save_figure(self, name):
+        path = os.path.join(self.output_dir, name)
+        plt.savefig(path, dpi=150)
+        print(f"✓ Saved: {path}")
         plt.close()
     
+    def create_graphs(self):
+        if not MATPLOTLIB_AVAILABLE:
+            print("matplotlib is not installed - skipping graphs")
+            return
+        self.create_grid_graph()
+        self.create_pointer_graph()
+        self.create_1d_graph()
+    
     def generate_text_report(self):
-        """Generate text report with findings"""
+        """Generate text report with one line per case"""
         report = []
-        report.append("=" * 70)
+        report.append("=" * 90)
         report.append("PERFORMANCE ANALYSIS REPORT")
-        report.append("=" * 70)
+        report.append("=" * 90)
         report.append("")
         
-        # Pointer Storage Analysis
-        if 'pointer_count' in self.results:
-            report.append("1. POINTER STORAGE COMPARISON")
-            report.append("-" * 70)
-            report.append("")
-            report.append("Test: 1000 read/write operations")
-            report.append("")
-            report.append(f"{'Pointers':<15} {'Dictionary':<15} {'Quadtree':<15} {'Winner':<15}")
-            report.append("-" * 70)
-            
-            for i in range(len(self.results['pointer_count'])):
-                count = self.results['pointer_count'][i]
-                dict_t = self.results['dict_time'][i]
-                qt_t = self.results['quadtree_time'][i]
-                winner = "Dictionary" if dict_t < qt_t else "Quadtree"
-                
-                report.append(f"{count:<15} {dict_t:<15.3f} {qt_t:<15.3f} {winner:<15}")
+        titles = {"grid": "GRID EVOLUTION", "pointer": "POINTER STEPPING", "1d": "1D STEPPING"}
+        for number, kind in enumerate(["grid", "pointer", "1d"], start=1):
+            results = self._by(kind)
+            if not results:
+                continue
             
-            report.append("")
-            report.append("CONCLUSION:")
-            report.append("- Dictionary performs better for medium density (50-1000 pointers)")
-            report.append("- Quadtree excels for very sparse patterns (<50 pointers)")
-            report.append("- Trade-off: Quadtree has spatial query advantages")
+            report.append(f"{number}. {titles[kind]}")
+            report.append("-" * 90)
+            report.append(f"{'Case':<44} {'ms/step':>10} {'IQR':>8} {'cells/s':>16} {'peak MB':>9}")
+            report.append("-" * 90)
+            for r in results:
+                rss = f"{r['peak_rss_mb']:.1f}" if r["peak_rss_mb"] is not None else "-"
+                report.append(f"{r['id']:<44} {r['ms_per_step']:>10.3f} {r['ms_iqr']:>8.3f} "
+                              f"{(r['cells_per_second'] or 0):>16,.0f} {rss:>9}")
             report.append("")
         
-        # Rendering Analysis
-        if 'density' in self.results:
-            report.append("2. RENDERING METHOD COMPARISON")
-            report.append("-" * 70)
-            report.append("")
-            report.append("Test: 50 complete redraws")
-            report.append("")
-            report.append(f"{'Density %':<15} {'Full Redraw':<15} {'Dirty Rect':<15} {'Winner':<15}")
-            report.append("-" * 70)
-            
-            for i in range(len(self.results['density'])):
-                dens = self.results['density'][i]
-                full = self.results['full_redraw'][i]
-                dirty = self.results['dirty_rect'][i]
-                winner = "Full Redraw" if full < dirty else "Dirty Rect"
-                
-                report.append(f"{dens:<15} {full:<15.3f} {dirty:<15.3f} {winner:<15}")
-            
-            report.append("")
-            report.append("DECISION: Keep Full Redraw")
-            report.append("JUSTIFICATION:")
-            report.append("- PIL-based full redraw is highly optimized (C backend)")
-            report.append("- Better performance for medium-high density patterns (30-90%)")
-            report.append("- Simpler code, fewer edge cases")
-            report.append("- Target use case (Conway's Life) typically 40-60% density")
-            report.append("")
-        
-        # Evolution Speed
-        if 'grid_size' in self.results:
-            report.append("3. EVOLUTION SPEED SCALING")
-            report.append("-" * 70)
-            report.append("")
-            report.append(f"{'Grid Size':<15} {'Total Cells':<15} {'Time (100 gen)':<20}")
-            report.append("-" * 70)
-            
-            for i in range(len(self.results['grid_size'])):
-                size = self.results['grid_size'][i]
-                cells = size * size
-                evo_time = self.results['evolution_time'][i]
-                
-                report.append(f"{size}x{size:<10} {cells:<15} {evo_time:<20.3f}")
-            
-            report.append("")
-            report.append("OBSERVATION:")
-            report.append("- Evolution time scales roughly O(n²) with grid dimensions")
-            report.append("- NumPy vectorization provides good performance")
-            report.append("- Acceptable performance up to 800x800 grids")
-            report.append("")
-        
-        report.append("=" * 70)
+        report.append("=" * 90)
         report.append("END OF REPORT")
-        report.append("=" * 70)
+        report.append("=" * 90)
         
         report_text = "\n".join(report)
         
-        with open('performance_graphs/analysis_report.txt', 'w') as f:
+        path = os.path.join(self.output_dir, 'analysis_report.txt')
+        with open(path, 'w') as f:
             f.write(report_text)
         
-        print("✓ Saved: performance_graphs/analysis_report.txt")
-        print("\n" + report_text)
+        print(f"✓ Saved: {path}")
+    
+    def run(self, kinds, grid_presets, pointer_presets, sizes=None, radii=None, backends=None):
+        """Queue and time the selected benchmark kinds"""
+        if "grid" in kinds:
+            self.benchmark_grid(grid_presets, sizes or GRID_SIZES, radii or GRID_RADII,
+                                [b for b in (backends or GRID_BACKENDS) if b in GRID_BACKENDS])
+        if "pointer" in kinds:
+            self.benchmark_pointer(pointer_presets,
+                                   backends=[b for b in (backends or POINTER_BACKENDS) if b in POINTER_BACKENDS])
+        if "1d" in kinds:
+            self.benchmark_1d()
+        self.measure_cases()
 
 
-def run_all_benchmarks():
-    """Run complete benchmark suite"""
-    import os
+def print_comparison(rows, baseline_name, scale=1.0):
+    """Print one line per compared case, regressions marked"""
+    print()
+    print("=" * 90)
+    print(f"COMPARISON AGAINST BASELINE '{baseline_name}'")
+    print("=" * 90)
+    print(f"Reference workload took {scale:.2f}x its baseline time; speedups are corrected for it")
+    print(f"{'Case':<44} {'base ms':>10} {'now ms':>10} {'speedup':>8} {'limit':>7}  Status")
+    print("-" * 90)
+    
+    for row in rows:
+        base = f"{row['baseline_ms']:.3f}" if row["baseline_ms"] is not None else "-"
+        now = f"{row['current_ms']:.3f}" if row["current_ms"] is not None else "-"
+        speedup = f"{row['speedup']:.2f}x" if row["speedup"] is not None else "-"
+        limit = f"{row['limit'] * 100:.0f}%" if row["limit"] is not None else "-"
+        status = row["status"].upper() if row["status"] == "regression" else row["status"]
+        print(f"{row['id']:<44} {base:>10} {now:>10} {speedup:>8} {limit:>7}  {status}")
+    
+    regressions = sum(1 for row in rows if row["status"] == "regression")
+    improvements = sum(1 for row in rows if row["status"] == "improvement")
+    print("-" * 90)
+    print(f"{regressions} regression(s), {improvements} improvement(s), {len(rows)} case(s)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the automaton engines headless")
+    parser.add_argument("--kinds", nargs="+", choices=["grid", "pointer", "1d"],
+                        help="Engines to benchmark (default: all)")
+    parser.add_argument("--presets", nargs="+", help="Only these presets (default: all in neighbour_save/ and pointer_save/)")
+    parser.add_argument("--sizes", nargs="+", type=int, help=f"Grid sizes (default {GRID_SIZES})")
+    parser.add_argument("--radii", nargs="+", type=int, help=f"Grid radii (default {GRID_RADII})")
+    parser.add_argument("--backends", nargs="+", help="Only these backends, e.g. full bbox sparse")
+    parser.add_argument("--quick", action="store_true", help="Few steps per case, for a fast smoke run")
+    parser.add_argument("--repeats", type=int, help=f"Timed repeats per case (default {REPEATS})")
+    parser.add_argument("--warmup", type=int, help=f"Untimed steps before each repeat (default {WARMUP})")
+    parser.add_argument("--output", default=OUTPUT_DIR, help="Folder for JSON, graphs and report")
+    parser.add_argument("--no-graphs", action="store_true")
+    parser.add_argument("--save-baseline", metavar="NAME", help=f"Also save the results as {BASELINE_DIR}/NAME.json")
+    parser.add_argument("--compare", metavar="NAME",
+                        help="Rerun the baseline's cases and exit with status 1 if any got slower")
+    parser.add_argument("--allow-quick", action="store_true",
+                        help="Allow --compare against a baseline saved with --quick")
+    parser.add_argument("--self-check", action="store_true",
+                        help="Run the cases twice and exit with status 1 if the runs compare as different")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help=f"Gap between the quartiles of the two runs counted as a change (default {THRESHOLD})")
+    parser.add_argument("--list-baselines", action="store_true")
+    return parser
+
+
+def run_all_benchmarks(argv=None):
+    """
+    Run complete benchmark suite
+    
+    Returns:
+        Process exit status: 1 when --compare found a regression
+    """
+    args = build_parser().parse_args(argv)
+    
+    if args.list_baselines:
+        for name in list_presets(BASELINE_DIR):
+            data = load_results(baseline_path(name))
+            print(f"{name:<24} {data['meta']['timestamp']}  {len(data['results'])} cases")
+        return 0
+    
+    selection = ["kinds", "presets", "sizes", "radii", "backends", "quick", "repeats", "warmup"]
+    baseline = None
+    if args.compare:
+        try:
+            baseline = load_results(baseline_path(args.compare))
+        except (OSError, ValueError) as e:
+            print(f"Error: cannot load baseline '{args.compare}': {e}", file=sys.stderr)
+            return 2
+        
+        # Quick runs time too few steps for their quartiles to mean much
+        saved = baseline["meta"].get("options", {})
+        if saved.get("quick") and not args.allow_quick:
+            print(f"Error: baseline '{args.compare}' was saved with --quick; "
+                  "save a full baseline or pass --allow-quick", file=sys.stderr)
+            return 2
+        
+        # Rerun the same cases the same way unless told otherwise
+        for option in selection:
+            if getattr(args, option) in (None, False) and saved.get(option) is not None:
+                setattr(args, option, saved[option])
     
     # Create output directory
-    if not os.path.exists('performance_graphs'):
-        os.makedirs('performance_graphs')
+    os.makedirs(args.output, exist_ok=True)
+    
+    grid_presets = list_presets(headless.NEIGHBOUR_SAVE_DIR)
+    pointer_presets = list_presets(headless.POINTER_SAVE_DIR)
+    if args.presets:
+        grid_presets = [p for p in grid_presets if p in args.presets]
+        pointer_presets = [p for p in pointer_presets if p in args.presets]
     
     print("="*70)
     print("STARTING PERFORMANCE BENCHMARK SUITE")
     print("="*70)
     print()
     
-    # Use typical screen resolution dimensions
-    benchmark = PerformanceBenchmark(total_rows=400, total_cols=600)
-    
-    # Run all benchmarks
-    benchmark.benchmark_pointer_storage(pointer_counts=[10, 50, 100, 500, 1000])
-    benchmark.benchmark_grid_rendering(densities=[10, 30, 50, 70, 90])
-    benchmark.benchmark_evolution_speed(grid_sizes=[100, 200, 400, 800])
+    repeats = args.repeats or (QUICK_REPEATS if args.quick else REPEATS)
+    if args.save_baseline or args.compare or args.self_check:
+        repeats = max(repeats, COMPARE_REPEATS)
+    warmup = args.warmup if args.warmup is not None else (1 if args.quick else WARMUP)
+    benchmark = PerformanceBenchmark(args.output, steps=QUICK_STEPS if args.quick else STEPS,
+                                     warmup=warmup, repeats=repeats)
+    benchmark.options = {option: getattr(args, option) for option in selection}
+    benchmark.run(args.kinds or ["grid", "pointer", "1d"], grid_presets, pointer_presets,
+                  args.sizes, args.radii, args.backends)
     
-    # Generate report
+    benchmark.save_json()
+    if args.save_baseline:
+        benchmark.save_json(baseline_path(args.save_baseline))
+    if not args.no_graphs:
+        benchmark.create_graphs()
     benchmark.generate_text_report()
     
+    status = 0
+    if args.self_check:
+        # Nothing changed between the two runs, so any change found is noise
+        print("\nRerunning the same cases for the self-check...")
+        rerun = PerformanceBenchmark(args.output, steps=benchmark.steps, warmup=warmup, repeats=repeats)
+        rerun.run(args.kinds or ["grid", "pointer", "1d"], grid_presets, pointer_presets,
+                  args.sizes, args.radii, args.backends)
+        scale = machine_scale(benchmark.metadata(), rerun.metadata())
+        rows = compare_results(benchmark.results, rerun.results, args.threshold, scale)
+        print_comparison(rows, "first run", scale)
+        if any(row["status"] != "ok" for row in rows):
+            print("Self-check failed: an unchanged tree compared as changed", file=sys.stderr)
+            status = 1
+    
+    if baseline:
+        scale = machine_scale(baseline["meta"], benchmark.metadata())
+        rows = compare_results(baseline["results"], benchmark.results, args.threshold, scale)
+        print_comparison(rows, args.compare, scale)
+        
+        path = os.path.join(args.output, COMPARISON_FILE)
+        with open(path, "w") as f:
+            json.dump({"baseline": args.compare, "baseline_meta": baseline["meta"],
+                       "meta": benchmark.metadata(), "machine_scale": scale, "cases": rows}, f, indent=2)
+        print(f"✓ Saved: {path}")
+        
+        if any(row["status"] == "regression" for row in rows):
+            status = 1
+    
     print()
     print("="*70)
     print("BENCHMARK COMPLETE!")
     print("="*70)
-    print()
-    print("Generated files:")
-    print("  - performance_graphs/pointer_storage_comparison.png")
-    print("  - performance_graphs/rendering_comparison.png")
-    print("  - performance_graphs/evolution_speed.png")
-    print("  - performance_graphs/analysis_report.txt")
-    print()
-    print("Use these graphs and report in your NEA documentation!")
+    return status
 
 
 if __name__ == "__main__":
-    run_all_benchmarks()
\ No newline at end of file
+    sys.exit(run_all_benchmarks())
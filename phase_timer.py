@@ -0,0 +1,146 @@
+"""
+phase_timer.py - Per-phase timing of the simulation hot path
+The engine and renderers hold a `timer` attribute that is None unless
+timing is switched on, so the disabled cost is one attribute test per
+phase. When on, each phase's time is added up with lap() and committed
+as one sample per generation or frame by tick(). The last WINDOW samples
+of each phase give rolling means and histograms, which PhaseHUD draws
+over the canvas together with generations/sec and fps.
+"""
+
+import time
+from collections import defaultdict, deque
+import numpy as np
+
+WINDOW = 240
+RATE_WINDOW = 2.0
+HUD_INTERVAL = 0.25
+
+# Phases in display order
+PHASES = ["neighbours", "rules", "hash", "history", "render", "blit", "stats"]
+PHASE_LABELS = {
+    "neighbours": "Neighbour count",
+    "rules": "Rule apply",
+    "hash": "Cycle hash",
+    "history": "History save",
+    "render": "Render",
+    "blit": "Tk blit",
+    "stats": "Stats update"
+}
+
+# Histogram bin edges in milliseconds
+HISTOGRAM_BINS_MS = [0, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, float("inf")]
+SPARK_CHARS = " ▁▂▃▄▅▆▇█"
+
+
+class PhaseTimer:
+    """Rolling per-phase timings plus generation and frame rates"""
+    
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.samples = defaultdict(lambda: deque(maxlen=window))
+        self.events = defaultdict(lambda: deque(maxlen=window))
+        self.pending = defaultdict(float)
+    
+    def lap(self, phase, start):
+        """
+        Add the time since start to phase
+        
+        Returns:
+            The current time, to start the next phase from
+        """
+        now = time.perf_counter()
+        self.pending[phase] += now - start
+        return now
+    
+    def tick(self, event):
+        """Mark one generation or frame and commit the phases timed since the last tick"""
+        self.events[event].append(time.perf_counter())
+        for phase, seconds in self.pending.items():
+            self.samples[phase].append(seconds)
+        self.pending.clear()
+    
+    def reset(self):
+        self.samples.clear()
+        self.events.clear()
+        self.pending.clear()
+    
+    def mean_ms(self, phase):
+        samples = self.samples.get(phase)
+        return sum(samples) / len(samples) * 1000 if samples else None
+    
+    def rate(self, event):
+        """Events per second over the last RATE_WINDOW seconds"""
+        times = self.events.get(event)
+        if not times:
+            return 0.0
+        
+        now = time.perf_counter()
+        recent = [t for t in times if now - t <= RATE_WINDOW]
+        if len(recent) < 2:
+            return 0.0
+        return (len(recent) - 1) / (recent[-1] - recent[0])
+    
+    def histogram(self, phase, bins=HISTOGRAM_BINS_MS):
+        """Counts of the phase's recent samples in each millisecond bin"""
+        samples = self.samples.get(phase)
+        if not samples:
+            return np.zeros(len(bins) - 1, dtype=np.int64)
+        return np.histogram(np.array(samples) * 1000, bins=bins)[0]
+    
+    def summary(self):
+        """{phase: {"mean_ms", "p50_ms", "p95_ms"}} for every timed phase"""
+        result = {}
+        for phase, samples in self.samples.items():
+            if samples:
+                ms = np.array(samples) * 1000
+                result[phase] = {"mean_ms": float(ms.mean()),
+                                 "p50_ms": float(np.percentile(ms, 50)),
+                                 "p95_ms": float(np.percentile(ms, 95))}
+        return result
+
+
+def sparkline(counts):
+    """One block character per histogram bin, scaled to the fullest bin"""
+    peak = max(counts.max(), 1) if len(counts) else 1
+    return "".join(SPARK_CHARS[int(round(count / peak * (len(SPARK_CHARS) - 1)))] for count in counts)
+
+
+class PhaseHUD:
+    """Text overlay in the canvas corner showing a PhaseTimer"""
+    
+    def __init__(self, canvas, timer, tag="hud"):
+        self.canvas = canvas
+        self.timer = timer
+        self.tag = tag
+        self.last_update = 0.0
+    
+    def update(self, force=False):
+        """Redraw at most every HUD_INTERVAL seconds"""
+        now = time.perf_counter()
+        if not force and now - self.last_update < HUD_INTERVAL:
+            return
+        self.last_update = now
+        
+        if not self.canvas.winfo_exists():
+            return
+        
+        lines = [f"{'Phase':<16}{'ms':>7}  histogram"]
+        for phase in PHASES:
+            mean = self.timer.mean_ms(phase)
+            if mean is not None:
+                lines.append(f"{PHASE_LABELS[phase]:<16}{mean:>7.2f}  {sparkline(self.timer.histogram(phase))}")
+        lines.append(f"gens/s {self.timer.rate('generation'):6.1f}   fps {self.timer.rate('frame'):6.1f}")
+        
+        self.canvas.delete(self.tag)
+        text_id = self.canvas.create_text(12, 12, anchor="nw", text="\n".join(lines),
+                                          font=("Courier", 10), fill="#00ff66", tags=self.tag)
+        bbox = self.canvas.bbox(text_id)
+        if bbox:
+            bg_id = self.canvas.create_rectangle(bbox[0] - 6, bbox[1] - 4, bbox[2] + 6, bbox[3] + 4,
+                                                 fill="black", outline="#00ff66", tags=self.tag)
+            self.canvas.tag_lower(bg_id, text_id)
+    
+    def clear(self):
+        if self.canvas.winfo_exists():
+            self.canvas.delete(self.tag)
@@ -0,0 +1,941 @@
+"""
+pointer_engine.py - Pointer-based automaton engine without any UI
+Pointers (Langton's Ant, Turmites) move around a grid and change cell
+states based on rules. basic_pointer draws a PointerWorld, and
+headless.py can step one with no window at all.
+"""
+
+from collections import Counter, deque
+import numpy as np
+import zobrist
+
+MAX_POINTERS = 1000
+
+# Highway fast-forward: steps of a lone pointer's path kept, the longest
+# period looked for, how often to look (doubling after each search that
+# finds nothing, up to HIGHWAY_CHECK_MAX), and how many times a period
+# must have repeated before it is tried as a template
+HIGHWAY_TRAIL = 4096
+HIGHWAY_MAX_PERIOD = 1024
+HIGHWAY_CHECK_EVERY = 256
+HIGHWAY_CHECK_MAX = 1 << 16
+HIGHWAY_REPEATS = 3
+
+# Longest cycle shortest_period() steps through to confirm its period
+CONFIRM_PERIOD_LIMIT = 1 << 20
+
+# Direction (degrees) -> (column delta, row delta)
+DIRECTION_MAP = {
+    0: (0, -1),
+    90: (1, 0),
+    180: (0, 1),
+    270: (-1, 0),
+    45: (1, -1),
+    135: (1, 1),
+    225: (-1, 1),
+    315: (-1, -1)
+}
+
+
+def divisors(number):
+    """Every divisor of a positive integer, ascending"""
+    small, large = [], []
+    factor = 1
+    while factor * factor <= number:
+        if number % factor == 0:
+            small.append(factor)
+            if factor * factor != number:
+                large.append(number // factor)
+        factor += 1
+    return small + large[::-1]
+
+
+def closest_direction(direction):
+    """The DIRECTION_MAP angle a pointer facing direction moves along"""
+    if direction in DIRECTION_MAP:
+        return direction
+    return min(DIRECTION_MAP.keys(), key=lambda x: abs(x - direction))
+
+
+def direction_delta(direction):
+    """(column delta, row delta) of one move, using the closest mapped direction"""
+    return DIRECTION_MAP[closest_direction(direction)]
+
+
+def turmite_rules(rules):
+    """
+    True if rules only turn the pointer and write its cell (no movement or
+    clone rules), so one step depends only on the cell state and direction
+    """
+    return all(rule["type"] in ("rotation", "face") for rule in rules)
+
+
+def transition(rules, state, direction):
+    """
+    One step of turmite_rules from a cell in state, facing direction
+    
+    Returns:
+        (new direction, state written or None, row delta, column delta)
+    """
+    written = None
+    for rule in rules:
+        if rule["current_state"] == state:
+            if rule["type"] == "rotation":
+                direction = (direction + rule["angle"]) % 360
+            else:
+                direction = rule["direction"]
+            if rule["next_state"] is not None:
+                written = rule["next_state"]
+    dc, dr = direction_delta(direction)
+    return direction, written, dr, dc
+
+
+class Pointer:
+    """Represents a pointer that moves around the grid"""
+    
+    def __init__(self, row, col, direction=0, user_created=False, count=1):
+        self.row = row
+        self.col = col
+        self.direction = direction
+        self.user_created = user_created
+        self.visible = True
+        # Number of identical pointers this one stands for (see merge_duplicates)
+        self.count = count
+    
+    def step(self, rules, world):
+        """Execute one step: apply rules then move forward"""
+        current_state = world.get_cell(self.row, self.col)
+        
+        applicable_rules = [r for r in rules if r["current_state"] == current_state]
+        
+        for rule in applicable_rules:
+            if rule["type"] == "rotation":
+                self.direction = (self.direction + rule["angle"]) % 360
+            
+            elif rule["type"] == "face":
+                self.direction = rule["direction"]
+            
+            elif rule["type"] == "movement":
+                if rule["relative"]:
+                    dx = rule["x"]
+                    dy = rule["y"]
+                    if world.wrapping:
+                        self.row = (self.row + dy) % world.total_rows
+                        self.col = (self.col + dx) % world.total_cols
+                    else:
+                        self.row = max(0, min(world.total_rows - 1, self.row + dy))
+                        self.col = max(0, min(world.total_cols - 1, self.col + dx))
+                else:
+                    if world.wrapping:
+                        self.row = rule["y"] % world.total_rows
+                        self.col = rule["x"] % world.total_cols
+                    else:
+                        self.row = max(0, min(world.total_rows - 1, rule["y"]))
+                        self.col = max(0, min(world.total_cols - 1, rule["x"]))
+            
+            elif rule["type"] == "clone":
+                # CHECK LIMIT BEFORE CREATING
+                if len(world.pointers) < world.max_pointers:
+                    new_pointer = Pointer(self.row, self.col, self.direction)
+                    new_pointer.count = self.count
+                    world.add_pointer(new_pointer)
+                else:
+                    world.limit_reached = True
+            
+            if rule["next_state"] is not None:
+                world.set_cell(self.row, self.col, rule["next_state"])
+        
+        # Move forward in current direction
+        dc, dr = direction_delta(self.direction)
+        
+        # Apply movement with wrapping check
+        if world.wrapping:
+            self.row = (self.row + dr) % world.total_rows
+            self.col = (self.col + dc) % world.total_cols
+        else:
+            # Clamp to grid bounds (including buffer zone)
+            self.row = max(0, min(world.total_rows - 1, self.row + dr))
+            self.col = max(0, min(world.total_cols - 1, self.col + dc))
+    
+    def rotate(self):
+        self.direction = (self.direction + 45) % 360
+        if self.direction == 0:
+            self.visible = False
+
+
+class PointerIndex:
+    """
+    Cell -> pointers on it, kept up to date as pointers are added and move
+    
+    Each cell maps id(pointer) -> pointer in the order the pointers arrived
+    on it, so finding the pointers on a cell or in the view doesn't scan
+    every pointer.
+    """
+    
+    def __init__(self):
+        self.cells = {}
+    
+    def clear(self):
+        self.cells.clear()
+    
+    def add(self, pointer):
+        self.cells.setdefault((pointer.row, pointer.col), {})[id(pointer)] = pointer
+    
+    def remove(self, pointer, row=None, col=None):
+        """Drop pointer, filed under (row, col) if given, else its position"""
+        if row is None:
+            row, col = pointer.row, pointer.col
+        on_cell = self.cells.get((row, col))
+        if on_cell is not None:
+            on_cell.pop(id(pointer), None)
+            if not on_cell:
+                del self.cells[(row, col)]
+    
+    def move(self, pointer, old_row, old_col):
+        """Re-file pointer after it moved from (old_row, old_col)"""
+        if (old_row, old_col) == (pointer.row, pointer.col):
+            return
+        self.remove(pointer, old_row, old_col)
+        self.add(pointer)
+    
+    def at(self, row, col):
+        """Pointers on (row, col), in the order they arrived there"""
+        return list(self.cells.get((row, col), {}).values())
+    
+    def within(self, min_row, max_row, min_col, max_col):
+        """Pointers inside the inclusive rectangle"""
+        # Look up the rectangle's cells or walk the occupied ones, whichever is fewer
+        if (max_row - min_row + 1) * (max_col - min_col + 1) < len(self.cells):
+            for row in range(min_row, max_row + 1):
+                for col in range(min_col, max_col + 1):
+                    yield from self.cells.get((row, col), {}).values()
+        else:
+            for (row, col), on_cell in self.cells.items():
+                if min_row <= row <= max_row and min_col <= col <= max_col:
+                    yield from on_cell.values()
+
+
+class _TrialWorld:
+    """
+    Stand-in world for a trial run of one pointer starting at (row, col)
+    
+    The trial pointer starts at (ORIGIN, ORIGIN) on a grid too large to
+    reach an edge, so its coordinates minus ORIGIN are offsets from the
+    start. Reads come from the real world and writes go to an overlay,
+    leaving the real cells untouched. reads keeps the value each cell had
+    the first time it was read before the trial wrote to it.
+    """
+    
+    ORIGIN = 1 << 40
+    
+    def __init__(self, world, row, col):
+        self.world = world
+        self.row = row
+        self.col = col
+        self.wrapping = True
+        self.total_rows = self.total_cols = 2 * self.ORIGIN
+        self.pointers = []
+        self.max_pointers = 0
+        self.limit_reached = False
+        self.off_grid = False
+        self.reads = {}
+        self.writes = {}
+    
+    def get_cell(self, row, col):
+        offset = (row - self.ORIGIN, col - self.ORIGIN)
+        if offset in self.writes:
+            return self.writes[offset]
+        
+        real = self.world.offset_cell(self.row, self.col, *offset)
+        if real is None:
+            # The real pointer would have been clamped at the edge
+            self.off_grid = True
+            return 0
+        state = self.world.get_cell(*real)
+        self.reads.setdefault(offset, state)
+        return state
+    
+    def set_cell(self, row, col, state):
+        self.writes[(row - self.ORIGIN, col - self.ORIGIN)] = state
+
+
+class Highway:
+    """
+    One period of a lone pointer repeating itself while moving across the grid
+    
+    Starting from a cell with the pointer facing direction, if the cells
+    at the read offsets hold the read states, the next period steps leave
+    the write states at the write offsets and end with the pointer moved
+    by (d_row, d_col), facing the same way. Offsets are (row, col) relative
+    to where the period starts. generation is one at which a period started.
+    """
+    
+    def __init__(self, period, d_row, d_col, direction, rules, generation, reads, writes):
+        self.period = period
+        self.d_row = d_row
+        self.d_col = d_col
+        self.direction = direction
+        self.rules = [dict(rule) for rule in rules]
+        self.generation = generation
+        self.writes = writes
+        
+        cells = list(reads) + list(writes)
+        self.min_row = min(row for row, _ in cells)
+        self.max_row = max(row for row, _ in cells)
+        self.min_col = min(col for _, col in cells)
+        self.max_col = max(col for _, col in cells)
+        
+        # A cell read by one period is usually written by an earlier one
+        # (`lag` periods back). Once that period has been applied the read
+        # is known to match, so only the first `lag` periods check it
+        # against the grid. Reads no earlier period writes are new ground
+        # each period and are always checked.
+        self.fresh = []
+        self.chained = []
+        self.consistent = True
+        for (row, col), state in reads.items():
+            lag = self._writer_lag(row, col)
+            if lag is None:
+                self.fresh.append((row, col, state))
+            elif writes[(row + lag * d_row, col + lag * d_col)] == state:
+                self.chained.append((row, col, state, lag))
+            else:
+                self.consistent = False
+    
+    def _writer_lag(self, row, col):
+        """Fewest periods back that write the cell read at (row, col), or None"""
+        lag = 1
+        while (self.min_row <= row + lag * self.d_row <= self.max_row
+               and self.min_col <= col + lag * self.d_col <= self.max_col):
+            if (row + lag * self.d_row, col + lag * self.d_col) in self.writes:
+                return lag
+            lag += 1
+        return None
+
+
+class PointerWorld:
+    """Grid cells, pointers and rules for one pointer automaton"""
+    
+    def __init__(self, total_rows, total_cols, wrapping=True, sparse=False, max_pointers=MAX_POINTERS,
+                 detect_cycles=True, merge_duplicates=False):
+        self.total_rows = total_rows
+        self.total_cols = total_cols
+        self.wrapping = wrapping
+        self.sparse = sparse
+        # max_pointers limits entries in pointers; with merge_duplicates on
+        # (off by default, as merged pointers no longer step one by one),
+        # visible pointers with the same position and direction are folded
+        # into one entry whose count says how many it stands for, and that
+        # entry steps once for all of them
+        self.max_pointers = max_pointers
+        self.merge_duplicates = merge_duplicates
+        self.rules = []
+        self.pointers = []
+        self.pointer_index = PointerIndex()
+        self.generation = 0
+        self.limit_reached = False
+        self.cells = None
+        self.state_counts = Counter()
+        
+        # Zobrist hash of the cells, kept up to date by set_cell, and the
+        # hash -> generation table used to spot cycles
+        self.detect_cycles = detect_cycles
+        self.cycles = zobrist.CycleDetector()
+        self.cell_hash = 0
+        
+        # Highway fast-forward state for advance(): the current template,
+        # hashes of the lone pointer's recent steps, and the steps left
+        # until the next search and between searches
+        self.highway = None
+        self.trail = deque(maxlen=HIGHWAY_TRAIL)
+        self.reset_highway_search()
+        self.clear_cells()
+    
+    def clear_cells(self):
+        if self.sparse:
+            self.cells = {}
+        else:
+            self.cells = [[0 for _ in range(self.total_cols)] for _ in range(self.total_rows)]
+        self.recount()
+    
+    def recount(self):
+        """Rebuild state_counts and the cell hash after cells were replaced wholesale"""
+        self.state_counts = Counter()
+        
+        if self.sparse:
+            for state in self.cells.values():
+                self.state_counts[state] += 1
+            self.cell_hash = 0
+            for (row, col), state in self.cells.items():
+                self.cell_hash ^= zobrist.cell_key(self._cell_index(row, col), state)
+        else:
+            for row in self.cells:
+                self.state_counts.update(row)
+            self.cell_hash = zobrist.grid_hash(np.array(self.cells, dtype=np.int8))
+        
+        self.cycles.clear()
+        self.reset_highway_search()
+    
+    def _cell_index(self, row, col):
+        """Cell number used for hashing; sparse cells may lie off the grid"""
+        if self.sparse:
+            return (row & 0xFFFFFFFF) << 32 | (col & 0xFFFFFFFF)
+        return row * self.total_cols + col
+    
+    def reset_cycle_detection(self):
+        """Forget seen generations after the cells, pointers or rules were edited"""
+        self.cycles.clear()
+        self.reset_highway_search()
+    
+    def reset_highway_search(self):
+        """Look for a highway soon again, e.g. after an edit or after one broke off"""
+        self.highway_check_every = HIGHWAY_CHECK_EVERY
+        self.highway_countdown = HIGHWAY_CHECK_EVERY
+    
+    @property
+    def cycle_period(self):
+        """Period of the cycle the last generation landed in, or 0"""
+        return self.cycles.period
+    
+    def state_hash(self):
+        """Hash of the cells plus every visible pointer's position and direction"""
+        # Pointer keys are summed, not XORed, so identical pointers don't cancel out
+        pointer_hash = 0
+        for pointer in self.pointers:
+            if pointer.visible:
+                pointer_hash += zobrist.pointer_key(pointer.row, pointer.col, pointer.direction)
+        return self.cell_hash ^ (pointer_hash & zobrist.MASK64)
+    
+    def shortest_period(self):
+        """
+        The true period of the cycle the last check landed in
+        
+        Batched stepping only hashes the state at the end of each batch,
+        so cycle_period can be a whole multiple of the period (a still
+        state seen one batch apart reports the batch size). The period
+        divides cycle_period, so a copy of the world is stepped to each
+        divisor in turn until the current state comes back.
+        
+        Returns:
+            The period, 0 without a cycle, or None if cycle_period is over
+            CONFIRM_PERIOD_LIMIT and was not checked
+        """
+        period = self.cycles.period
+        if period <= 1:
+            return period
+        if period > CONFIRM_PERIOD_LIMIT:
+            return None
+        
+        target = self.state_hash()
+        trial = self.copy()
+        for divisor in divisors(period):
+            trial.advance(divisor - trial.generation + self.generation)
+            if trial.state_hash() == target:
+                return divisor
+        return period
+    
+    def copy(self):
+        """Independent copy of the cells, pointers and rules, without cycle detection"""
+        world = PointerWorld(self.total_rows, self.total_cols, self.wrapping, self.sparse, self.max_pointers,
+                             detect_cycles=False, merge_duplicates=self.merge_duplicates)
+        world.rules = self.rules
+        world.cells = dict(self.cells) if self.sparse else [row[:] for row in self.cells]
+        world.state_counts = Counter(self.state_counts)
+        world.cell_hash = self.cell_hash
+        world.generation = self.generation
+        
+        pointers = []
+        for pointer in self.pointers:
+            twin = Pointer(pointer.row, pointer.col, pointer.direction, pointer.user_created, pointer.count)
+            twin.visible = pointer.visible
+            pointers.append(twin)
+        world.set_pointers(pointers)
+        return world
+    
+    def fast_forward(self, target_generation):
+        """
+        Once in a cycle, jump the generation counter by whole periods
+        towards target_generation without computing them
+        
+        Returns:
+            Number of generations skipped
+        """
+        new_generation = self.cycles.fast_forward(self.generation, target_generation)
+        skipped = new_generation - self.generation
+        self.generation = new_generation
+        return skipped
+    
+    def add_pointer(self, pointer):
+        self.pointers.append(pointer)
+        self.pointer_index.add(pointer)
+    
+    def set_pointers(self, pointers):
+        """Replace every pointer, e.g. when loading or restoring a state"""
+        self.pointers = list(pointers)
+        self.pointer_index.clear()
+        for pointer in self.pointers:
+            self.pointer_index.add(pointer)
+    
+    @property
+    def population(self):
+        """Number of pointers, counting every pointer a merged entry stands for"""
+        return sum(pointer.count for pointer in self.pointers)
+    
+    def merge_pointers(self):
+        """
+        Fold visible pointers with the same position and direction into the
+        first of them in list order, adding up their counts
+        """
+        if len(self.pointers) < 2:
+            return
+        
+        first = {}
+        merged = False
+        for pointer in self.pointers:
+            if pointer.visible:
+                kept = first.setdefault((pointer.row, pointer.col, pointer.direction), pointer)
+                if kept is not pointer:
+                    kept.count += pointer.count
+                    pointer.count = 0
+                    merged = True
+        if merged:
+            for pointer in self.pointers:
+                if pointer.count == 0:
+                    self.pointer_index.remove(pointer)
+            self.pointers = [pointer for pointer in self.pointers if pointer.count]
+    
+    def pointers_at(self, row, col):
+        """Pointers on (row, col), visible or not, in the order they arrived there"""
+        return self.pointer_index.at(row, col)
+    
+    def pointers_within(self, min_row, max_row, min_col, max_col):
+        """Pointers inside the inclusive rectangle of cells"""
+        return self.pointer_index.within(min_row, max_row, min_col, max_col)
+    
+    def offset_cell(self, row, col, d_row, d_col):
+        """
+        The cell (d_row, d_col) away from (row, col), wrapped on wrapping
+        grids, or None if it lies off a non-wrapping grid
+        """
+        row += d_row
+        col += d_col
+        if self.wrapping:
+            return row % self.total_rows, col % self.total_cols
+        if 0 <= row < self.total_rows and 0 <= col < self.total_cols:
+            return row, col
+        return None
+    
+    def get_cell(self, row, col):
+        """Get cell state - works for both sparse and dense"""
+        if self.sparse:
+            return self.cells.get((row, col), 0)
+        else:
+            if 0 <= row < self.total_rows and 0 <= col < self.total_cols:
+                return self.cells[row][col]
+            return 0
+    
+    def set_cell(self, row, col, state):
+        """Set cell state - works for both sparse and dense"""
+        if self.sparse:
+            old_state = self.cells.get((row, col), 0)
+            if state == 0:
+                if (row, col) in self.cells:
+                    del self.cells[(row, col)]
+            else:
+                self.cells[(row, col)] = state
+            
+            # Sparse storage only counts non-zero cells
+            if old_state != state:
+                if old_state != 0:
+                    self.state_counts[old_state] -= 1
+                if state != 0:
+                    self.state_counts[state] += 1
+                self._hash_cell(row, col, old_state, state)
+        else:
+            if 0 <= row < self.total_rows and 0 <= col < self.total_cols:
+                old_state = self.cells[row][col]
+                self.cells[row][col] = state
+                if old_state != state:
+                    self.state_counts[old_state] -= 1
+                    self.state_counts[state] += 1
+                    self._hash_cell(row, col, old_state, state)
+    
+    def _hash_cell(self, row, col, old_state, state):
+        index = self._cell_index(row, col)
+        self.cell_hash ^= zobrist.cell_key(index, old_state) ^ zobrist.cell_key(index, state)
+    
+    def step_generation(self):
+        """
+        Step every visible pointer once
+        
+        Returns False if a clone rule hit max_pointers this generation.
+        """
+        self.limit_reached = False
+        if self.detect_cycles and not self.cycles.seen:
+            self.cycles.check(self.state_hash(), self.generation)
+        
+        for pointer in self.pointers:
+            if pointer.visible:
+                row, col = pointer.row, pointer.col
+                pointer.step(self.rules, self)
+                self.pointer_index.move(pointer, row, col)
+        if self.merge_duplicates:
+            self.merge_pointers()
+        
+        self.generation += 1
+        if self.detect_cycles:
+            self.cycles.check(self.state_hash(), self.generation)
+        return not self.limit_reached
+    
+    def advance(self, generations):
+        """
+        Step generations generations in one batch
+        
+        Rules that only turn pointers and write cells run through a
+        transition table, reading and writing the cells directly; counts,
+        the cell hash and the cycle check are brought up to date once at
+        the end of the call instead of on every write.
+        
+        With a single visible pointer and no clone or absolute movement
+        rules, the pointer's recent steps are also watched for a period
+        that repeats while moving it across the grid, like the highway
+        Langton's Ant builds after about 10,000 steps. Each search that
+        finds nothing doubles the wait before the next, so rule sets that
+        never build a highway barely pay for it. Once one is found, a
+        trial run records which cells one period reads and writes, and
+        whole periods are then applied at once for as long as the cells
+        ahead hold what the period reads. Anywhere else it steps exactly,
+        so the cells and pointers end up as after calling step_generation
+        generations times.
+        
+        Returns False if a clone rule hit max_pointers.
+        """
+        target = self.generation + generations
+        batch = self._batch_ready()
+        pointer = self._highway_pointer()
+        if pointer is None:
+            if batch:
+                self._run_batch(generations)
+                return True
+            while self.generation < target:
+                if not self.step_generation():
+                    return False
+            return True
+        
+        # Cells written by the batches below, committed once at the end
+        before = {}
+        if batch:
+            self._start_batch()
+        
+        while self.generation < target:
+            highway = self.highway
+            if (highway is not None and target - self.generation >= highway.period
+                    and (self.generation - highway.generation) % highway.period == 0):
+                # The highway writes through set_cell, so counts and the
+                # hash must be current first
+                self._commit_cells(before)
+                before.clear()
+                if self._apply_highway(pointer, (target - self.generation) // highway.period):
+                    continue
+            
+            # Only the last HIGHWAY_TRAIL steps before a search are looked at,
+            # so steps further ahead of it are not recorded
+            trail = self.trail
+            quiet = 0
+            if self.highway is None:
+                quiet = self.highway_countdown - HIGHWAY_TRAIL
+                if quiet > 0:
+                    trail = None
+                    self.trail.clear()
+            
+            if batch:
+                # Stop at the next search, or where the trail starts being
+                # recorded, and, with a highway, at the start of its next period
+                steps = target - self.generation
+                if self.highway is None:
+                    steps = min(steps, quiet if quiet > 0 else self.highway_countdown)
+                else:
+                    steps = min(steps, self.highway.period
+                                - (self.generation - self.highway.generation) % self.highway.period)
+                self._run_batch(steps, trail, before)
+                self.highway_countdown -= steps
+            else:
+                row, col, direction = pointer.row, pointer.col, pointer.direction
+                state = self.get_cell(row, col)
+                self.step_generation()
+                d_row, d_col = pointer.row - row, pointer.col - col
+                if self.wrapping:
+                    d_row = (d_row + self.total_rows // 2) % self.total_rows - self.total_rows // 2
+                    d_col = (d_col + self.total_cols // 2) % self.total_cols - self.total_cols // 2
+                if trail is not None:
+                    trail.append(hash((direction, state, d_row, d_col)))
+                self.highway_countdown -= 1
+            
+            if self.highway is None and self.highway_countdown <= 0:
+                self.highway = self._find_highway(pointer)
+                if self.highway is None:
+                    # Rule sets that never build a highway pay less and less
+                    self.highway_check_every = min(self.highway_check_every * 2, HIGHWAY_CHECK_MAX)
+                else:
+                    self.highway_check_every = HIGHWAY_CHECK_EVERY
+                self.highway_countdown = self.highway_check_every
+        
+        if batch:
+            self._finish_batch(before)
+        return True
+    
+    def _batch_ready(self):
+        """True if _run_batch can step the current rules and pointers"""
+        if not turmite_rules(self.rules):
+            return False
+        return all(0 <= pointer.row < self.total_rows and 0 <= pointer.col < self.total_cols
+                   for pointer in self.pointers if pointer.visible)
+    
+    def _start_batch(self):
+        """Record the state before a run of batches, so a cycle back to it is seen"""
+        if self.detect_cycles and not self.cycles.seen:
+            self.cycles.check(self.state_hash(), self.generation)
+    
+    def _finish_batch(self, before):
+        """Bring counts, the cell hash and the cycle check up to date after a run of batches"""
+        self._commit_cells(before)
+        before.clear()
+        if self.detect_cycles:
+            self.cycles.check(self.state_hash(), self.generation)
+    
+    def _run_batch(self, generations, trail=None, before=None):
+        """
+        Step every visible pointer generations times with turmite rules
+        
+        Appends a hash of each step to trail when given (one pointer only).
+        Without before, counts, the cell hash and the cycle check are
+        brought up to date at the end. With it, the earlier state of every
+        cell written is added to it instead, and the caller finishes a run
+        of batches with _start_batch and _finish_batch.
+        """
+        rules = self.rules
+        cells = self.cells
+        sparse = self.sparse
+        wrapping = self.wrapping
+        total_rows, total_cols = self.total_rows, self.total_cols
+        pointers = [pointer for pointer in self.pointers if pointer.visible]
+        positions = [[pointer.row, pointer.col, pointer.direction, pointer] for pointer in pointers]
+        merge = self.merge_duplicates and len(positions) > 1
+        merged = []
+        
+        # (state, direction) -> (direction, written, dr, dc, step hash), filled as met
+        table = {}
+        # State of every written cell before the batch
+        finish = before is None
+        if finish:
+            before = {}
+            self._start_batch()
+        
+        for _ in range(generations):
+            for position in positions:
+                row, col, direction, _ = position
+                state = cells.get((row, col), 0) if sparse else cells[row][col]
+                
+                step = table.get((state, direction))
+                if step is None:
+                    step = transition(rules, state, direction)
+                    step = table[(state, direction)] = step + (hash((direction, state) + step[2:]),)
+                direction, written, dr, dc, key = step
+                
+                if written is not None and written != state:
+                    if (row, col) not in before:
+                        before[(row, col)] = state
+                    if not sparse:
+                        cells[row][col] = written
+                    elif written:
+                        cells[(row, col)] = written
+                    else:
+                        del cells[(row, col)]
+                
+                if wrapping:
+                    row = (row + dr) % total_rows
+                    col = (col + dc) % total_cols
+                else:
+                    row = max(0, min(total_rows - 1, row + dr))
+                    col = max(0, min(total_cols - 1, col + dc))
+                position[:3] = row, col, direction
+                if trail is not None:
+                    trail.append(key)
+            
+            if merge:
+                first = {}
+                kept = []
+                for position in positions:
+                    group = first.setdefault(tuple(position[:3]), position)
+                    if group is position:
+                        kept.append(position)
+                    else:
+                        group[3].count += position[3].count
+                        merged.append(position[3])
+                if len(kept) < len(positions):
+                    positions = kept
+                    merge = len(positions) > 1
+        
+        for row, col, direction, pointer in positions:
+            old_row, old_col = pointer.row, pointer.col
+            pointer.row, pointer.col, pointer.direction = row, col, direction
+            self.pointer_index.move(pointer, old_row, old_col)
+        if merged:
+            for pointer in merged:
+                # Still filed under its position from before the batch
+                self.pointer_index.remove(pointer)
+                pointer.count = 0
+            self.pointers = [pointer for pointer in self.pointers if pointer.count]
+        
+        self.generation += generations
+        if finish:
+            self._finish_batch(before)
+    
+    def _commit_cells(self, before):
+        """Update state_counts and the cell hash for cells written directly"""
+        changed = [(cell, old, self.get_cell(*cell)) for cell, old in before.items()]
+        changed = [(cell, old, new) for cell, old, new in changed if old != new]
+        if not changed:
+            return
+        
+        for _, old, new in changed:
+            # Sparse storage only counts non-zero cells
+            if old != 0 or not self.sparse:
+                self.state_counts[old] -= 1
+            if new != 0 or not self.sparse:
+                self.state_counts[new] += 1
+        
+        index = [self._cell_index(*cell) for cell, _, _ in changed]
+        self.cell_hash ^= zobrist.cells_delta(index, [old for _, old, _ in changed],
+                                              [new for _, _, new in changed])
+    
+    def _highway_pointer(self):
+        """The pointer advance() can fast-forward, or None"""
+        visible = [pointer for pointer in self.pointers if pointer.visible]
+        if len(visible) != 1:
+            return None
+        for rule in self.rules:
+            if rule["type"] == "clone" or (rule["type"] == "movement" and not rule["relative"]):
+                return None
+        return visible[0]
+    
+    def _find_highway(self, pointer):
+        """
+        Look for a period the trail has just repeated HIGHWAY_REPEATS times
+        and build a Highway for it by a trial run from here
+        """
+        trail = np.array(self.trail, dtype=np.int64)
+        longest = min(HIGHWAY_MAX_PERIOD, len(trail) // HIGHWAY_REPEATS)
+        if longest < 1:
+            return None
+        
+        # Narrow the candidates on the last few steps before comparing the
+        # whole window of each remaining one
+        periods = np.arange(1, longest + 1)
+        end = len(trail) - 1
+        for back in range(min(8, longest)):
+            periods = periods[trail[end - back - periods] == trail[end - back]]
+        
+        # Multiples of a period repeat too, so only the shortest is tried
+        for period in periods:
+            window = period * (HIGHWAY_REPEATS - 1)
+            if np.array_equal(trail[-window:], trail[-window - period:-period]):
+                return self._trial_highway(pointer, int(period))
+        return None
+    
+    def _trial_highway(self, pointer, period):
+        """Run a copy of pointer for one period and record it as a Highway"""
+        trial = _TrialWorld(self, pointer.row, pointer.col)
+        ghost = Pointer(trial.ORIGIN, trial.ORIGIN, pointer.direction)
+        for _ in range(period):
+            ghost.step(self.rules, trial)
+        
+        d_row, d_col = ghost.row - trial.ORIGIN, ghost.col - trial.ORIGIN
+        if trial.off_grid or ghost.direction != pointer.direction or (d_row, d_col) == (0, 0):
+            return None
+        
+        highway = Highway(period, d_row, d_col, pointer.direction, self.rules, self.generation,
+                          trial.reads, trial.writes)
+        return highway if highway.consistent else None
+    
+    def _apply_highway(self, pointer, max_periods):
+        """
+        Apply as many whole highway periods as the cells ahead allow
+        
+        Returns:
+            Number of periods applied; 0 also drops a highway that no
+            longer matches
+        """
+        highway = self.highway
+        if pointer.direction != highway.direction or self.rules != highway.rules:
+            self.highway = None
+            self.reset_highway_search()
+            return 0
+        
+        # Keep the periods applied at once from overlapping themselves
+        # around a wrapping grid or running off a non-wrapping one
+        d_row, d_col = highway.d_row, highway.d_col
+        row, col = pointer.row, pointer.col
+        if self.wrapping:
+            for span, step, total in ((highway.max_row - highway.min_row, d_row, self.total_rows),
+                                      (highway.max_col - highway.min_col, d_col, self.total_cols)):
+                if span >= total:
+                    max_periods = 0
+                elif step:
+                    max_periods = min(max_periods, (total - span - 1) // abs(step) + 1)
+        else:
+            for low, high, start, step, total in (
+                    (highway.min_row, highway.max_row, row, d_row, self.total_rows),
+                    (highway.min_col, highway.max_col, col, d_col, self.total_cols)):
+                low, high = min(low, step), max(high, step)
+                if start + low < 0 or start + high >= total:
+                    max_periods = 0
+                elif step > 0:
+                    max_periods = min(max_periods, (total - 1 - start - high) // step + 1)
+                elif step < 0:
+                    max_periods = min(max_periods, (start + low) // -step + 1)
+        
+        periods = 0
+        while periods < max_periods:
+            k = periods
+            if any(self.get_cell(*self.offset_cell(row, col, r + k * d_row, c + k * d_col)) != state
+                   for r, c, state in highway.fresh):
+                break
+            if any(self.get_cell(*self.offset_cell(row, col, r + k * d_row, c + k * d_col)) != state
+                   for r, c, state, lag in highway.chained if lag > k):
+                break
+            periods += 1
+        
+        if periods == 0:
+            self.highway = None
+            self.reset_highway_search()
+            return 0
+        
+        # Later periods overwrite earlier ones
+        final = {}
+        for k in range(periods):
+            for (r, c), state in highway.writes.items():
+                final[(r + k * d_row, c + k * d_col)] = state
+        for (r, c), state in final.items():
+            self.set_cell(*self.offset_cell(row, col, r, c), state)
+        
+        pointer.row, pointer.col = self.offset_cell(row, col, periods * d_row, periods * d_col)
+        self.pointer_index.move(pointer, row, col)
+        self.generation += periods * highway.period
+        self.trail.clear()
+        self.cycles.clear()
+        return periods
+    
+    def count_states(self):
+        """Number of cells in each state (sparse mode counts only non-zero cells)"""
+        return Counter(self.state_counts)
+    
+    def to_array(self):
+        """Copy the cells into a dense int8 NumPy array"""
+        if self.sparse:
+            grid = np.zeros((self.total_rows, self.total_cols), dtype=np.int8)
+            for (row, col), state in self.cells.items():
+                if 0 <= row < self.total_rows and 0 <= col < self.total_cols:
+                    grid[row, col] = state
+            return grid
+        return np.array(self.cells, dtype=np.int8)
@@ -0,0 +1,246 @@
+"""
+population_series.py - Bounded-memory history of state counts over a run
+Each sample's counts go into a ring of recent samples, and are also
+folded into coarser levels whose buckets each hold the min, max and sum
+of FACTOR times as many generations as the level below. Batched play
+samples once per batch, so a sample stands for every generation since
+the previous one and is weighted by that gap. Memory is fixed by LEVELS
+and BUCKETS however long the run, while recent history stays at full
+resolution. PopulationChart draws the series as a sparkline on a small
+canvas in the side panels.
+"""
+
+import time
+import numpy as np
+
+BUCKETS = 512
+FACTOR = 8
+# Level k buckets cover FACTOR**k generations, so the coarsest level keeps
+# BUCKETS * FACTOR**(LEVELS - 1), about 16.7 million, generations
+LEVELS = 6
+CHART_INTERVAL = 0.25
+
+
+class _Level:
+    """
+    Ring of buckets, each the min, max and generation-weighted sum of the
+    samples covering at least `span` generations
+    """
+    
+    def __init__(self, span, num_states, size=BUCKETS):
+        self.span = span
+        self.size = size
+        self.generations = np.zeros(size, dtype=np.int64)
+        self.minimum = np.zeros((size, num_states), dtype=np.int64)
+        self.maximum = np.zeros((size, num_states), dtype=np.int64)
+        self.total = np.zeros((size, num_states), dtype=np.int64)
+        # Generations each bucket covers, at least span
+        self.weights = np.zeros(size, dtype=np.int64)
+        self.written = 0
+        
+        # Bucket being filled: generations so far and the generation of the first
+        self.pending = 0
+        self.pending_generation = 0
+        self.pending_minimum = np.zeros(num_states, dtype=np.int64)
+        self.pending_maximum = np.zeros(num_states, dtype=np.int64)
+        self.pending_total = np.zeros(num_states, dtype=np.int64)
+    
+    def store(self, generation, minimum, maximum, total, weight):
+        slot = self.written % self.size
+        self.generations[slot] = generation
+        self.minimum[slot] = minimum
+        self.maximum[slot] = maximum
+        self.total[slot] = total
+        self.weights[slot] = weight
+        self.written += 1
+    
+    def absorb(self, generation, minimum, maximum, total, weight):
+        """
+        Fold a finished bucket of the level below into the pending one
+        
+        Returns:
+            True when that completed a bucket of this level
+        """
+        if self.pending == 0:
+            self.pending_generation = generation
+            self.pending_minimum[:] = minimum
+            self.pending_maximum[:] = maximum
+            self.pending_total[:] = total
+        else:
+            np.minimum(self.pending_minimum, minimum, out=self.pending_minimum)
+            np.maximum(self.pending_maximum, maximum, out=self.pending_maximum)
+            self.pending_total += total
+        self.pending += weight
+        
+        if self.pending < self.span:
+            return False
+        self.store(self.pending_generation, self.pending_minimum, self.pending_maximum, self.pending_total,
+                   self.pending)
+        self.pending = 0
+        return True
+    
+    def latest(self, count):
+        """Slots of the newest count stored buckets, oldest first"""
+        count = min(count, self.written, self.size)
+        return np.arange(self.written - count, self.written) % self.size
+
+
+class PopulationSeries:
+    """Per-generation state counts kept at several resolutions in fixed memory"""
+    
+    def __init__(self, states, levels=LEVELS, factor=FACTOR, buckets=BUCKETS):
+        self.states = list(states)
+        self.index = {state: i for i, state in enumerate(self.states)}
+        self.levels = [_Level(factor ** k, len(self.states), buckets) for k in range(levels)]
+        self.samples = 0
+        self.generations_covered = 0
+        self.last_generation = None
+        self._counts = np.zeros(len(self.states), dtype=np.int64)
+    
+    def reset(self):
+        for level in self.levels:
+            level.written = 0
+            level.pending = 0
+        self.samples = 0
+        self.generations_covered = 0
+        self.last_generation = None
+    
+    def add(self, generation, counts):
+        """
+        Record the {state: count} of generation
+        
+        A generation already recorded is ignored, so callers can pass every
+        count update. Going back to an earlier generation (undo, clear,
+        reseed) starts the series over. The counts stand for every
+        generation since the last one recorded, which is more than one
+        when play runs in batches or skips ahead.
+        """
+        weight = 1
+        if self.last_generation is not None:
+            if generation == self.last_generation:
+                return
+            if generation < self.last_generation:
+                self.reset()
+            else:
+                weight = generation - self.last_generation
+        self.last_generation = generation
+        
+        values = self._counts
+        values[:] = 0
+        for state, count in counts.items():
+            i = self.index.get(state)
+            if i is not None:
+                values[i] = count
+        
+        total = values * weight
+        self.levels[0].store(generation, values, values, total, weight)
+        self.samples += 1
+        self.generations_covered += weight
+        
+        # Each completed bucket is folded into the next level up
+        first, minimum, maximum = generation, values, values
+        for level in self.levels[1:]:
+            if not level.absorb(first, minimum, maximum, total, weight):
+                break
+            slot = (level.written - 1) % level.size
+            first = level.generations[slot]
+            minimum, maximum, total = level.minimum[slot], level.maximum[slot], level.total[slot]
+            weight = level.weights[slot]
+    
+    def window(self, points):
+        """
+        The whole kept history in at most about points points
+        
+        Uses the finest level that fits it, plus that level's partly
+        filled bucket as the newest point. Past the coarsest level's reach
+        only its newest buckets are returned. Means are weighted by the
+        generations each sample stands for.
+        
+        Returns:
+            (generations, mean, minimum, maximum), the last three shaped
+            (n, number of states)
+        """
+        num_states = len(self.states)
+        if self.samples == 0:
+            empty = np.zeros((0, num_states))
+            return np.zeros(0, dtype=np.int64), empty, empty, empty
+        
+        level = self.levels[-1]
+        for candidate in self.levels:
+            # Buckets never cover less than span generations, nor fewer than one sample
+            buckets = min(self.samples, self.generations_covered // candidate.span)
+            if buckets <= min(points, candidate.size):
+                level = candidate
+                break
+        
+        slots = level.latest(points)
+        generations = level.generations[slots]
+        mean = level.total[slots] / level.weights[slots][:, None]
+        minimum = level.minimum[slots].astype(float)
+        maximum = level.maximum[slots].astype(float)
+        if level.pending:
+            generations = np.append(generations, level.pending_generation)
+            mean = np.vstack([mean, level.pending_total / level.pending])
+            minimum = np.vstack([minimum, level.pending_minimum])
+            maximum = np.vstack([maximum, level.pending_maximum])
+        return generations, mean, minimum, maximum
+
+
+class PopulationChart:
+    """Sparkline of a PopulationSeries on a small canvas, one line per state"""
+    
+    def __init__(self, canvas, series, colors, tag="population"):
+        self.canvas = canvas
+        self.series = series
+        self.colors = colors
+        self.tag = tag
+        self.lines = {}
+        self.label = None
+        self.last_update = 0.0
+    
+    def update(self, force=False):
+        """
+        Move the lines to the series' current window, at most every CHART_INTERVAL
+        
+        The line items are created once and only their coordinates change.
+        Each line is scaled to its own range over the window, so small
+        populations show their shape next to large ones.
+        """
+        now = time.perf_counter()
+        if not force and now - self.last_update < CHART_INTERVAL:
+            return
+        self.last_update = now
+        
+        if not self.canvas.winfo_exists():
+            return
+        width = int(self.canvas["width"])
+        height = int(self.canvas["height"])
+        generations, mean, minimum, maximum = self.series.window(width)
+        
+        if self.label is None:
+            self.label = self.canvas.create_text(width - 2, 2, anchor="ne", font=("Arial", 7),
+                                                 fill="#666666", tags=self.tag)
+        span = int(generations[-1] - generations[0]) if len(generations) > 1 else 0
+        self.canvas.itemconfigure(self.label, text=f"last {span} gens" if span else "")
+        
+        for i, state in enumerate(self.series.states):
+            line = self.lines.get(state)
+            if line is None:
+                line = self.lines[state] = self.canvas.create_line(0, 0, 0, 0, width=1, tags=self.tag)
+            self.canvas.itemconfigure(line, fill=self.colors.get(state, "#000000"))
+            
+            if len(generations) < 2:
+                self.canvas.coords(line, 0, 0, 0, 0)
+                continue
+            
+            low, high = mean[:, i].min(), mean[:, i].max()
+            ys = height - 3 - (mean[:, i] - low) / max(high - low, 1) * (height - 6)
+            # Batched samples are unevenly spaced in generations
+            xs = (generations - generations[0]) / max(span, 1) * (width - 1)
+            self.canvas.coords(line, *np.column_stack([xs, ys]).ravel().tolist())
+    
+    def clear(self):
+        if self.canvas.winfo_exists():
+            self.canvas.delete(self.tag)
+        self.lines.clear()
+        self.label = None
@@ -0,0 +1,157 @@
+"""
+raster.py - Vectorized cell rasterisation shared by the renderers
+Turns arrays of cell states into RGB pixel arrays with a palette lookup
+instead of drawing one rectangle per cell
+"""
+
+import numpy as np
+
+
+def build_palette(state_rgb, background=(255, 255, 255)):
+    """
+    Build a (num_states, 3) uint8 palette indexed by state number
+    
+    States missing from state_rgb fall back to the background color,
+    matching get_rgb() in the renderers.
+    """
+    size = max(state_rgb.keys()) + 1 if state_rgb else 1
+    palette = np.empty((size, 3), dtype=np.uint8)
+    palette[:] = background
+    for state, rgb in state_rgb.items():
+        palette[state] = rgb
+    return palette
+
+
+def grid_line_mask(cell_size, num_cols):
+    """
+    Precompute the grid line overlay for one row of cells
+    
+    Returns a (cell_size, num_cols * cell_size) bool array that is True on
+    the outline pixels of every cell. The same mask is reused for every row.
+    """
+    cell = np.zeros((cell_size, cell_size), dtype=bool)
+    cell[0, :] = True
+    cell[-1, :] = True
+    cell[:, 0] = True
+    cell[:, -1] = True
+    return np.tile(cell, (1, num_cols))
+
+
+def line_cells(start, end):
+    """
+    Cells on the straight path from start to end, both (row, col)
+    
+    Fills the gaps between two mouse positions so fast strokes paint
+    every cell they cross. start itself is left out, since it was
+    painted by the previous event.
+    
+    Returns:
+        (rows, cols) int arrays in path order
+    """
+    d_row = end[0] - start[0]
+    d_col = end[1] - start[1]
+    steps = max(abs(d_row), abs(d_col))
+    if steps == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    
+    t = np.arange(1, steps + 1) / steps
+    rows = start[0] + np.rint(d_row * t).astype(np.int64)
+    cols = start[1] + np.rint(d_col * t).astype(np.int64)
+    return rows, cols
+
+
+def cell_runs(rows, cols):
+    """
+    Split a path of cells into straight horizontal or vertical runs
+    
+    A stroke's bounding box can cover far more cells than the stroke,
+    so it is marked dirty a run at a time instead. Diagonal steps give
+    runs of one cell.
+    
+    Returns:
+        List of inclusive (min_row, max_row, min_col, max_col) rectangles
+    """
+    runs = []
+    run = None
+    for row, col in zip(rows.tolist(), cols.tolist()):
+        if run is not None:
+            min_row, max_row, min_col, max_col = run
+            if min_row == max_row == row and min_col - 1 <= col <= max_col + 1:
+                run = (row, row, min(min_col, col), max(max_col, col))
+                continue
+            if min_col == max_col == col and min_row - 1 <= row <= max_row + 1:
+                run = (min(min_row, row), max(max_row, row), col, col)
+                continue
+            runs.append(run)
+        run = (row, row, col, col)
+    if run is not None:
+        runs.append(run)
+    return runs
+
+
+def arrow_sprite(cell_size, direction, fill=(255, 0, 0), outline=(139, 0, 0)):
+    """
+    Rasterise a pointer arrow for one cell
+    
+    The arrow is the triangle the pointer screen used to draw as a canvas
+    polygon: the tip half a cell (at most 30 pixels) from the centre
+    towards direction (degrees clockwise from up), the base corners at
+    +-150 degrees and 0.3 times that distance, with a 2 pixel outline.
+    
+    Returns:
+        (cell_size, cell_size, 4) uint8 RGBA array, transparent outside the arrow
+    """
+    length = min(cell_size / 2, 30)
+    width = length * 0.3
+    centre = cell_size // 2
+    angle = np.radians(direction)
+    corners = [(centre + length * np.sin(angle), centre - length * np.cos(angle)),
+               (centre + width * np.sin(angle + np.radians(150)), centre - width * np.cos(angle + np.radians(150))),
+               (centre + width * np.sin(angle - np.radians(150)), centre - width * np.cos(angle - np.radians(150)))]
+    
+    # Signed distance of each pixel centre from the nearest edge, positive inside
+    y, x = np.mgrid[0:cell_size, 0:cell_size] + 0.5
+    inside = np.full((cell_size, cell_size), np.inf)
+    for (x1, y1), (x2, y2) in zip(corners, corners[1:] + corners[:1]):
+        edge = np.hypot(x2 - x1, y2 - y1)
+        if edge == 0:
+            continue
+        # The corners run clockwise on screen, so inside is to the right of each edge
+        inside = np.minimum(inside, ((x2 - x1) * (y - y1) - (y2 - y1) * (x - x1)) / edge)
+    
+    sprite = np.zeros((cell_size, cell_size, 4), dtype=np.uint8)
+    sprite[inside >= -1] = outline + (255,)
+    sprite[inside >= 1] = fill + (255,)
+    return sprite
+
+
+def rasterise(states, palette, cell_size, grid_mask=None, grid_color=(0, 0, 0), out=None):
+    """
+    Rasterise a 2D array of states in one pass
+    
+    Args:
+        states: (rows, cols) integer array of cell states
+        palette: (num_states, 3) uint8 array from build_palette
+        cell_size: Pixel size of each cell
+        grid_mask: Optional overlay from grid_line_mask
+        grid_color: RGB used where the grid mask is set
+        out: Optional preallocated (rows, cell_size, cols * cell_size, 3) array
+    
+    Returns:
+        (rows, cell_size, cols * cell_size, 3) uint8 array. Reshape it to
+        (rows * cell_size, cols * cell_size, 3) for a single image.
+    """
+    rows, cols = states.shape
+    
+    # Clip unknown states to the last palette entry rather than failing
+    colors = palette.take(states, axis=0, mode="clip")
+    if cell_size > 1:
+        colors = np.repeat(colors, cell_size, axis=1)
+    
+    if out is None:
+        out = np.empty((rows, cell_size, cols * cell_size, 3), dtype=np.uint8)
+    out[:] = colors[:, np.newaxis, :, :]
+    
+    if grid_mask is not None:
+        out[:, grid_mask] = grid_color
+    return out
@@ -0,0 +1,207 @@
+"""
+sampling_profiler.py - Low-overhead capture of where the app spends its time
+A background thread looks at the main thread's Python stack every few
+milliseconds and counts each stack it sees, so the simulation runs at
+close to full speed while it is profiled. The counts are written as
+collapsed stacks (one "a;b;c count" line per stack, the input format of
+flamegraph.pl and speedscope) and as a pstats file that
+`python -m pstats` or snakeviz can open.
+
+Profiles go in the profiles folder next to the app. To print the top
+functions of a saved profile:
+    python sampling_profiler.py profiles/grid-20260101-120000.pstats
+"""
+
+import marshal
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_SECONDS = 10
+SAMPLE_INTERVAL = 0.005
+MAX_DEPTH = 128
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+
+
+def _frame_key(code):
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+
+class SamplingProfiler:
+    """Samples one thread's stack on a timer until stopped"""
+    
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id if thread_id is not None else threading.main_thread().ident
+        self.interval = interval
+        # Stack (outermost frame first) -> seconds spent in it, and the
+        # number of samples that found it
+        self.stacks = Counter()
+        self.stack_samples = Counter()
+        self.samples = 0
+        self.started = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+    
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        self.stacks.clear()
+        self.stack_samples.clear()
+        self.samples = 0
+        self._stop.clear()
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.elapsed = time.perf_counter() - self.started
+    
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                return
+            
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                stack.append(_frame_key(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            
+            # Weight by the real gap, which is longer than the interval
+            # whenever the main thread held the GIL
+            stack = tuple(stack)
+            self.stacks[stack] += now - last
+            self.stack_samples[stack] += 1
+            self.samples += 1
+            last = now
+    
+    def collapsed(self):
+        """Lines of "file:function;file:function count" with counts in microseconds"""
+        lines = []
+        for stack, seconds in self.stacks.most_common():
+            names = ";".join(f"{os.path.basename(filename)}:{name}" for filename, _, name in stack)
+            lines.append(f"{names} {max(1, round(seconds * 1e6))}")
+        return lines
+    
+    def pstats_dict(self):
+        """
+        The samples in the layout pstats.Stats loads
+        
+        Returns:
+            {function: (primitive calls, calls, own time, total time, callers)}
+            where the call counts are sample counts
+        """
+        own = Counter()
+        total = Counter()
+        hits = Counter()
+        callers = {}
+        
+        for stack, seconds in self.stacks.items():
+            samples = self.stack_samples[stack]
+            own[stack[-1]] += seconds
+            # Recursive functions count once per sample toward total time
+            for function in set(stack):
+                total[function] += seconds
+                hits[function] += samples
+            for caller, callee in zip(stack, stack[1:]):
+                edges = callers.setdefault(callee, {})
+                calls, _, edge_own, edge_total = edges.get(caller, (0, 0, 0.0, 0.0))
+                edges[caller] = (calls + samples, calls + samples, edge_own, edge_total + seconds)
+        
+        return {function: (hits[function], hits[function], own[function], total[function],
+                           callers.get(function, {}))
+                for function in total}
+    
+    def save(self, name="profile", folder=PROFILE_DIR):
+        """
+        Write <name>-<timestamp>.collapsed and .pstats into folder
+        
+        Returns:
+            Path of the collapsed-stack file
+        """
+        os.makedirs(folder, exist_ok=True)
+        base = os.path.join(folder, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}")
+        
+        with open(base + ".collapsed", "w") as f:
+            f.write("\n".join(self.collapsed()) + "\n")
+        with open(base + ".pstats", "wb") as f:
+            marshal.dump(self.pstats_dict(), f)
+        return base + ".collapsed"
+
+
+class ProfileCapture:
+    """Profiles the Tk main loop for a fixed time, then saves and reports"""
+    
+    def __init__(self, root, name, notify, seconds=PROFILE_SECONDS):
+        self.root = root
+        self.name = name
+        self.notify = notify
+        self.seconds = seconds
+        self.profiler = SamplingProfiler()
+        self.after_id = None
+    
+    @property
+    def running(self):
+        return self.profiler.running
+    
+    def toggle(self, event=None):
+        """Start a capture, or end the current one early"""
+        if self.running:
+            self.finish()
+        else:
+            self.profiler.start()
+            self.after_id = self.root.after(int(self.seconds * 1000), self.finish)
+            self.notify(f"Profiling for {self.seconds}s...")
+    
+    def finish(self):
+        if self.after_id:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+        if not self.running:
+            return
+        
+        self.profiler.stop()
+        try:
+            path = self.profiler.save(self.name)
+        except OSError as e:
+            self.notify(f"Profile failed: {e}")
+            return
+        self.notify(f"Profile saved: {os.path.relpath(path)} ({self.profiler.samples} samples)")
+    
+    def cancel(self):
+        """Stop without saving, e.g. when the screen closes"""
+        if self.after_id:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+        self.profiler.stop()
+
+
+def main():
+    import pstats
+    
+    if len(sys.argv) < 2:
+        print("Usage: python sampling_profiler.py <profile.pstats> [count]")
+        return 1
+    
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 25
+    stats = pstats.Stats(sys.argv[1])
+    stats.sort_stats("tottime").print_stats(count)
+    stats.sort_stats("cumulative").print_stats(count)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,390 @@
+"""
+timeline.py - Record runs to delta-compressed timeline files and replay them
+
+A timeline stores one frame per recorded generation. Every
+keyframe_interval frames a full keyframe is written; the frames between
+hold the XOR of the cells against the previous frame, which is mostly
+zeros and compresses very well. Pointer positions, directions and
+group counts can ride along with each frame.
+
+Writing happens on a background thread fed by a bounded queue. If the
+queue is full the frame is dropped rather than making the simulation
+wait, and the timeline simply skips that generation.
+
+File layout:
+    8 bytes   magic b"CATIMELN"
+    2 bytes   format version, 4 bytes header length, JSON header
+    records   13 byte record header (kind, generation, cells length,
+              pointers length) + zlib cells + zlib pointers, int32
+              (row, col, direction, count) rows (version 1 files have
+              no count column)
+    index     (generation, offset, kind) int64 rows for every record,
+              written on close, then its offset and b"TLINDEX!"
+"""
+
+import json
+import queue
+import struct
+import threading
+import zlib
+import tkinter as tk
+import numpy as np
+
+MAGIC = b"CATIMELN"
+VERSION = 2
+INDEX_MAGIC = b"TLINDEX!"
+KEYFRAME = 0
+DELTA = 1
+DEFAULT_KEYFRAME_INTERVAL = 100
+DEFAULT_QUEUE_SIZE = 64
+COMPRESSION_LEVEL = 1
+
+_PREFIX = struct.Struct("<8sHI")
+_RECORD = struct.Struct("<BqII")
+_TRAILER = struct.Struct("<Q8s")
+
+
+class TimelineError(ValueError):
+    """Raised when a file is not a valid timeline"""
+
+
+POINTER_COLUMNS = 4
+
+
+def pointers_to_array(pointers):
+    """(row, col, direction, count) int32 rows for the visible pointers"""
+    visible = [(p.row, p.col, p.direction, p.count) for p in pointers if p.visible]
+    return np.array(visible, dtype=np.int32).reshape(-1, POINTER_COLUMNS)
+
+
+class TimelineWriter:
+    """Background writer for one timeline file"""
+    
+    def __init__(self, path, shape, state_colors=None, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+                 queue_size=DEFAULT_QUEUE_SIZE):
+        self.path = path
+        self.shape = tuple(shape)
+        self.keyframe_interval = keyframe_interval
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.error = None
+        
+        header = {
+            "shape": list(self.shape),
+            "palette": {str(state): color for state, color in (state_colors or {}).items()},
+            "keyframe_interval": keyframe_interval
+        }
+        header_bytes = json.dumps(header).encode("utf-8")
+        
+        self.file = open(path, "wb")
+        self.file.write(_PREFIX.pack(MAGIC, VERSION, len(header_bytes)))
+        self.file.write(header_bytes)
+        
+        self.index = []
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def add(self, generation, cells, pointers=None):
+        """
+        Queue one frame without blocking
+        
+        Returns:
+            False if the queue was full and the frame was dropped
+        """
+        frame = np.array(cells, dtype=np.uint8)
+        if frame.shape != self.shape:
+            raise TimelineError(f"Frame is {frame.shape}, timeline is {self.shape}")
+        
+        try:
+            self.queue.put_nowait((generation, frame, pointers))
+            return True
+        except queue.Full:
+            self.frames_dropped += 1
+            return False
+    
+    def close(self):
+        """
+        Finish writing queued frames, then write the frame index
+        
+        Raises:
+            OSError: If writing a frame or the index failed (e.g. the disk
+                filled up). The index only lists frames written in full,
+                so if it could still be written the frames before the
+                failure remain readable.
+        """
+        self.queue.put(None)
+        self.thread.join()
+        
+        try:
+            try:
+                index_offset = self.file.tell()
+                self.file.write(np.array(self.index, dtype="<i8").reshape(-1, 3).tobytes())
+                self.file.write(_TRAILER.pack(index_offset, INDEX_MAGIC))
+            finally:
+                self.file.close()
+        except OSError as e:
+            if self.error is None:
+                self.error = e
+        if self.error:
+            raise self.error
+    
+    def _run(self):
+        previous = None
+        
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error:
+                continue
+            
+            generation, frame, pointers = item
+            try:
+                if previous is None or self.frames_written % self.keyframe_interval == 0:
+                    kind, cells = KEYFRAME, frame
+                else:
+                    kind, cells = DELTA, np.bitwise_xor(frame, previous)
+                
+                cell_data = zlib.compress(cells.tobytes(), COMPRESSION_LEVEL)
+                pointer_data = b""
+                if pointers is not None:
+                    pointer_data = zlib.compress(np.asarray(pointers, dtype=np.int32).tobytes(), COMPRESSION_LEVEL)
+                
+                offset = self.file.tell()
+                self.file.write(_RECORD.pack(kind, generation, len(cell_data), len(pointer_data)))
+                self.file.write(cell_data)
+                self.file.write(pointer_data)
+                # Indexed only once written in full
+                self.index.append((generation, offset, kind))
+                
+                previous = frame
+                self.frames_written += 1
+            except OSError as e:
+                self.error = e
+
+
+class TimelineReader:
+    """Random access to the frames of a timeline file"""
+    
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        
+        prefix = self.file.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            raise TimelineError("Not a timeline file")
+        magic, version, header_length = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise TimelineError("Not a timeline file")
+        if version > VERSION:
+            raise TimelineError(f"Timeline version {version} is newer than supported ({VERSION})")
+        
+        self.version = version
+        
+        header = json.loads(self.file.read(header_length).decode("utf-8"))
+        self.shape = tuple(header["shape"])
+        self.palette = {int(state): color for state, color in header["palette"].items()}
+        self.data_start = self.file.tell()
+        
+        self._build_index()
+    
+    def _build_index(self):
+        """
+        Load (generation, offset, kind) for every record
+        
+        Closed files carry the index at the end. A file whose writer never
+        closed it is scanned record header by record header, up to the
+        last complete record.
+        """
+        end = self.file.seek(0, 2)
+        
+        if end - self.data_start >= _TRAILER.size:
+            self.file.seek(end - _TRAILER.size)
+            index_offset, magic = _TRAILER.unpack(self.file.read(_TRAILER.size))
+            if magic == INDEX_MAGIC:
+                self.file.seek(index_offset)
+                index = np.frombuffer(self.file.read(end - _TRAILER.size - index_offset), dtype="<i8").reshape(-1, 3)
+                if len(index) == 0:
+                    raise TimelineError("Timeline has no frames")
+                self.generations = index[:, 0].copy()
+                self.offsets = index[:, 1].tolist()
+                self.kinds = index[:, 2].tolist()
+                return
+        
+        data_end = end
+        self.generations = []
+        self.offsets = []
+        self.kinds = []
+        
+        offset = self.data_start
+        while offset + _RECORD.size <= data_end:
+            self.file.seek(offset)
+            kind, generation, cell_length, pointer_length = _RECORD.unpack(self.file.read(_RECORD.size))
+            next_offset = offset + _RECORD.size + cell_length + pointer_length
+            if next_offset > data_end:
+                break
+            
+            self.generations.append(generation)
+            self.offsets.append(offset)
+            self.kinds.append(kind)
+            offset = next_offset
+        
+        if not self.generations:
+            raise TimelineError("Timeline has no frames")
+        self.generations = np.array(self.generations, dtype=np.int64)
+    
+    def __len__(self):
+        return len(self.offsets)
+    
+    def close(self):
+        self.file.close()
+    
+    def _read_record(self, i):
+        self.file.seek(self.offsets[i])
+        kind, generation, cell_length, pointer_length = _RECORD.unpack(self.file.read(_RECORD.size))
+        cells = np.frombuffer(zlib.decompress(self.file.read(cell_length)), dtype=np.uint8)
+        
+        pointers = None
+        if pointer_length:
+            pointers = np.frombuffer(zlib.decompress(self.file.read(pointer_length)), dtype=np.int32)
+            if self.version < 2:
+                # Older files have no count column; every pointer stood alone
+                pointers = pointers.reshape(-1, 3)
+                pointers = np.column_stack([pointers, np.ones(len(pointers), dtype=np.int32)])
+            pointers = pointers.reshape(-1, POINTER_COLUMNS)
+        return kind, generation, cells.reshape(self.shape), pointers
+    
+    def frame_index(self, generation):
+        """Index of the last frame at or before generation"""
+        return max(0, int(np.searchsorted(self.generations, generation, side="right")) - 1)
+    
+    def frame(self, i):
+        """
+        Decode frame i by replaying deltas from the keyframe before it
+        
+        Returns:
+            (generation, cells, pointers)
+        """
+        start = i
+        while self.kinds[start] != KEYFRAME:
+            start -= 1
+        
+        cells = None
+        for j in range(start, i + 1):
+            kind, generation, data, pointers = self._read_record(j)
+            cells = data.copy() if kind == KEYFRAME else np.bitwise_xor(cells, data, out=cells)
+        return generation, cells, pointers
+    
+    def frames(self, start=0):
+        """Yield (generation, cells, pointers) for frame start onwards"""
+        generation, cells, pointers = self.frame(start)
+        yield generation, cells, pointers
+        
+        for i in range(start + 1, len(self)):
+            kind, generation, data, pointers = self._read_record(i)
+            if kind == KEYFRAME:
+                cells = data.copy()
+            else:
+                np.bitwise_xor(cells, data, out=cells)
+            yield generation, cells, pointers
+
+
+class TimelinePlayer:
+    """
+    Small window for replaying a timeline
+    
+    show_frame(generation, cells, pointers) is called to draw each frame,
+    so the same player works for the grid and pointer screens.
+    """
+    
+    def __init__(self, root, reader, show_frame, on_close=None):
+        self.root = root
+        self.reader = reader
+        self.show_frame = show_frame
+        self.on_close = on_close
+        self.playing = False
+        self.position = 0
+        self.frame_iter = None
+        
+        self.window = tk.Toplevel(root)
+        self.window.title("Timeline Replay")
+        self.window.config(bg="#f0f0f0")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        
+        self.generation_label = tk.Label(self.window, text="", font=("Arial", 11, "bold"), bg="#f0f0f0")
+        self.generation_label.pack(pady=(10, 5))
+        
+        self.seek_var = tk.IntVar(value=0)
+        self.seek_scale = tk.Scale(self.window, from_=0, to=len(reader) - 1, orient="horizontal",
+                                   length=400, showvalue=False, variable=self.seek_var,
+                                   command=self._on_seek)
+        self.seek_scale.pack(padx=10, pady=5)
+        
+        controls = tk.Frame(self.window, bg="#f0f0f0")
+        controls.pack(pady=(5, 10))
+        
+        self.play_button = tk.Button(controls, text="Play", width=8, command=self.toggle_play,
+                                     bg="#4CAF50", fg="white", font=("Arial", 9, "bold"))
+        self.play_button.pack(side="left", padx=5)
+        
+        tk.Label(controls, text="Frames/tick:", bg="#f0f0f0").pack(side="left", padx=(10, 2))
+        self.skip_var = tk.IntVar(value=1)
+        tk.Spinbox(controls, from_=1, to=1000, width=5, textvariable=self.skip_var).pack(side="left")
+        
+        self.seek(0)
+    
+    def seek(self, i):
+        self.position = max(0, min(i, len(self.reader) - 1))
+        self.frame_iter = None
+        generation, cells, pointers = self.reader.frame(self.position)
+        self._show(generation, cells, pointers)
+    
+    def _on_seek(self, value):
+        if int(value) != self.position:
+            self.seek(int(value))
+    
+    def _show(self, generation, cells, pointers):
+        self.generation_label.config(text=f"Generation {generation}  ({self.position + 1}/{len(self.reader)})")
+        self.seek_var.set(self.position)
+        self.show_frame(generation, cells, pointers)
+    
+    def toggle_play(self):
+        self.playing = not self.playing
+        self.play_button.config(text="Pause" if self.playing else "Play")
+        if self.playing:
+            self._tick()
+    
+    def _tick(self):
+        if not self.playing or not self.window.winfo_exists():
+            return
+        
+        if self.position >= len(self.reader) - 1:
+            self.toggle_play()
+            return
+        
+        # Decode sequentially and only draw the last of each batch of frames
+        if self.frame_iter is None:
+            self.frame_iter = self.reader.frames(self.position + 1)
+        
+        try:
+            skip = max(1, int(self.skip_var.get()))
+        except (ValueError, tk.TclError):
+            skip = 1
+        
+        frame = None
+        for _ in range(skip):
+            frame = next(self.frame_iter, None)
+            if frame is None:
+                break
+            self.position += 1
+        
+        if frame is not None:
+            self._show(*frame)
+        self.root.after(15, self._tick)
+    
+    def close(self):
+        self.playing = False
+        self.reader.close()
+        self.window.destroy()
+        if self.on_close:
+            self.on_close()
@@ -0,0 +1,158 @@
+"""
+zobrist.py - Incremental grid hashing for cycle and still-life detection
+A grid's hash is the XOR of one 64-bit key per non-zero cell, so when a
+generation changes a few cells the hash is updated from those cells only.
+Cell keys come from the splitmix64 mixer instead of a random table, so
+even huge or sparse grids need no key memory.
+
+CycleDetector keeps a bounded hash -> generation table. Seeing a hash
+again means the run has entered a cycle whose period is the difference
+between the two generations (1 for a still life).
+"""
+
+from collections import OrderedDict
+import numpy as np
+
+DEFAULT_TABLE_SIZE = 4096
+MASK64 = (1 << 64) - 1
+POINTER_SALT = 0x504F494E544552
+
+_GOLDEN = 0x9E3779B97F4A7C15
+_MIX1 = 0xBF58476D1CE4E5B9
+_MIX2 = 0x94D049BB133111EB
+
+
+def mix(x):
+    """splitmix64 finaliser for one Python int"""
+    z = (x + _GOLDEN) & MASK64
+    z = ((z ^ (z >> 30)) * _MIX1) & MASK64
+    z = ((z ^ (z >> 27)) * _MIX2) & MASK64
+    return z ^ (z >> 31)
+
+
+def mix_array(x):
+    """splitmix64 finaliser for a uint64 array (wraps like the C version)"""
+    z = x + np.uint64(_GOLDEN)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(_MIX1)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(_MIX2)
+    return z ^ (z >> np.uint64(31))
+
+
+def _state_keys():
+    """One odd 64-bit multiplier per state; state 0 maps to 0 so empty cells add nothing"""
+    keys = np.random.default_rng(0x2B992DDFA23249D6).integers(0, 1 << 63, size=256, dtype=np.uint64)
+    keys = keys * np.uint64(2) + np.uint64(1)
+    keys[0] = 0
+    return keys
+
+
+# A cell's key is mix(cell index) * STATE_KEYS[state], so a changed cell
+# needs one mix for both its old and new key
+STATE_KEYS = _state_keys()
+
+
+def cell_key(index, state):
+    """Key of one cell in one state"""
+    return (mix(index & MASK64) * int(STATE_KEYS[state & 0xFF])) & MASK64
+
+
+def xor_reduce(keys):
+    return int(np.bitwise_xor.reduce(keys)) if len(keys) else 0
+
+
+def _states(values):
+    return STATE_KEYS[np.asarray(values).astype(np.uint8, copy=False)]
+
+
+def grid_hash(grid, row_offset=0):
+    """Hash of a 2D grid, or of a band of rows starting at row_offset"""
+    flat = np.flatnonzero(grid)
+    index = flat.astype(np.uint64) + np.uint64(row_offset * grid.shape[1])
+    return xor_reduce(mix_array(index) * _states(np.asarray(grid).ravel()[flat]))
+
+
+def region_delta(old, new, row_offset, col_offset, width):
+    """
+    XOR to apply to a grid hash when region old becomes new
+    
+    Only changed cells are hashed. The region's top-left cell is at
+    (row_offset, col_offset) in a grid width cells wide.
+    """
+    changed = np.flatnonzero(old != new)
+    if len(changed) == 0:
+        return 0
+    
+    if col_offset == 0 and old.shape[1] == width:
+        index = changed + row_offset * width
+    else:
+        rows, cols = np.divmod(changed, old.shape[1])
+        index = (rows + row_offset) * width + cols + col_offset
+    
+    base = mix_array(index.astype(np.uint64))
+    keys = base * _states(old.ravel()[changed])
+    keys ^= base * _states(new.ravel()[changed])
+    return xor_reduce(keys)
+
+
+def cells_delta(index, old, new):
+    """XOR to apply to a grid hash when the cells at flat indices change from old to new states"""
+    base = mix_array(np.asarray(index, dtype=np.uint64))
+    return xor_reduce(base * _states(old) ^ base * _states(new))
+
+
+def pointer_key(row, col, direction):
+    return mix((((row & 0xFFFFFFFF) << 32 | (col & 0xFFFFFFFF)) * 360 + direction % 360) ^ POINTER_SALT)
+
+
+class CycleDetector:
+    """Bounded hash -> generation table; the oldest entries are forgotten first"""
+    
+    def __init__(self, max_entries=DEFAULT_TABLE_SIZE):
+        self.max_entries = max_entries
+        self.seen = OrderedDict()
+        self.period = 0
+        self.start = None
+    
+    def clear(self):
+        self.seen.clear()
+        self.period = 0
+        self.start = None
+    
+    def check(self, value, generation):
+        """
+        Record the hash of generation
+        
+        Returns:
+            The cycle period if this hash was seen at an earlier generation, else 0
+        """
+        previous = self.seen.get(value)
+        
+        # Entries from a later generation are stale (e.g. after an undo).
+        # Keeping the newest generation keeps the period the shortest one
+        self.seen[value] = generation
+        self.seen.move_to_end(value)
+        if len(self.seen) > self.max_entries:
+            self.seen.popitem(last=False)
+        
+        if previous is not None and previous < generation:
+            self.period = generation - previous
+            self.start = previous
+        else:
+            self.period = 0
+        return self.period
+    
+    def fast_forward(self, generation, target):
+        """
+        Furthest generation up to target that is a whole number of periods
+        after generation; returns generation unchanged without a cycle
+        
+        The table is shifted by the same amount so later periods stay right.
+        """
+        if not self.period or target <= generation:
+            return generation
+        
+        skip = (target - generation) // self.period * self.period
+        for value in self.seen:
+            self.seen[value] += skip
+        self.start += skip
+        return generation + skip